@@ -15,10 +15,10 @@
 # this program.  If not, see http://www.gnu.org/licenses/
 import json
 
-from rest_framework import generics
 from rest_framework import serializers
 
 from andalusian import models
+from dunya.api import CachedListAPIView, CachedRetrieveAPIView
 
 
 class MusicalSchoolInnerSerializer(serializers.ModelSerializer):
@@ -113,13 +113,13 @@ class MusicalSchoolDetailSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'transliterated_name']
 
 
-class MusicalSchoolDetail(generics.RetrieveAPIView):
+class MusicalSchoolDetail(CachedRetrieveAPIView):
     lookup_field = 'pk'
     queryset = models.MusicalSchool.objects.all()
     serializer_class = MusicalSchoolDetailSerializer
 
 
-class MusicalSchoolList(generics.ListAPIView):
+class MusicalSchoolList(CachedListAPIView):
     queryset = models.MusicalSchool.objects.all()
     serializer_class = MusicalSchoolInnerSerializer
 
@@ -130,13 +130,13 @@ class ArtistDetailSerializer(serializers.ModelSerializer):
         fields = ['mbid', 'name', 'transliterated_name']
 
 
-class ArtistDetail(generics.RetrieveAPIView):
+class ArtistDetail(CachedRetrieveAPIView):
     lookup_field = 'mbid'
     queryset = models.Artist.objects.all()
     serializer_class = ArtistDetailSerializer
 
 
-class ArtistList(generics.ListAPIView):
+class ArtistList(CachedListAPIView):
     queryset = models.Artist.objects.all()
     serializer_class = ArtistInnerSerializer
 
@@ -147,13 +147,13 @@ class OrchestraDetailSerializer(serializers.ModelSerializer):
         fields = ['mbid', 'name', 'transliterated_name']
 
 
-class OrchestraDetail(generics.RetrieveAPIView):
+class OrchestraDetail(CachedRetrieveAPIView):
     lookup_field = 'mbid'
     queryset = models.Orchestra.objects.all()
     serializer_class = OrchestraDetailSerializer
 
 
-class OrchestraList(generics.ListAPIView):
+class OrchestraList(CachedListAPIView):
     queryset = models.Orchestra.objects.all()
     serializer_class = OrchestraInnerSerializer
 
@@ -164,13 +164,13 @@ class WorkDetailSerializer(serializers.ModelSerializer):
         fields = ['mbid', 'title', 'transliterated_title']
 
 
-class WorkDetail(generics.RetrieveAPIView):
+class WorkDetail(CachedRetrieveAPIView):
     lookup_field = 'mbid'
     queryset = models.Work.objects.all()
     serializer_class = WorkDetailSerializer
 
 
-class WorkList(generics.ListAPIView):
+class WorkList(CachedListAPIView):
     queryset = models.Work.objects.all()
     serializer_class = WorkInnerSerializer
 
@@ -181,13 +181,13 @@ class AlbumDetailSerializer(serializers.ModelSerializer):
         fields = ['mbid', 'title', 'transliterated_title']
 
 
-class AlbumDetail(generics.RetrieveAPIView):
+class AlbumDetail(CachedRetrieveAPIView):
     lookup_field = 'mbid'
     queryset = models.Album.objects.all()
     serializer_class = AlbumDetailSerializer
 
 
-class AlbumList(generics.ListAPIView):
+class AlbumList(CachedListAPIView):
     queryset = models.Album.objects.all()
     serializer_class = AlbumInnerSerializer
 
@@ -198,13 +198,13 @@ class GenreDetailSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'transliterated_name']
 
 
-class GenreDetail(generics.RetrieveAPIView):
+class GenreDetail(CachedRetrieveAPIView):
     lookup_field = 'pk'
     queryset = models.Genre.objects.all()
     serializer_class = GenreDetailSerializer
 
 
-class GenreList(generics.ListAPIView):
+class GenreList(CachedListAPIView):
     queryset = models.Genre.objects.all()
     serializer_class = GenreInnerSerializer
 
@@ -215,13 +215,13 @@ class InstrumentDetailSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'original_name']
 
 
-class InstrumentDetail(generics.RetrieveAPIView):
+class InstrumentDetail(CachedRetrieveAPIView):
     lookup_field = 'pk'
     queryset = models.Instrument.objects.all()
     serializer_class = InstrumentDetailSerializer
 
 
-class InstrumentList(generics.ListAPIView):
+class InstrumentList(CachedListAPIView):
     queryset = models.Instrument.objects.all()
     serializer_class = InstrumentInnerSerializer
 
@@ -232,13 +232,13 @@ class TabDetailSerializer(serializers.ModelSerializer):
         fields = ['uuid', 'name', 'transliterated_name', 'display_order']
 
 
-class TabDetail(generics.RetrieveAPIView):
+class TabDetail(CachedRetrieveAPIView):
     lookup_field = 'uuid'
     queryset = models.Tab.objects.all()
     serializer_class = TabDetailSerializer
 
 
-class TabList(generics.ListAPIView):
+class TabList(CachedListAPIView):
     queryset = models.Tab.objects.all()
     serializer_class = TabInnerSerializer
 
@@ -249,13 +249,13 @@ class MizanDetailSerializer(serializers.ModelSerializer):
         fields = ['uuid', 'name', 'transliterated_name', 'display_order']
 
 
-class MizanDetail(generics.RetrieveAPIView):
+class MizanDetail(CachedRetrieveAPIView):
     lookup_field = 'uuid'
     queryset = models.Mizan.objects.all()
     serializer_class = MizanDetailSerializer
 
 
-class MizanList(generics.ListAPIView):
+class MizanList(CachedListAPIView):
     queryset = models.Mizan.objects.all()
     serializer_class = MizanInnerSerializer
 
@@ -266,13 +266,13 @@ class NawbaDetailSerializer(serializers.ModelSerializer):
         fields = ['uuid', 'name', 'transliterated_name', 'display_order']
 
 
-class NawbaDetail(generics.RetrieveAPIView):
+class NawbaDetail(CachedRetrieveAPIView):
     lookup_field = 'uuid'
     queryset = models.Nawba.objects.all()
     serializer_class = NawbaDetailSerializer
 
 
-class NawbaList(generics.ListAPIView):
+class NawbaList(CachedListAPIView):
     queryset = models.Nawba.objects.all()
     serializer_class = NawbaInnerSerializer
 
@@ -283,13 +283,13 @@ class FormDetailSerializer(serializers.ModelSerializer):
         fields = ['uuid', 'name', 'transliterated_name', 'display_order']
 
 
-class FormDetail(generics.RetrieveAPIView):
+class FormDetail(CachedRetrieveAPIView):
     lookup_field = 'uuid'
     queryset = models.Form.objects.all()
     serializer_class = FormDetailSerializer
 
 
-class FormList(generics.ListAPIView):
+class FormList(CachedListAPIView):
     queryset = models.Form.objects.all()
     serializer_class = FormInnerSerializer
 
@@ -313,13 +313,13 @@ class RecordingDetailSerializer(serializers.ModelSerializer):
         fields = ['mbid', 'title', 'transliterated_title', 'musescore_url', 'archive_url', 'sections']
 
 
-class RecordingDetail(generics.RetrieveAPIView):
+class RecordingDetail(CachedRetrieveAPIView):
     lookup_field = 'mbid'
     queryset = models.Recording.objects.all()
     serializer_class = RecordingDetailSerializer
 
 
-class RecordingList(generics.ListAPIView):
+class RecordingList(CachedListAPIView):
     queryset = models.Recording.objects.all()
     serializer_class = RecordingInnerSerializer
 
@@ -330,13 +330,13 @@ class SanaaDetailSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'transliterated_title']
 
 
-class SanaaDetail(generics.RetrieveAPIView):
+class SanaaDetail(CachedRetrieveAPIView):
     lookup_field = 'pk'
     queryset = models.Sanaa.objects.all()
     serializer_class = SanaaDetailSerializer
 
 
-class SanaaList(generics.ListAPIView):
+class SanaaList(CachedListAPIView):
     queryset = models.Sanaa.objects.all()
     serializer_class = SanaaInnerSerializer
 
@@ -358,13 +358,13 @@ class PoemDetailSerializer(serializers.ModelSerializer):
         return text
 
 
-class PoemDetail(generics.RetrieveAPIView):
+class PoemDetail(CachedRetrieveAPIView):
     lookup_field = 'pk'
     queryset = models.Poem.objects.all()
     serializer_class = PoemDetailSerializer
 
 
-class PoemList(generics.ListAPIView):
+class PoemList(CachedListAPIView):
     queryset = models.Poem.objects.all()
     serializer_class = PoemInnerSerializer
 
@@ -377,7 +377,7 @@ class RecordingPoemSerializer(serializers.ModelSerializer):
                   'transliterated_first_words']
 
 
-class LyricDetail(generics.ListAPIView):
+class LyricDetail(CachedListAPIView):
     serializer_class = PoemDetailSerializer
 
     def get_queryset(self):
@@ -1,6 +1,7 @@
 import collections
 import math
 
+from django.contrib.postgres.indexes import GinIndex
 from django.urls import reverse
 from django.db import models
 
@@ -223,6 +224,10 @@ class RecordingWork(models.Model):
 class Recording(AndalusianStyle, data.models.BaseModel):
     class Meta:
         ordering = ['id']
+        indexes = [GinIndex(fields=["search_text"], name="andalusian_rec_search_trgm", opclasses=["gin_trgm_ops"])]
+
+    # Titles of the recording, its works and releases, see data.search
+    search_text = models.TextField(blank=True, default="")
 
     mbid = models.UUIDField(blank=True, null=True)
     works = models.ManyToManyField("Work", through="RecordingWork")
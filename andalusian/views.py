@@ -15,10 +15,12 @@
 # this program.  If not, see http://www.gnu.org/licenses/
 import json
 
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
 
+import data.autocomplete
+import data.filters
+import data.search
 import docserver
 from andalusian import models
 
@@ -28,35 +30,18 @@ def search(request):
     s_mizan = request.GET.get('mizans', '')
     s_nawba = request.GET.get('nawbas', '')
 
-    recordings = models.Recording.objects
+    recordings = models.Recording.objects.all()
     if q and q != '':
-        ids = list(models.Work.objects.filter(title__icontains=q).values_list('pk', flat=True))
-        recordings = recordings.filter(works__id__in=ids) \
-                     | recordings.filter(title__icontains=q) \
-                     | recordings.filter(album__title__icontains=q)
+        recordings = data.search.filter_text(recordings, q)
     if s_nawba and s_nawba != '':
         recordings = recordings.filter(section__nawba=s_nawba)
     if s_mizan and s_mizan != '':
         recordings = recordings.filter(section__mizan=s_mizan)
 
-    paginator = Paginator(recordings.all(), 25)
-    page = request.GET.get('page')
-    next_page = None
-    try:
-        recordings = paginator.page(page)
-        if recordings.has_next():
-            next_page = recordings.next_page_number()
-    except PageNotAnInteger:
-        # If page is not an integer, deliver first page.
-        recordings = paginator.page(1)
-        if recordings.has_next():
-            next_page = recordings.next_page_number()
-    except EmptyPage:
-        # If page is out of range (e.g. 9999), deliver last page of results.
-        recordings = paginator.page(paginator.num_pages)
+    recordings, next_page = data.search.keyset_page(recordings.distinct(), request.GET.get('after'))
     results = {
-            "results": [item.get_dict() for item in recordings.object_list],
-            "moreResults": next_page
+        "results": [item.get_dict() for item in recordings],
+        "moreResults": next_page
     }
     return HttpResponse(json.dumps(results), content_type='application/json')
 
@@ -65,10 +50,7 @@ def searchcomplete(request):
     term = request.GET.get("input")
     ret = []
     if term:
-        suggestions = models.Recording.objects.filter(title__istartswith=term)[:3]
-        ret = [{"category": "recordings", "name": l.title, 'mbid': str(l.mbid)} for i, l in enumerate(suggestions, 1)]
-        suggestions = models.Artist.objects.filter(name__istartswith=term)[:3]
-        ret += [{"category": "artists", "name": l.name, 'mbid': str(l.mbid)} for i, l in enumerate(suggestions, len(ret))]
+        ret = data.autocomplete.suggestions("andalusian", term)
     return HttpResponse(json.dumps(ret), content_type="application/json")
 
 
@@ -104,8 +86,8 @@ def recording(request, uuid, title=None):
     return render(request, "andalusian/recording.html", ret)
 
 
-def filters(request):
-
+def filters_payload():
+    """ The data returned by `filters`, see data.filters """
     mizans = models.Mizan.objects.all()
     nawbas = models.Nawba.objects.all()
     artists = models.Artist.objects.all()
@@ -128,6 +110,10 @@ def filters(request):
         "mizans": mizanlist,
     }
 
-    return JsonResponse(ret)
+    return ret
+
+
+def filters(request):
+    return data.filters.response(request, "andalusian")
 
 
@@ -14,14 +14,19 @@
 # You should have received a copy of the GNU General Public License along with
 # this program.  If not, see http://www.gnu.org/licenses/
 
+from django.db.models import Prefetch
 from django.shortcuts import redirect
 from rest_framework import generics
 from rest_framework import serializers
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.response import Response
 
+from carnatic import artistgraph
 from carnatic import models
+from carnatic import similarity
 from data import utils
 from data.models import WithImageMixin
-from dunya.api import get_collection_ids_from_request_or_error
+from dunya.api import CachedListAPIView, CachedRetrieveAPIView, get_collection_ids_from_request_or_error, get_collection_ids_and_permission
 
 
 class ArtistInnerSerializer(serializers.ModelSerializer):
@@ -87,7 +92,7 @@ class InstrumentPerformanceInnerSerializer(serializers.ModelSerializer):
         fields = ['artist', 'instrument', 'lead', 'attributes']
 
 
-class TaalaList(generics.ListAPIView):
+class TaalaList(CachedListAPIView):
     queryset = models.Taala.objects.all()
     serializer_class = TaalaInnerSerializer
 
@@ -109,7 +114,7 @@ class TaalaDetailSerializer(serializers.ModelSerializer):
         return RecordingInnerSerializer(recordings, many=True).data
 
 
-class TaalaDetail(generics.RetrieveAPIView):
+class TaalaDetail(CachedRetrieveAPIView):
     lookup_field = 'uuid'
     queryset = models.Taala.objects.all()
     serializer_class = TaalaDetailSerializer
@@ -120,7 +125,7 @@ def taalabyid(request, pk):
     return redirect('api-carnatic-taala-detail', taala.uuid, permanent=True)
 
 
-class RaagaList(generics.ListAPIView):
+class RaagaList(CachedListAPIView):
     queryset = models.Raaga.objects.all()
     serializer_class = RaagaInnerSerializer
 
@@ -142,7 +147,7 @@ class RaagaDetailSerializer(serializers.ModelSerializer):
         return RecordingInnerSerializer(recordings, many=True).data
 
 
-class RaagaDetail(generics.RetrieveAPIView):
+class RaagaDetail(CachedRetrieveAPIView):
     lookup_field = 'uuid'
     queryset = models.Raaga.objects.all()
     serializer_class = RaagaDetailSerializer
@@ -153,7 +158,7 @@ def raagabyid(request, pk):
     return redirect('api-carnatic-raaga-detail', raaga.uuid, permanent=True)
 
 
-class InstrumentList(generics.ListAPIView):
+class InstrumentList(CachedListAPIView):
     queryset = models.Instrument.objects.all()
     serializer_class = InstrumentInnerSerializer
 
@@ -166,13 +171,13 @@ class InstrumentDetailSerializer(serializers.ModelSerializer):
         fields = ['mbid', 'name', 'artists']
 
 
-class InstrumentDetail(generics.RetrieveAPIView):
+class InstrumentDetail(CachedRetrieveAPIView):
     lookup_field = 'pk'
     queryset = models.Instrument.objects.all()
     serializer_class = InstrumentDetailSerializer
 
 
-class WorkList(generics.ListAPIView):
+class WorkList(CachedListAPIView):
     queryset = models.Work.objects.all()
     serializer_class = WorkInnerSerializer
 
@@ -195,7 +200,7 @@ class WorkDetailSerializer(serializers.ModelSerializer):
         return RecordingInnerSerializer(recordings, many=True).data
 
 
-class WorkDetail(generics.RetrieveAPIView):
+class WorkDetail(CachedRetrieveAPIView):
     lookup_field = 'mbid'
     lookup_url_kwarg = 'uuid'
     queryset = models.Work.objects.all()
@@ -204,18 +209,34 @@ class WorkDetail(generics.RetrieveAPIView):
         return WorkDetailSerializer
 
 
-class RecordingList(generics.ListAPIView):
+def prefetch_recording_details(recordings, collection_ids, permission):
+    """ Prefetch everything that RecordingDetailSerializer reads, so that
+        serializing any number of recordings takes the same number of queries """
+    concerts = models.Concert.objects.with_permissions(collection_ids, permission).prefetch_related('artists')
+    performances = models.InstrumentPerformance.objects.select_related('artist', 'instrument')
+    return recordings.prefetch_related(
+        'forms', 'raagas', 'taalas',
+        Prefetch('works', queryset=models.Work.objects.select_related('raaga', 'taala')),
+        Prefetch('instrumentperformance_set', queryset=performances),
+        Prefetch('concert_set', queryset=concerts, to_attr='permitted_concerts'))
+
+
+class RecordingList(CachedListAPIView):
+    def is_detail(self):
+        return self.request.GET.get('detail', None) == '1'
+
     def get_serializer_class(self):
-        detail = self.request.GET.get('detail', None)
-        if detail == '1':
+        if self.is_detail():
             return RecordingDetailSerializer
         else:
             return RecordingInnerSerializer
 
     def get_queryset(self):
-        collection_ids = get_collection_ids_from_request_or_error(self.request)
-        permission = utils.get_user_permissions(self.request.user)
-        return models.Recording.objects.with_permissions(collection_ids, permission).prefetch_related('works', 'forms', 'raagas', 'taalas', 'concert_set', 'instrumentperformance_set')
+        collection_ids, permission = get_collection_ids_and_permission(self.request)
+        recordings = models.Recording.objects.with_permissions(collection_ids, permission)
+        if self.is_detail():
+            recordings = prefetch_recording_details(recordings, collection_ids, permission)
+        return recordings
 
 
 class RecordingDetailSerializer(serializers.ModelSerializer):
@@ -231,37 +252,92 @@ class RecordingDetailSerializer(serializers.ModelSerializer):
         model = models.Recording
         fields = ['mbid', 'title', 'length', 'artists', 'raaga', 'taala', 'form', 'work', 'concert', 'album_artists']
 
+    def get_concerts(self, ob):
+        """ The concerts of the recording which the user can see. These are
+            prefetched by prefetch_recording_details, otherwise they are read once """
+        if not hasattr(ob, 'permitted_concerts'):
+            collection_ids, permission = get_collection_ids_and_permission(self.context['request'])
+            ob.permitted_concerts = list(ob.concert_set.with_permissions(collection_ids, permission))
+        return ob.permitted_concerts
+
     def concert_list(self, ob):
-        collection_ids = get_collection_ids_from_request_or_error(self.context['request'])
-        permission = utils.get_user_permissions(self.context['request'].user)
-        concerts = ob.concert_set.with_permissions(collection_ids, permission)
-        cs = ConcertInnerSerializer(concerts, many=True)
+        cs = ConcertInnerSerializer(self.get_concerts(ob), many=True)
         return cs.data
 
     def get_album_artists(self, ob):
-        collection_ids = get_collection_ids_from_request_or_error(self.context['request'])
-        permission = utils.get_user_permissions(self.context['request'].user)
-        concerts = ob.concert_set.with_permissions(collection_ids, permission)
+        concerts = self.get_concerts(ob)
         ret = []
         if len(concerts):
-            ret = concerts[0].artists
+            ret = concerts[0].artists.all()
         arts = ArtistInnerSerializer(ret, many=True)
         return arts.data
 
 
-class RecordingDetail(generics.RetrieveAPIView):
+class RecordingDetail(CachedRetrieveAPIView):
     lookup_field = 'mbid'
     lookup_url_kwarg = 'uuid'
     queryset = models.Recording.objects.all()
     serializer_class = RecordingDetailSerializer
 
+    def get_queryset(self):
+        collection_ids, permission = get_collection_ids_and_permission(self.request)
+        recordings = models.Recording.objects.with_permissions(collection_ids, permission)
+        return prefetch_recording_details(recordings, collection_ids, permission)
+
+
+class RecordingSimilar(generics.RetrieveAPIView):
+    """ The recordings with the most similar pitch histograms to a recording,
+        from the saved similarity index """
+    lookup_field = 'mbid'
+    lookup_url_kwarg = 'uuid'
+    max_count = 100
+
     def get_queryset(self):
         collection_ids = get_collection_ids_from_request_or_error(self.request)
         permission = utils.get_user_permissions(self.request.user)
         return models.Recording.objects.with_permissions(collection_ids, permission)
 
-
-class ArtistList(generics.ListAPIView):
+    def get_count(self):
+        try:
+            count = int(self.request.query_params.get('k', 10))
+        except ValueError:
+            raise ValidationError('k must be a number')
+        if count < 1 or count > self.max_count:
+            raise ValidationError('k must be between 1 and %s' % self.max_count)
+        return count
+
+    def retrieve(self, request, *args, **kwargs):
+        recording = self.get_object()
+        count = self.get_count()
+        index = similarity.get_index('carnatic')
+        mbid = str(recording.mbid)
+        if index is None or mbid not in index:
+            raise NotFound('No similarity data for this recording')
+
+        # Some of the nearest recordings may not be visible to this user, so
+        # look at more candidates than we need, and all of them if that's not enough
+        nearest = index.nearest(mbid, count * 4)
+        allowed = self.visible_recordings([m for m, d in nearest])
+        if len(allowed) < count and len(nearest) < len(index) - 1:
+            nearest = index.nearest(mbid, len(index))
+            allowed = self.visible_recordings([m for m, d in nearest])
+
+        similar = []
+        for other, distance in nearest:
+            if other in allowed:
+                data = RecordingInnerSerializer(allowed[other]).data
+                data['distance'] = distance
+                similar.append(data)
+            if len(similar) == count:
+                break
+        return Response({'mbid': mbid, 'similar': similar})
+
+    def visible_recordings(self, mbids):
+        recordings = self.get_queryset().filter(mbid__in=mbids)
+        return {str(r.mbid): r for r in recordings}
+
+
+class ArtistList(CachedListAPIView):
     queryset = models.Artist.objects.all()
     serializer_class = ArtistInnerSerializer
 
@@ -290,16 +366,50 @@ class ArtistDetailSerializer(serializers.ModelSerializer):
         return rs.data
 
 
-class ArtistDetail(generics.RetrieveAPIView):
+class ArtistDetail(CachedRetrieveAPIView):
     lookup_field = 'mbid'
     lookup_url_kwarg = 'uuid'
-    queryset = models.Artist.objects.all()
+    # The concerts of an artist are read from their stats
+    queryset = models.Artist.objects.select_related('stats')
 
     def get_serializer_class(self):
         return ArtistDetailSerializer
 
 
-class ConcertList(generics.ListAPIView):
+class ArtistRelations(generics.RetrieveAPIView):
+    """ The similar artists, gurus and students of an artist, from the saved
+        artist graph. If `to` is the mbid of another artist, also the shortest
+        chain of guru/student relations between them """
+    lookup_field = 'mbid'
+    lookup_url_kwarg = 'uuid'
+    queryset = models.Artist.objects.all()
+
+    def retrieve(self, request, *args, **kwargs):
+        artist = self.get_object()
+        graph = artistgraph.get_graph()
+        if artist.id not in graph:
+            raise NotFound('No relation data for this artist')
+
+        def inner(artistid):
+            mbid, name, begin = graph.artists[artistid]
+            return {'mbid': mbid, 'name': name}
+
+        ret = {'mbid': str(artist.mbid), 'name': artist.name}
+        ret['similar'] = [dict(inner(a), relation=desc) for a, desc in graph.similar(artist.id)]
+        ret['gurus'] = [[inner(a) for a in generation] for generation in graph.lineage(artist.id, 'gurus')]
+        ret['students'] = [[inner(a) for a in generation] for generation in graph.lineage(artist.id, 'students')]
+
+        to = request.query_params.get('to')
+        if to:
+            target = graph.id_for_mbid(to)
+            if target is None:
+                raise NotFound('No relation data for artist %s' % to)
+            path = graph.shortest_path(artist.id, target)
+            ret['path'] = [inner(a) for a in path] if path is not None else None
+        return Response(ret)
+
+
+class ConcertList(CachedListAPIView):
     queryset = models.Concert.objects.all()
     serializer_class = ConcertInnerSerializer
 
@@ -339,7 +449,7 @@ class ConcertDetailSerializer(serializers.ModelSerializer, WithImageMixin):
         return data
 
 
-class ConcertDetail(generics.RetrieveAPIView):
+class ConcertDetail(CachedRetrieveAPIView):
     lookup_field = 'mbid'
     lookup_url_kwarg = 'uuid'
     serializer_class = ConcertDetailSerializer
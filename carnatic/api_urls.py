@@ -38,9 +38,11 @@ urlpatterns = [
 
     url(r'^recording$', carnatic.api.RecordingList.as_view(), name='api-carnatic-recording-list'),
     url(r'^recording/%s$' % uuid_match, carnatic.api.RecordingDetail.as_view(), name='api-carnatic-recording-detail'),
+    url(r'^recording/%s/similar$' % uuid_match, carnatic.api.RecordingSimilar.as_view(), name='api-carnatic-recording-similar'),
 
     url(r'^artist$', carnatic.api.ArtistList.as_view(), name='api-carnatic-artist-list'),
     url(r'^artist/%s$' % uuid_match, carnatic.api.ArtistDetail.as_view(), name='api-carnatic-artist-detail'),
+    url(r'^artist/%s/relations$' % uuid_match, carnatic.api.ArtistRelations.as_view(), name='api-carnatic-artist-relations'),
 
     url(r'^concert$', carnatic.api.ConcertList.as_view(), name='api-carnatic-concert-list'),
     url(r'^concert/%s$' % uuid_match, carnatic.api.ConcertDetail.as_view(), name='api-carnatic-concert-detail')
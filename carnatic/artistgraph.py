@@ -0,0 +1,199 @@
+# Copyright 2013-2018 Music Technology Group - Universitat Pompeu Fabra
+#
+# This file is part of Dunya
+#
+# Dunya is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Affero General Public License as published by the Free Software
+# Foundation (FSF), either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see http://www.gnu.org/licenses/
+
+""" The guru/student relations between carnatic artists as an adjacency list.
+
+The graph is built from the database after an import (see dashboard.jobs)
+or with the artistgraph command, and saved to a json file. Each process
+keeps it in memory and loads it again when the file changes, so similar
+artists, lineages and paths between two artists are found without any
+queries.
+"""
+
+import collections
+import json
+import os
+import tempfile
+
+from django.apps import apps
+from django.conf import settings
+
+GRAPH_PATH = getattr(settings, "ARTIST_GRAPH_PATH", "artistgraph.json")
+
+
+def _year(begin):
+    """ The year from an artist's begin date, or 9999 if it doesn't have one """
+    try:
+        return int(begin[:4])
+    except (TypeError, ValueError):
+        return 9999
+
+
+class ArtistGraph(object):
+    """ Artists and their gurus. Artists are identified by their id.
+
+    Arguments:
+      artists: {id: (mbid, name, begin)}
+      gurus: {id: [guru ids]}
+    """
+
+    def __init__(self, artists, gurus):
+        self.artists = artists
+        self.gurus = {a: sorted(g) for a, g in gurus.items() if g}
+        students = collections.defaultdict(list)
+        for student, gs in self.gurus.items():
+            for g in gs:
+                students[g].append(student)
+        self.students = {a: sorted(s) for a, s in students.items()}
+        self._ids = {mbid: a for a, (mbid, name, begin) in artists.items() if mbid}
+
+    def __contains__(self, artistid):
+        return artistid in self.artists
+
+    @classmethod
+    def from_database(cls):
+        Artist = apps.get_model("carnatic", "Artist")
+        artists = {pk: (str(mbid) if mbid else None, name, begin)
+                   for pk, mbid, name, begin in Artist.objects.values_list("pk", "mbid", "name", "begin")}
+        gurus = collections.defaultdict(list)
+        for student, guru in Artist.gurus.through.objects.values_list("from_artist_id", "to_artist_id"):
+            gurus[student].append(guru)
+        return cls(artists, gurus)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as fp:
+            data = json.load(fp)
+        artists = {int(a): tuple(v) for a, v in data["artists"].items()}
+        gurus = {int(a): g for a, g in data["gurus"].items()}
+        return cls(artists, gurus)
+
+    def save(self, path):
+        """ Write to a temporary file and rename it so that readers
+            never see a partially written file """
+        dirname = os.path.dirname(path)
+        if dirname and not os.path.exists(dirname):
+            os.makedirs(dirname)
+        fd, tmpname = tempfile.mkstemp(dir=dirname or ".", suffix=".json")
+        with os.fdopen(fd, "w") as fp:
+            json.dump({"artists": self.artists, "gurus": self.gurus}, fp)
+        os.rename(tmpname, path)
+
+    def id_for_mbid(self, mbid):
+        return self._ids.get(str(mbid))
+
+    def name(self, artistid):
+        return self.artists[artistid][1]
+
+    def year(self, artistid):
+        return _year(self.artists[artistid][2])
+
+    def similar(self, artistid):
+        """ The [(id, description)] of the gurus of an artist, its students and
+            the other students of its gurus, in the order of Artist.similar_artists """
+        name = self.name(artistid)
+        ourage = self.year(artistid)
+        gurus = self.gurus.get(artistid, [])
+        students = self.students.get(artistid, [])
+        siblings = [(g, s) for g in gurus for s in self.students.get(g, [])]
+
+        gurus = sorted(gurus, key=self.year)
+        students = sorted(students, key=self.year)
+        siblings = sorted(siblings, key=lambda sib: abs(self.year(sib[1]) - ourage))
+
+        # we are not similar to ourselves
+        idset = {artistid}
+        ret = []
+        for g in gurus:
+            ret.append((g, "%s is the guru of %s" % (self.name(g), name)))
+            idset.add(g)
+        for s in students:
+            if s not in idset:
+                idset.add(s)
+                ret.append((s, "%s is a student of %s" % (self.name(s), name)))
+        for guru, s in siblings:
+            if s not in idset:
+                idset.add(s)
+                ret.append((s, "%s and %s share the same guru (%s)" % (name, self.name(s), self.name(guru))))
+        return ret
+
+    def lineage(self, artistid, relation="gurus"):
+        """ The generations of gurus (or students) of an artist as a list of
+            lists of ids, closest generation first """
+        edges = self.gurus if relation == "gurus" else self.students
+        seen = {artistid}
+        generations = []
+        current = [artistid]
+        while current:
+            following = []
+            for a in current:
+                for other in edges.get(a, []):
+                    if other not in seen:
+                        seen.add(other)
+                        following.append(other)
+            if following:
+                generations.append(following)
+            current = following
+        return generations
+
+    def shortest_path(self, source, target):
+        """ The ids of the artists on a shortest chain of guru/student
+            relations from `source` to `target`, including both of them,
+            or None if they aren't connected """
+        if source not in self.artists or target not in self.artists:
+            return None
+        previous = {source: None}
+        queue = collections.deque([source])
+        while queue:
+            a = queue.popleft()
+            if a == target:
+                path = []
+                while a is not None:
+                    path.append(a)
+                    a = previous[a]
+                return path[::-1]
+            for other in self.gurus.get(a, []) + self.students.get(a, []):
+                if other not in previous:
+                    previous[other] = a
+                    queue.append(other)
+        return None
+
+
+# (modification time, ArtistGraph)
+_graph = None
+
+
+def build():
+    """ Make the graph from the database and save it. Returns the graph """
+    graph = ArtistGraph.from_database()
+    graph.save(GRAPH_PATH)
+    return graph
+
+
+def get_graph():
+    """ The saved ArtistGraph, which is built if it doesn't exist yet.
+        The graph is kept in memory and loaded again if the file changes """
+    global _graph
+    try:
+        mtime = os.stat(GRAPH_PATH).st_mtime
+    except OSError:
+        build()
+        mtime = os.stat(GRAPH_PATH).st_mtime
+    if _graph and _graph[0] == mtime:
+        return _graph[1]
+    graph = ArtistGraph.load(GRAPH_PATH)
+    _graph = (mtime, graph)
+    return graph
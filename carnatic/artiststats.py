@@ -0,0 +1,162 @@
+# Copyright 2013-2018 Music Technology Group - Universitat Pompeu Fabra
+#
+# This file is part of Dunya
+#
+# Dunya is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Affero General Public License as published by the Free Software
+# Foundation (FSF), either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see http://www.gnu.org/licenses/
+
+""" Saved statistics about carnatic artists.
+
+Listing the concerts of an artist means following their concerts,
+performances and groups, and counting the raagas and taalas they perform
+means joining recordings, works and concerts. An ArtistStats keeps the
+result of these for an artist. When a concert is imported, update_concert
+makes the stats of the artists on it again (see dashboard.carnatic_importer).
+Artists without stats are computed from the tables as before, and
+update_all (the updateartiststats command) makes the stats of all artists.
+"""
+
+import collections
+
+from django.db import transaction
+
+from carnatic import models
+from dashboard import locks
+
+# How many artists update_all makes stats for at a time
+BATCH_SIZE = 500
+
+
+def _groups():
+    """ {artist id: ids of the groups they are in, and the groups those groups are in} """
+    direct = collections.defaultdict(set)
+    for group, member in models.Artist.group_members.through.objects.values_list('from_artist_id', 'to_artist_id'):
+        direct[member].add(group)
+    ret = {}
+    for artist in direct:
+        groups = set()
+        following = set(direct[artist])
+        while following:
+            groups |= following
+            following = set().union(*[direct.get(g, set()) for g in following]) - groups - {artist}
+        ret[artist] = groups
+    return ret
+
+
+def update_artists(artistids, groups=None):
+    """ Make the stats of some artists from scratch, with the same number of
+        queries for any number of artists.
+    Arguments:
+      artistids: ids of carnatic artists
+      groups: the result of _groups(), if it has already been read
+    """
+    artistids = set(artistids)
+    if not artistids:
+        return
+    if groups is None:
+        groups = _groups()
+
+    with transaction.atomic():
+        # Concerts imported at the same time can share artists. Wait for
+        # other updates of these artists so that we don't insert the same stats
+        locks.transaction_locks(["artiststats:%s" % a for a in artistids])
+        stats, concertrows, raagarows, taalarows = _make_rows(artistids, groups)
+        models.ArtistStats.objects.filter(artist_id__in=artistids).delete()
+        models.ArtistStats.objects.bulk_create(stats)
+        models.ArtistStatsConcert.objects.bulk_create(concertrows, batch_size=1000)
+        models.ArtistStatsRaaga.objects.bulk_create(raagarows, batch_size=1000)
+        models.ArtistStatsTaala.objects.bulk_create(taalarows, batch_size=1000)
+
+
+def _make_rows(artistids, groups):
+    """ The ArtistStats of some artists, and their concert, raaga and taala rows """
+    everyone = artistids.union(*[groups.get(a, set()) for a in artistids])
+
+    # The concerts each artist (or group) is a primary artist of or performs in
+    own = collections.defaultdict(set)
+    primary = list(models.Concert.artists.through.objects.filter(artist_id__in=everyone)
+                   .values_list('artist_id', 'concert_id'))
+    for artistid, concertid in primary:
+        own[artistid].add(concertid)
+    # The recordings that each artist performs in, for the raaga and taala counts
+    recordings = collections.defaultdict(set)
+    performances = models.InstrumentPerformance.objects.filter(artist_id__in=everyone)
+    for artistid, recordingid, concertid in performances.values_list('artist_id', 'recording_id', 'recording__concert').distinct():
+        if concertid is not None:
+            own[artistid].add(concertid)
+        if artistid in artistids:
+            recordings[artistid].add(recordingid)
+
+    # Primary artists perform in all recordings of their concerts
+    primary = [(a, c) for a, c in primary if a in artistids]
+    tracks = collections.defaultdict(set)
+    for concertid, recordingid in models.ConcertRecording.objects.filter(concert_id__in={c for a, c in primary}) \
+            .values_list('concert_id', 'recording_id'):
+        tracks[concertid].add(recordingid)
+    for artistid, concertid in primary:
+        recordings[artistid] |= tracks[concertid]
+
+    allrecordings = set().union(*recordings.values()) if recordings else set()
+    raagas = collections.defaultdict(set)
+    taalas = collections.defaultdict(set)
+    for recordingid, raagaid, taalaid in models.RecordingWork.objects.filter(recording_id__in=allrecordings) \
+            .values_list('recording_id', 'work__raaga_id', 'work__taala_id'):
+        if raagaid is not None:
+            raagas[recordingid].add(raagaid)
+        if taalaid is not None:
+            taalas[recordingid].add(taalaid)
+
+    allconcerts = set().union(*own.values()) if own else set()
+    concertcollections = dict(models.Concert.objects.filter(id__in=allconcerts).values_list('id', 'collection_id'))
+
+    stats = []
+    concertrows = []
+    raagarows = []
+    taalarows = []
+    for artistid in artistids:
+        stats.append(models.ArtistStats(artist_id=artistid))
+        grouped = set().union(*[own.get(g, set()) for g in groups.get(artistid, set())]) - own[artistid]
+        for concertid in own[artistid] | grouped:
+            concertrows.append(models.ArtistStatsConcert(stats_id=artistid, concert_id=concertid,
+                                                         collection_id=concertcollections.get(concertid),
+                                                         via_group=concertid in grouped))
+        # The number of recordings of each raaga and taala
+        raagacount = collections.Counter()
+        taalacount = collections.Counter()
+        for recordingid in recordings[artistid]:
+            raagacount.update(raagas[recordingid])
+            taalacount.update(taalas[recordingid])
+        raagarows.extend(models.ArtistStatsRaaga(stats_id=artistid, raaga_id=r, count=c) for r, c in raagacount.items())
+        taalarows.extend(models.ArtistStatsTaala(stats_id=artistid, taala_id=t, count=c) for t, c in taalacount.items())
+    return stats, concertrows, raagarows, taalarows
+
+
+def update_concert(concert):
+    """ Update the stats of the artists on a concert after it was imported:
+        its primary artists and performers, the members of these if they are
+        groups, and artists who were on the concert before """
+    performers = set(concert.artists.values_list('id', flat=True))
+    performers |= set(models.InstrumentPerformance.objects.filter(recording__concert=concert)
+                      .values_list('artist_id', flat=True))
+    previous = set(models.ArtistStatsConcert.objects.filter(concert=concert).values_list('stats_id', flat=True))
+    groups = _groups()
+    members = {member for member, ingroups in groups.items() if ingroups & performers}
+    update_artists(performers | members | previous, groups)
+
+
+def update_all():
+    """ Make the stats of every artist. Returns the number of artists """
+    groups = _groups()
+    artistids = list(models.Artist.objects.values_list('id', flat=True))
+    for i in range(0, len(artistids), BATCH_SIZE):
+        update_artists(artistids[i:i + BATCH_SIZE], groups)
+    return len(artistids)
@@ -0,0 +1,51 @@
+# Copyright 2013,2014 Music Technology Group - Universitat Pompeu Fabra
+#
+# This file is part of Dunya
+#
+# Dunya is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Affero General Public License as published by the Free Software
+# Foundation (FSF), either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see http://www.gnu.org/licenses/
+
+from __future__ import print_function
+
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from carnatic import artistgraph
+
+
+class Command(BaseCommand):
+    help = 'Build the carnatic guru/student graph and time queries on it'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-n', '--queries', type=int, default=1000,
+                            help='How many artists to time queries for (default 1000)')
+
+    def handle(self, *args, **options):
+        graph = artistgraph.build()
+        related = sorted(set(graph.gurus) | set(graph.students))
+        print("%s artists, %s with gurus or students, saved to %s" % (
+            len(graph.artists), len(related), artistgraph.GRAPH_PATH))
+        if not related:
+            return
+
+        artists = [random.choice(related) for i in range(options['queries'])]
+        pairs = [(random.choice(related), random.choice(related)) for i in range(options['queries'])]
+        for name, function, args in [('similar', graph.similar, [(a, ) for a in artists]),
+                                     ('lineage', graph.lineage, [(a, ) for a in artists]),
+                                     ('shortest path', graph.shortest_path, pairs)]:
+            start = time.perf_counter()
+            for a in args:
+                function(*a)
+            elapsed = time.perf_counter() - start
+            print("%s: %.1f microseconds per query" % (name, elapsed * 1e6 / len(args)))
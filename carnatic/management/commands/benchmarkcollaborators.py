@@ -0,0 +1,94 @@
+# Copyright 2013,2014 Music Technology Group - Universitat Pompeu Fabra
+#
+# This file is part of Dunya
+#
+# Dunya is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Affero General Public License as published by the Free Software
+# Foundation (FSF), either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see http://www.gnu.org/licenses/
+
+from __future__ import print_function
+
+import random
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+import data.models
+from carnatic import models
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Time Artist.collaborating_artists on a synthetic catalogue, which is removed afterwards'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-c', '--concerts', type=int, default=5000, help='Number of concerts (default 5000)')
+        parser.add_argument('-a', '--artists', type=int, default=500, help='Number of artists (default 500)')
+        parser.add_argument('-r', '--recordings', type=int, default=4, help='Recordings per concert (default 4)')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def make_catalogue(self, numconcerts, numartists, numrecordings):
+        collections = [data.models.Collection.objects.create(name="benchmark %s" % p, collectionid=uuid.uuid4(),
+                                                             permission=p) for p in ["U", "R", "S"]]
+        artists = models.Artist.objects.bulk_create(
+            [models.Artist(name="artist %s" % i, mbid=uuid.uuid4()) for i in range(numartists)])
+        instrument = models.Instrument.objects.create(name="benchmark", mbid=uuid.uuid4())
+        concerts = models.Concert.objects.bulk_create(
+            [models.Concert(title="concert %s" % i, mbid=uuid.uuid4(), year=random.randint(1950, 2010),
+                            collection=random.choice(collections)) for i in range(numconcerts)])
+        recordings = models.Recording.objects.bulk_create(
+            [models.Recording(title="recording %s" % i, mbid=uuid.uuid4()) for i in range(numconcerts * numrecordings)])
+
+        # A few artists are on many concerts, as in the real catalogue
+        weights = [1.0 / (i + 1) for i in range(numartists)]
+        concertartists = []
+        tracks = []
+        performances = []
+        for i, concert in enumerate(concerts):
+            for artist in set(random.choices(artists, weights, k=3)):
+                concertartists.append(models.Concert.artists.through(concert=concert, artist=artist))
+            for j, recording in enumerate(recordings[i * numrecordings:(i + 1) * numrecordings]):
+                tracks.append(models.ConcertRecording(concert=concert, recording=recording,
+                                                      track=j + 1, disc=1, disctrack=j + 1))
+                for artist in set(random.choices(artists, weights, k=2)):
+                    performances.append(models.InstrumentPerformance(recording=recording, artist=artist,
+                                                                     instrument=instrument))
+        models.Concert.artists.through.objects.bulk_create(concertartists, batch_size=1000)
+        models.ConcertRecording.objects.bulk_create(tracks, batch_size=1000)
+        models.InstrumentPerformance.objects.bulk_create(performances, batch_size=1000)
+        return artists, [str(c.collectionid) for c in collections]
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        try:
+            with transaction.atomic():
+                start = time.perf_counter()
+                artists, collectionids = self.make_catalogue(options['concerts'], options['artists'],
+                                                             options['recordings'])
+                self.stdout.write("Made %s concerts in %.1fs" % (options['concerts'], time.perf_counter() - start))
+
+                for artist in [artists[0], artists[len(artists) // 10], artists[-1]]:
+                    concerts = len(artist._collaboration_concerts())
+                    with CaptureQueriesContext(connection) as queries:
+                        start = time.perf_counter()
+                        collaborators = artist.collaborating_artists(collectionids[:1], ['U'])
+                        elapsed = time.perf_counter() - start
+                    self.stdout.write("%s: %s concerts, %s collaborators, %s queries, %.1fms" % (
+                        artist.name, concerts, len(collaborators), len(queries), elapsed * 1000))
+                raise Rollback()
+        except Rollback:
+            pass
@@ -20,6 +20,7 @@ import csv
 
 from django.core.management.base import BaseCommand
 
+from carnatic import artistgraph
 from carnatic import models
 
 
@@ -61,3 +62,5 @@ class Command(BaseCommand):
                 a.save()
             except models.GeographicRegion.DoesNotExist:
                 print("  * cannot find state %s" % place)
+
+        artistgraph.build()
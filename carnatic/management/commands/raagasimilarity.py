@@ -20,7 +20,6 @@ import collections
 import decimal
 import json
 
-import compmusic.extractors.similaritylib.raaga
 import numpy as np
 import os
 from compmusic.extractors.similaritylib import recording
@@ -30,7 +29,7 @@ from scipy.ndimage.filters import gaussian_filter
 
 import carnatic
 import hindustani
-from docserver import util
+from data import pitchhistogram
 
 
 class Command(BaseCommand):
@@ -96,25 +95,10 @@ class Command(BaseCommand):
         json.dump(ret, open(name, "wb"), indent=2)
 
     def calc_profile(self, raag, recordings):
-        average = compmusic.extractors.similaritylib.raaga.Raaga(raag.name, "")
-        pitches = []
-        tonics = []
-        for r in recordings:
-            mbid = r.mbid
-            try:
-                pitch = util.docserver_get_json(mbid, "pitch", "pitch")
-                tonic = util.docserver_get_contents(mbid, "votedtonic", "tonic")
-                try:
-                    tonic = float(tonic)
-                    npp = np.array(pitch)
-                    pitches.append(npp)
-                    tonics.append(tonic)
-                except ValueError:
-                    pass
-            except util.NoFileException:
-                pass
-        average.compute_average_hist_data(pitches, tonics)
-        profile = average.average_hist[:, 0]
+        histogram = pitchhistogram.average_histogram(recordings)
+        if histogram is None:
+            return None
+        profile = histogram[:, 0]
         y = np.concatenate((profile[-50:], profile[:-50]))
         y = gaussian_filter(y, 7)
         return y.tolist()
@@ -132,7 +116,8 @@ class Command(BaseCommand):
         for i, (raag, recordings) in enumerate(recmap.items(), 1):
             print("(%s/%s) %s" % (i, numraagas, raag))
             profile = self.calc_profile(raag, recordings)
-            raagaprofiles[raag] = profile
+            if profile is not None:
+                raagaprofiles[raag] = profile
 
         for r, profile in raagaprofiles.items():
             # We make a copy of the profiles so that we can delete
@@ -155,7 +140,8 @@ class Command(BaseCommand):
         for i, (raag, recordings) in enumerate(recmap.items(), 1):
             print("(%s/%s) %s" % (i, numraagas, raag))
             profile = self.calc_profile(raag, recordings)
-            raagaprofiles[raag] = profile
+            if profile is not None:
+                raagaprofiles[raag] = profile
 
         for r, profile in raagaprofiles.items():
             # We make a copy of the profiles so that we can delete
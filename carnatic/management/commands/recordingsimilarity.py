@@ -16,126 +16,114 @@
 
 from __future__ import print_function
 
-import json
-
+import collections
+import multiprocessing
 import os
-from compmusic.extractors.similaritylib import recording
-from django.conf import settings
+
+import numpy as np
 from django.core.management.base import BaseCommand
 
-import carnatic
-import hindustani
-from docserver import util
+import carnatic.models
+import hindustani.models
+from carnatic import similarity
+
+
+def _compute_raaga(args):
+    """ Compute and save the distance matrix of one raaga. Module-level
+        so that it can be run in a multiprocessing pool """
+    path, mbids, histograms, measure = args
+    distances = similarity.distance_matrix(histograms, measure)
+    similarity.save_matrix(path, mbids, distances)
+    return path, len(mbids)
 
 
 class Command(BaseCommand):
     help = 'Calculate recording similarity between recordings of the same raaga'
-    intonationmap = {}
-    distancemap = {}
-
-    def make_data(self, obj, module):
-        mbid = obj["mbid"]
-        sim = obj["similar"]
-        if not sim:
-            return None
-        insert = {"id": "sim_%s" % (mbid,),
-                  "similar_s": json.dumps(sim),
-                  "mbid_t": mbid,
-                  "doctype_s": "recordingsimilarity",
-                  "module_s": module
-                  }
-        return insert
-
-    def import_solr(self, module):
-        dirname = "similarity-%s" % module
-        files = os.listdir(dirname)
-        ret = []
-        for f in files:
-            path = os.path.join(dirname, f)
-            data = json.load(open(path))
-            val = self.make_data(data, module)
-            if val:
-                ret.append(val)
-        # self.solr.add(ret)
-        # self.solr.commit()
-
-    def compute_distance(self, a, b):
-        if a in self.intonationmap:
-            # print " -hit a"
-            adata = self.intonationmap[a]
-        else:
-            try:
-                adata = util.docserver_get_json(a, "normalisedpitch", "normalisedhistogram")
-            except util.NoFileException:
-                print("can't find recording %s in docserver" % a)
-                self.intonationmap[a] = None
-                return None
-            self.intonationmap[a] = adata
-        if b in self.intonationmap:
-            # print " -hit b"
-            bdata = self.intonationmap[b]
-        else:
-            try:
-                bdata = util.docserver_get_json(b, "normalisedpitch", "normalisedhistogram")
-            except util.NoFileException:
-                print("can't find recording %s in docserver" % b)
-                return None
-            self.intonationmap[b] = bdata
-
-        if adata is None or bdata is None:
-            return None
-
-        if (a, b) in self.distancemap:
-            # print " -hit d-ab"
-            distance = self.distancemap[(a, b)]
-        elif (b, a) in self.distancemap:
-            # print " -hit d-ba"
-            distance = self.distancemap[(b, a)]
-        else:
-            distance = recording.kldiv(adata, bdata)
-            self.distancemap[(a, b)] = distance
-        return distance
-
-    def compute_similarity(self, rec, otherrecordings):
-        rid = rec.mbid
-        try:
-            os.makedirs("similarity")
-        except OSError:
-            pass
-        sims = []
-        for o in otherrecordings:
-            oid = o.mbid
-            distance = self.compute_distance(rid, oid)
-            if distance:
-                sims.append((oid, distance))
-        sims = sorted(sims, key=lambda a: a[1])
-        name = "similarity/%s.json" % rid
-        ret = {"mbid": rid, "similar": sims}
-        json.dump(ret, open(name, "wb"))
-
-    def compute_matrix_carnatic(self):
-        recordings = carnatic.models.Recording.objects.filter(concert__collection__permission__in=['R', 'U'])
-        total = len(recordings)
-        for i, rec in enumerate(recordings, 1):
+
+    def add_arguments(self, parser):
+        parser.add_argument('-t', '--tradition',
+                            dest='tradition',
+                            default='carnatic',
+                            choices=['carnatic', 'hindustani'],
+                            help='Compute similarity for carnatic or hindustani recordings')
+        parser.add_argument('-m', '--measure',
+                            dest='measure',
+                            default='kl',
+                            choices=list(similarity.MEASURES.keys()),
+                            help='Symmetric Kullback-Leibler (kl) or Jensen-Shannon (js) divergence')
+        parser.add_argument('-p', '--processes',
+                            type=int,
+                            dest='processes',
+                            default=1,
+                            help='Number of processes to compute raagas in parallel')
+        parser.add_argument('-d', '--directory',
+                            dest='directory',
+                            default=None,
+                            help='Directory to write results to (default similarity-<tradition>)')
+
+    def load_histograms(self, recordings):
+        """ Returns ([mbid, ...], 2d array of histograms) for the recordings
+            which have a normalised histogram of the same length """
+        mbids = []
+        histograms = []
+        for mbid in recordings:
+            hist = similarity.get_histogram(mbid)
+            if hist is None:
+                print("can't find a histogram for recording %s in docserver" % mbid)
+                continue
+            if histograms and len(hist) != len(histograms[0]):
+                print("histogram for recording %s has the wrong shape %s" % (mbid, hist.shape))
+                continue
+            mbids.append(mbid)
+            histograms.append(hist)
+        return mbids, np.array(histograms)
+
+    def recordings_carnatic(self):
+        """ {raaga: [mbid, ...]} for all carnatic recordings with a raaga """
+        recordings = carnatic.models.Recording.objects.filter(
+            concert__collection__permission__in=['R', 'U']).distinct().prefetch_related(
+            'forms', 'raagas', 'works__raaga')
+        raagamap = collections.defaultdict(list)
+        for rec in recordings:
             raaga = rec.get_raaga()
             if raaga:
-                otherrecordings = carnatic.models.Recording.objects.filter(works__raaga=raaga[0],
-                                                                           concert__collection__permission__in=['R',
-                                                                                                                'U']).exclude(
-                    pk=rec.pk).distinct()
-                print("Recording %s (%s/%s)" % (rec, i, total))
-                self.compute_similarity(rec, otherrecordings)
-
-    def compute_matrix_hindustani(self):
-        recordings = hindustani.models.Recording.objects.all()
-        total = len(recordings)
-        for i, rec in enumerate(recordings, 1):
-            if rec.raags.count() == 1:
-                raag = rec.raags.get()
-                otherrecordings = hindustani.models.Recording.objects.filter(raags__in=[raag]).exclude(
-                    pk=rec.pk).distinct()
-                print("Recording %s (%s/%s)" % (rec, i, total))
-                self.compute_similarity(rec, otherrecordings)
+                raagamap[raaga[0]].append(str(rec.mbid))
+        return raagamap
+
+    def recordings_hindustani(self):
+        """ {raag: [mbid, ...]} for all hindustani recordings with only one raag """
+        recordings = hindustani.models.Recording.objects.prefetch_related('raags')
+        raagamap = collections.defaultdict(list)
+        for rec in recordings:
+            raags = rec.raags.all()
+            if len(raags) == 1:
+                raagamap[raags[0]].append(str(rec.mbid))
+        return raagamap
 
     def handle(self, *args, **options):
-        self.compute_matrix_carnatic()
+        tradition = options["tradition"]
+        measure = options["measure"]
+        directory = options["directory"] or "similarity-%s" % tradition
+
+        if tradition == "carnatic":
+            raagamap = self.recordings_carnatic()
+        else:
+            raagamap = self.recordings_hindustani()
+
+        tasks = []
+        total = len(raagamap)
+        for i, (raaga, recordings) in enumerate(raagamap.items(), 1):
+            print("Loading raaga %s (%s/%s), %s recordings" % (raaga, i, total, len(recordings)))
+            mbids, histograms = self.load_histograms(recordings)
+            if len(mbids) < 2:
+                continue
+            path = os.path.join(directory, "%s.npz" % raaga.pk)
+            tasks.append((path, mbids, histograms, measure))
+
+        if options["processes"] > 1:
+            with multiprocessing.Pool(options["processes"]) as pool:
+                for path, count in pool.imap_unordered(_compute_raaga, tasks):
+                    print("Saved %s recordings to %s" % (count, path))
+        else:
+            for path, count in map(_compute_raaga, tasks):
+                print("Saved %s recordings to %s" % (count, path))
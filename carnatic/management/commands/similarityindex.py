@@ -0,0 +1,54 @@
+# Copyright 2013,2014 Music Technology Group - Universitat Pompeu Fabra
+#
+# This file is part of Dunya
+#
+# Dunya is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Affero General Public License as published by the Free Software
+# Foundation (FSF), either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see http://www.gnu.org/licenses/
+
+from __future__ import print_function
+
+from django.core.management.base import BaseCommand
+
+import carnatic.models
+import hindustani.models
+from carnatic import similarity
+
+
+class Command(BaseCommand):
+    help = 'Build the recording similarity index of a tradition, or add recordings to it'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-t', '--tradition',
+                            dest='tradition',
+                            default='carnatic',
+                            choices=['carnatic', 'hindustani'],
+                            help='Index carnatic or hindustani recordings')
+        parser.add_argument('-a', '--add',
+                            dest='add',
+                            nargs='+',
+                            metavar='MBID',
+                            help='Only add these recordings to the existing index instead of rebuilding it')
+
+    def handle(self, *args, **options):
+        tradition = options["tradition"]
+        if options["add"]:
+            added = similarity.add_recordings(tradition, options["add"])
+            print("Added %s of %s recordings to the %s index" % (added, len(options["add"]), tradition))
+            return
+
+        if tradition == "carnatic":
+            recordings = carnatic.models.Recording.objects
+        else:
+            recordings = hindustani.models.Recording.objects
+        mbids = [str(m) for m in recordings.values_list('mbid', flat=True)]
+        index = similarity.build_index(tradition, mbids)
+        print("Indexed %s of %s recordings in %s" % (len(index), len(mbids), similarity.index_path(tradition)))
@@ -0,0 +1,32 @@
+# Copyright 2013,2014 Music Technology Group - Universitat Pompeu Fabra
+#
+# This file is part of Dunya
+#
+# Dunya is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Affero General Public License as published by the Free Software
+# Foundation (FSF), either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see http://www.gnu.org/licenses/
+
+from __future__ import print_function
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from carnatic import artiststats
+
+
+class Command(BaseCommand):
+    help = 'Make the saved concerts, raagas and taalas of every carnatic artist'
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = artiststats.update_all()
+        print("Made the stats of %s artists in %.1f seconds" % (count, time.perf_counter() - start))
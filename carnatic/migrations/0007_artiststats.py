@@ -0,0 +1,51 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data', '0007_autocompleteentry'),
+        ('carnatic', '0006_recording_search_text'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArtistStats',
+            fields=[
+                ('artist', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='carnatic.Artist')),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArtistStatsConcert',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('via_group', models.BooleanField(default=False)),
+                ('collection', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='data.Collection')),
+                ('concert', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='carnatic.Concert')),
+                ('stats', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='concerts', to='carnatic.ArtistStats')),
+            ],
+            options={
+                'unique_together': {('stats', 'concert')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ArtistStatsRaaga',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.IntegerField()),
+                ('raaga', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='carnatic.Raaga')),
+                ('stats', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='raagas', to='carnatic.ArtistStats')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArtistStatsTaala',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.IntegerField()),
+                ('stats', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='taalas', to='carnatic.ArtistStats')),
+                ('taala', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='carnatic.Taala')),
+            ],
+        ),
+    ]
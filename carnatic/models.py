@@ -18,6 +18,7 @@ import collections
 import random
 from typing import List, Optional
 
+from django.contrib.postgres.indexes import GinIndex
 from django.urls import reverse
 from django.db import models
 from django.db.models import Count
@@ -25,6 +26,7 @@ from django.db.models import Q
 from django.utils.text import slugify
 
 import data.models
+from carnatic import artistgraph
 from carnatic import managers
 
 
@@ -61,43 +63,50 @@ class Artist(CarnaticStyle, data.models.Artist):
     gurus = models.ManyToManyField("Artist", related_name="students")
 
     def similar_artists(self):
-        idset = set()
-        # we are not similar to ourselves
-        idset.add(self.id)
-        ids = []
-        gurus = []
-        students = []
-        siblings = []
-        for g in self.gurus.all():
-            # TODO: This should be inline_artist stuff
-            gurus.append(g)
-        for s in self.students.all():
-            students.append(s)
-        for g in self.gurus.all():
-            for s in g.students.all():
-                siblings.append((g, s))
-
-        # sort each group by age
-        ourage = int(self.begin[:4]) if self.begin else 9999
-        gurus = sorted(gurus, key=lambda a: int(a.begin[:4]) if a.begin else 9999)
-        students = sorted(students, key=lambda a: int(a.begin[:4]) if a.begin else 9999)
-        siblings = sorted(siblings, key=lambda a: abs((int(a[1].begin[:4]) if a[1].begin else 9999) - ourage))
-
-        for g in gurus:
-            ids.append((g.id, "%s is the guru of %s" % (g.name, self.name)))
-            idset.add(g.id)
-        for s in students:
-            if s.id not in idset:
-                idset.add(s.id)
-                ids.append((s.id, "%s is a student of %s" % (s.name, self.name)))
-        for sib in siblings:
-            guru = sib[0]
-            s = sib[1]
-            if s.id not in idset:
-                idset.add(s.id)
-                ids.append((s.id, "%s and %s share the same guru (%s)" % (self.name, s.name, guru.name)))
-
-        return [(Artist.objects.get(pk=pk), desc) for pk, desc in ids]
+        """ [(artist, description)] of the gurus, students and guru-siblings
+            of this artist, from the saved artist graph """
+        graph = artistgraph.get_graph()
+        if self.id not in graph:
+            return []
+        ids = graph.similar(self.id)
+        artists = Artist.objects.in_bulk([pk for pk, desc in ids])
+        return [(artists[pk], desc) for pk, desc in ids if pk in artists]
+
+    def _group_ids(self):
+        """ The ids of the groups this artist is in, and the groups those groups are in """
+        ids = set()
+        members = {self.id}
+        while members:
+            groups = set(Artist.objects.filter(group_members__in=members).values_list('id', flat=True))
+            members = groups - ids - {self.id}
+            ids |= members
+        return ids
+
+    def _concert_ids(self):
+        """ The ids of the concerts of this artist, as ({concerts they are a primary
+            artist of or perform in}, {concerts of the groups they are in}) """
+        own = set(self.primary_concerts.values_list('id', flat=True))
+        own |= set(Concert.objects.filter(recordings__instrumentperformance__artist=self).values_list('id', flat=True))
+        groups = self._group_ids()
+        grouped = set()
+        if groups:
+            grouped = set(Concert.objects.filter(Q(artists__in=groups) | Q(recordings__instrumentperformance__artist__in=groups))
+                          .values_list('id', flat=True))
+        return own, grouped - own
+
+    def _collaboration_concerts(self):
+        """ The concerts in self.concerts(permission=['U', 'R', 'S']) in the
+            same order, with a constant number of queries """
+        own, grouped = self._concert_ids()
+        # Concerts of groups are only listed from universal collections, see concerts()
+        concerts = Concert.objects.filter(Q(id__in=own, collection__permission__in=['U', 'R', 'S']) |
+                                          Q(id__in=grouped, collection__permission="U")).select_related('collection')
+        primary = set(self.primary_concerts.values_list('id', flat=True))
+
+        def order(concert):
+            source = 0 if concert.id in primary else 1 if concert.id in grouped else 2
+            return (concert.year if concert.year else 0, source, concert.id)
+        return sorted(concerts, key=order)
 
     def collaborating_artists(self, collection_ids: List[str]=False, permission=False):
         # Returns [ (collaborating artist, list of concerts, number of restricted concerts) ]
@@ -108,22 +117,38 @@ class Artist(CarnaticStyle, data.models.Artist):
         if not permission:
             permission = ["U"]
 
+        allconcerts = self._collaboration_concerts()
+        concertids = [concert.id for concert in allconcerts]
+        # The performers of each concert in the same order as Concert.performers():
+        # the primary artists, then the other artists in its performances
+        performers = collections.defaultdict(list)
+        primary = Concert.artists.through.objects.filter(concert_id__in=concertids)
+        for concertid, artistid in primary.order_by('artist_id').values_list('concert_id', 'artist_id'):
+            performers[concertid].append(artistid)
+        performances = InstrumentPerformance.objects.filter(recording__concert__in=concertids)
+        for concertid, artistid in performances.order_by('artist_id').values_list('recording__concert', 'artist_id').distinct():
+            if artistid not in performers[concertid]:
+                performers[concertid].append(artistid)
+
         c = collections.Counter()
         concerts = collections.defaultdict(set)
         restr_concerts = collections.Counter()
-        for concert in self.concerts(collection_ids=False, permission=['U', 'R', 'S']):
+        for concert in allconcerts:
             # We always use collections to see if an artist is similar
             # However, if the user can't see collections, we need to say
             # `Artist a performed with b on these concerts and n more`
-            for p in concert.performers():
-                if p.id != self.id:
-                    if collection_ids and concert.collection and str(concert.collection.collectionid) in collection_ids and concert.collection.permission in permission:
-                        concerts[p.id].add(concert)
+            visible = collection_ids and concert.collection and str(concert.collection.collectionid) in collection_ids \
+                and concert.collection.permission in permission
+            for pid in performers[concert.id]:
+                if pid != self.id:
+                    if visible:
+                        concerts[pid].add(concert)
                     else:
-                        restr_concerts[p.id] += 1
-                    c[p.id] += 1
+                        restr_concerts[pid] += 1
+                    c[pid] += 1
 
-        collaborators = [(Artist.objects.get(pk=pk), sorted(list(concerts[pk]), key=lambda c: c.title), restr_concerts[pk]) for pk, count in c.most_common()]
+        artists = Artist.objects.in_bulk(list(c))
+        collaborators = [(artists[pk], sorted(list(concerts[pk]), key=lambda c: c.title), restr_concerts[pk]) for pk, count in c.most_common()]
         collaborators = sorted(collaborators, key=lambda c: (len(c[1]) + c[2], len(c[1])), reverse=True)
         return collaborators
 
@@ -146,6 +171,10 @@ class Artist(CarnaticStyle, data.models.Artist):
         if collection_ids is None:
             collection_ids = []
 
+        stats = self.get_stats()
+        if stats and not raagas and not taalas:
+            return stats.get_concerts(collection_ids, permission)
+
         ret = []
         concerts = self.primary_concerts.with_permissions(collection_ids, permission)
         if raagas:
@@ -205,7 +234,17 @@ class Artist(CarnaticStyle, data.models.Artist):
         VOICE = "d92884b7-ee0c-46d5-96f3-918196ba8c5b"
         return self.main_instrument and str(self.main_instrument.mbid) in [VIOLIN, VOICE]
 
+    def get_stats(self):
+        """ The ArtistStats of this artist, or None if they haven't been made """
+        try:
+            return self.stats
+        except ArtistStats.DoesNotExist:
+            return None
+
     def get_performed_taalas(self):
+        stats = self.get_stats()
+        if stats:
+            return [(t.taala, t.count) for t in stats.taalas.select_related('taala').order_by('-count', 'taala_id')]
         taalamap = {}
         taalacount = collections.Counter()
         taalas = Taala.objects.filter(Q(work__recording__concert__artists=self) | Q(work__recording__instrumentperformance__artist=self))
@@ -228,6 +267,9 @@ class Artist(CarnaticStyle, data.models.Artist):
         Returns:
           an ordered list of (raaga, count), ordered by count desc
         """
+        stats = self.get_stats()
+        if stats:
+            return [(r.raaga, r.count) for r in stats.raagas.select_related('raaga').order_by('-count', 'raaga_id')]
         raagamap = {}
         raagacount = collections.Counter()
         raagas = Raaga.objects.filter(Q(work__recording__concert__artists=self) | Q(work__recording__instrumentperformance__artist=self))
@@ -245,6 +287,50 @@ class ArtistAlias(CarnaticStyle, data.models.ArtistAlias):
     pass
 
 
+class ArtistStats(models.Model):
+    """ The concerts of an artist and the raagas and taalas they perform,
+        kept up to date by the release importer. See carnatic.artiststats """
+    artist = models.OneToOneField(Artist, primary_key=True, related_name="stats", on_delete=models.CASCADE)
+    updated = models.DateTimeField(auto_now=True)
+
+    def get_concerts(self, collection_ids, permission):
+        """ The concerts that Artist.concerts returns, ordered by year """
+        rows = self.concerts.filter(collection__permission__in=permission)
+        # Concerts of groups are only listed from universal collections
+        rows = rows.filter(Q(via_group=False) | Q(collection__permission="U"))
+        if collection_ids:
+            rows = rows.filter(collection__collectionid__in=collection_ids)
+        concerts = Concert.objects.filter(id__in=rows.values('concert_id')).select_related('collection')
+        return sorted(concerts, key=lambda c: c.year if c.year else 0)
+
+    def __str__(self):
+        return u"Stats for %s" % self.artist
+
+
+class ArtistStatsConcert(models.Model):
+    stats = models.ForeignKey(ArtistStats, related_name="concerts", on_delete=models.CASCADE)
+    concert = models.ForeignKey('Concert', on_delete=models.CASCADE)
+    collection = models.ForeignKey('data.Collection', blank=True, null=True, on_delete=models.CASCADE)
+    # If the artist is only on the concert because they are in a group which performs on it
+    via_group = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = ("stats", "concert")
+
+
+class ArtistStatsRaaga(models.Model):
+    stats = models.ForeignKey(ArtistStats, related_name="raagas", on_delete=models.CASCADE)
+    raaga = models.ForeignKey('Raaga', on_delete=models.CASCADE)
+    # The number of recordings of this raaga the artist performs in
+    count = models.IntegerField()
+
+
+class ArtistStatsTaala(models.Model):
+    stats = models.ForeignKey(ArtistStats, related_name="taalas", on_delete=models.CASCADE)
+    taala = models.ForeignKey('Taala', on_delete=models.CASCADE)
+    count = models.IntegerField()
+
+
 class ConcertRecording(models.Model):
     """ Links a concert to a recording with an explicit ordering """
     concert = models.ForeignKey('Concert', on_delete=models.CASCADE)
@@ -529,6 +615,10 @@ class RecordingWork(models.Model):
 class Recording(CarnaticStyle, data.models.Recording):
     class Meta:
         ordering = ['id']
+        indexes = [GinIndex(fields=["search_text"], name="carnatic_rec_search_trgm", opclasses=["gin_trgm_ops"])]
+
+    # Titles of the recording, its works and releases, see data.search
+    search_text = models.TextField(blank=True, default="")
 
     works = models.ManyToManyField('Work', through='RecordingWork')
     forms = models.ManyToManyField('Form', through='RecordingForm')
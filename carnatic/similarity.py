@@ -0,0 +1,272 @@
+# Copyright 2013,2014 Music Technology Group - Universitat Pompeu Fabra
+#
+# This file is part of Dunya
+#
+# Dunya is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Affero General Public License as published by the Free Software
+# Foundation (FSF), either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see http://www.gnu.org/licenses/
+
+""" Distances between pitch histograms, computed for a whole set
+of histograms at once instead of pair by pair. """
+
+import os
+import tempfile
+
+import numpy as np
+from django.conf import settings
+
+import docserver.exceptions
+from docserver import util
+
+# Where the similarity index of each tradition is saved
+INDEX_DIR = getattr(settings, "SIMILARITY_INDEX_DIR", "similarity-index")
+
+# Added to every bin so that empty bins don't make the divergence infinite
+EPSILON = 1e-10
+
+
+def get_histogram(mbid):
+    """ The normalised pitch histogram of a recording as a 1d array,
+        or None if the recording doesn't have one """
+    try:
+        hist = util.docserver_get_array(mbid, "normalisedpitch", "normalisedhistogram", mmap=False)
+    except docserver.exceptions.NoFileException:
+        return None
+    hist = np.asarray(hist, dtype=np.float64)
+    if hist.ndim != 1:
+        return None
+    return hist
+
+
+def normalise(histograms):
+    """ Turn each row of a 2d array into a probability distribution """
+    histograms = np.asarray(histograms, dtype=np.float64) + EPSILON
+    return histograms / histograms.sum(axis=1, keepdims=True)
+
+
+def kl_matrix(histograms, symmetric=True):
+    """ The Kullback-Leibler divergence between every pair of rows of `histograms`.
+    Element [i, j] is D(i || j), or D(i || j) + D(j || i) if `symmetric` is set.
+
+    D(p || q) = sum(p * log p) - sum(p * log q), so the second term for all
+    pairs is one matrix product.
+    """
+    p = normalise(histograms)
+    logp = np.log(p)
+    entropy = (p * logp).sum(axis=1)
+    div = entropy[:, np.newaxis] - p.dot(logp.T)
+    if symmetric:
+        div = div + div.T
+    np.fill_diagonal(div, 0)
+    # Rounding errors can make some values very slightly negative
+    return np.maximum(div, 0)
+
+
+def js_matrix(histograms, blocksize=64):
+    """ The Jensen-Shannon divergence between every pair of rows of `histograms`.
+    The mixture distribution is different for each pair, so rows are done
+    `blocksize` at a time to limit memory use. """
+    p = normalise(histograms)
+    plogp = (p * np.log(p)).sum(axis=1)
+    n = p.shape[0]
+    div = np.zeros((n, n))
+    for start in range(0, n, blocksize):
+        block = p[start:start + blocksize]
+        m = (block[:, np.newaxis, :] + p[np.newaxis, :, :]) / 2
+        mlogm = (m * np.log(m)).sum(axis=2)
+        div[start:start + blocksize] = (plogp[start:start + blocksize, np.newaxis] + plogp[np.newaxis, :]) / 2 - mlogm
+    np.fill_diagonal(div, 0)
+    return np.maximum(div, 0)
+
+
+MEASURES = {"kl": kl_matrix, "js": js_matrix}
+
+
+def distance_matrix(histograms, measure="kl"):
+    return MEASURES[measure](histograms)
+
+
+def save_matrix(path, mbids, distances):
+    """ Save a distance matrix and the recording mbids of its rows as an npz file """
+    dirname = os.path.dirname(path)
+    if dirname and not os.path.exists(dirname):
+        os.makedirs(dirname)
+    np.savez_compressed(path, mbids=np.array(mbids, dtype=np.unicode_),
+                        distances=np.asarray(distances, dtype=np.float32))
+
+
+def load_matrix(path):
+    """ Returns (mbids, distances) as saved by save_matrix """
+    with np.load(path) as data:
+        return data["mbids"].tolist(), data["distances"]
+
+
+def most_similar(mbids, distances, mbid, count=None):
+    """ The [(mbid, distance), ...] of the recordings closest to `mbid`, nearest first """
+    i = mbids.index(mbid)
+    order = np.argsort(distances[i], kind="mergesort")
+    ret = [(mbids[j], float(distances[i, j])) for j in order if j != i]
+    if count is not None:
+        ret = ret[:count]
+    return ret
+
+
+def _save_npz(path, **arrays):
+    """ Write to a temporary file and rename it so that readers
+        never see a partially written file """
+    dirname = os.path.dirname(path)
+    if dirname and not os.path.exists(dirname):
+        os.makedirs(dirname)
+    fd, tmpname = tempfile.mkstemp(dir=dirname or ".", suffix=".npz")
+    with os.fdopen(fd, "wb") as fp:
+        np.savez(fp, **arrays)
+    os.rename(tmpname, path)
+
+
+class SimilarityIndex(object):
+    """ Exact nearest-neighbour search over the normalised histograms of
+    a set of recordings, by symmetric Kullback-Leibler divergence.
+
+    The normalised histograms, their logs and entropies are kept in memory,
+    so the distance from one recording to all others is two matrix-vector
+    products.
+    """
+
+    def __init__(self, mbids, histograms):
+        self.mbids = list(mbids)
+        self._positions = {m: i for i, m in enumerate(self.mbids)}
+        if len(self.mbids):
+            self.p = normalise(histograms)
+        else:
+            self.p = np.zeros((0, 0))
+        self._update()
+
+    def _update(self):
+        self.logp = np.log(self.p)
+        self.entropy = (self.p * self.logp).sum(axis=1)
+
+    def __len__(self):
+        return len(self.mbids)
+
+    def __contains__(self, mbid):
+        return mbid in self._positions
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            index = cls([], [])
+            index.mbids = data["mbids"].tolist()
+            index._positions = {m: i for i, m in enumerate(index.mbids)}
+            index.p = data["histograms"].astype(np.float64)
+        index._update()
+        return index
+
+    def save(self, path):
+        _save_npz(path, mbids=np.array(self.mbids, dtype=np.unicode_),
+                  histograms=self.p.astype(np.float32))
+
+    def add(self, mbid, histogram):
+        """ Add a recording to the index, or replace its histogram if it is
+            already in it """
+        row = normalise([histogram])
+        if len(self.mbids) and row.shape[1] != self.p.shape[1]:
+            raise ValueError("Histogram has %s bins, the index has %s" % (row.shape[1], self.p.shape[1]))
+        if mbid in self._positions:
+            self.p[self._positions[mbid]] = row[0]
+        else:
+            self._positions[mbid] = len(self.mbids)
+            self.mbids.append(mbid)
+            self.p = np.vstack((self.p, row)) if len(self.p) else row
+        self._update()
+
+    def distances(self, mbid):
+        """ The divergence from `mbid` to every recording in the index """
+        i = self._positions[mbid]
+        div = (self.entropy[i] - self.logp.dot(self.p[i])) + (self.entropy - self.p.dot(self.logp[i]))
+        div[i] = 0
+        return np.maximum(div, 0)
+
+    def nearest(self, mbid, count):
+        """ The [(mbid, distance), ...] of the `count` recordings closest
+            to `mbid`, nearest first. Raises KeyError if `mbid` isn't indexed """
+        div = self.distances(mbid)
+        div[self._positions[mbid]] = np.inf
+        count = min(count, len(div) - 1)
+        if count <= 0:
+            return []
+        closest = np.argpartition(div, count - 1)[:count]
+        closest = closest[np.argsort(div[closest], kind="mergesort")]
+        return [(self.mbids[j], float(div[j])) for j in closest]
+
+
+def index_path(tradition):
+    return os.path.join(INDEX_DIR, "%s.npz" % tradition)
+
+
+# tradition -> (modification time, SimilarityIndex)
+_indexes = {}
+
+
+def get_index(tradition):
+    """ The saved SimilarityIndex of a tradition, or None if it hasn't been built.
+        The index is kept in memory and loaded again if the file changes """
+    path = index_path(tradition)
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None
+    cached = _indexes.get(tradition)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    index = SimilarityIndex.load(path)
+    _indexes[tradition] = (mtime, index)
+    return index
+
+
+def build_index(tradition, mbids):
+    """ Make a new index of the recordings in `mbids` which have a histogram
+        and save it. Returns the index """
+    indexed = []
+    histograms = []
+    for mbid in mbids:
+        hist = get_histogram(mbid)
+        if hist is not None and (not histograms or len(hist) == len(histograms[0])):
+            indexed.append(mbid)
+            histograms.append(hist)
+    index = SimilarityIndex(indexed, histograms)
+    index.save(index_path(tradition))
+    return index
+
+
+def add_to_index(index, mbid):
+    """ Add a recording to an index. Returns False if it has no histogram """
+    hist = get_histogram(mbid)
+    if hist is None:
+        return False
+    try:
+        index.add(mbid, hist)
+    except ValueError:
+        return False
+    return True
+
+
+def add_recordings(tradition, mbids):
+    """ Add newly processed recordings to the saved index of a tradition.
+        Returns the number of recordings added """
+    path = index_path(tradition)
+    if os.path.exists(path):
+        index = SimilarityIndex.load(path)
+    else:
+        index = SimilarityIndex([], [])
+    added = sum(1 for mbid in mbids if add_to_index(index, str(mbid)))
+    if added:
+        index.save(path)
+    return added
@@ -1,15 +1,19 @@
 import json
 import uuid
+from unittest import mock
 
 from django.contrib import auth
 from django.contrib.auth.models import Permission
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
 
 import data
 from carnatic import api
 from carnatic import models
+from carnatic import similarity
 
 
 class ArtistTest(TestCase):
@@ -253,6 +257,54 @@ class RecordingTest(TestCase):
         data = response.data
         self.assertEqual(1, len(data["results"]))
 
+    def add_detailed_recordings(self, count):
+        raaga = models.Raaga.objects.create(name="raaga", common_name="raaga", uuid=uuid.uuid4())
+        taala = models.Taala.objects.create(name="taala", common_name="taala", uuid=uuid.uuid4())
+        form = models.Form.objects.create(name="form")
+        artist = models.Artist.objects.create(name="artist", mbid=uuid.uuid4())
+        instrument = models.Instrument.objects.create(name="instrument", mbid=uuid.uuid4())
+        self.cnormal.artists.add(artist)
+        for i in range(count):
+            work = models.Work.objects.create(title="work %s" % i, mbid=uuid.uuid4(), raaga=raaga, taala=taala)
+            recording = models.Recording.objects.create(title="recording %s" % i, mbid=uuid.uuid4())
+            models.RecordingWork.objects.create(recording=recording, work=work, sequence=1)
+            models.RecordingForm.objects.create(recording=recording, form=form, sequence=1)
+            models.InstrumentPerformance.objects.create(recording=recording, artist=artist, instrument=instrument)
+            models.ConcertRecording.objects.create(concert=self.cnormal, recording=recording, track=i + 2, disc=1,
+                                                   disctrack=i + 2)
+
+    def count_detail_list_queries(self):
+        client = APIClient()
+        client.force_authenticate(user=self.staffuser)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get("/api/carnatic/recording?detail=1")
+        self.assertEqual(200, response.status_code)
+        return len(queries), response.data["results"]
+
+    def test_recording_list_detail_queries(self):
+        """ The number of queries doesn't depend on the number of recordings """
+        self.add_detailed_recordings(2)
+        few, results = self.count_detail_list_queries()
+        self.assertEqual(5, len(results))
+        self.add_detailed_recordings(20)
+        many, results = self.count_detail_list_queries()
+        self.assertEqual(25, len(results))
+        self.assertEqual(few, many)
+
+        recording = [r for r in results if r["title"] == "recording 0"][0]
+        self.assertEqual(["raaga"], [r["name"] for r in recording["raaga"]])
+        self.assertEqual(["taala"], [t["name"] for t in recording["taala"]])
+        self.assertEqual(["normal concert"], [c["title"] for c in recording["concert"]])
+        self.assertEqual(["artist"], [a["name"] for a in recording["album_artists"]])
+        self.assertEqual("instrument", recording["artists"][0]["instrument"]["name"])
+
+    def test_recording_list_detail_permissions(self):
+        """ Only concerts the user can see are in the detail list """
+        client = APIClient()
+        client.force_authenticate(user=self.normaluser)
+        response = client.get("/api/carnatic/recording?detail=1")
+        self.assertEqual([["normal concert"]], [[c["title"] for c in r["concert"]] for r in response.data["results"]])
+
     def test_render_recording_detail(self):
         client = APIClient()
         client.force_authenticate(user=self.staffuser)
@@ -280,6 +332,39 @@ class RecordingTest(TestCase):
                               **{'HTTP_DUNYA_COLLECTION': str(uuid.uuid4())})
         self.assertEqual(404, response.status_code)
 
+    def similarity_index(self):
+        mbids = [str(self.rnormal.mbid), str(self.rrestricted.mbid), str(self.rstaff.mbid),
+                 "a484bcbc-c0d9-468a-952c-9938d5811f85"]
+        histograms = [[1, 2, 3, 4], [1, 2, 3, 5], [1, 2, 4, 4], [4, 3, 2, 1]]
+        return similarity.SimilarityIndex(mbids, histograms)
+
+    def test_recording_similar(self):
+        client = APIClient()
+        client.force_authenticate(user=self.staffuser)
+        with mock.patch("carnatic.similarity.get_index", return_value=self.similarity_index()):
+            response = client.get("/api/carnatic/recording/dcf14452-e13e-450f-82c2-8ae705a58971/similar?k=2")
+        self.assertEqual(200, response.status_code)
+        similar = response.data["similar"]
+        self.assertEqual(2, len(similar))
+        self.assertEqual(["distance", "mbid", "title"], sorted(similar[0].keys()))
+        self.assertLessEqual(similar[0]["distance"], similar[1]["distance"])
+
+    def test_recording_similar_permissions(self):
+        """ Recordings the user can't see aren't in the results, even if they're in the index """
+        client = APIClient()
+        client.force_authenticate(user=self.normaluser)
+        with mock.patch("carnatic.similarity.get_index", return_value=self.similarity_index()):
+            response = client.get("/api/carnatic/recording/dcf14452-e13e-450f-82c2-8ae705a58971/similar")
+            self.assertEqual([], response.data["similar"])
+            response = client.get("/api/carnatic/recording/b287fe20-e8e1-11e4-bf83-0002a5d5c51b/similar")
+            self.assertEqual(404, response.status_code)
+
+    def test_recording_similar_bad_count(self):
+        client = APIClient()
+        client.force_authenticate(user=self.staffuser)
+        response = client.get("/api/carnatic/recording/dcf14452-e13e-450f-82c2-8ae705a58971/similar?k=x")
+        self.assertEqual(400, response.status_code)
+
 
 class WorkTest(TestCase):
     def setUp(self):
@@ -1,6 +1,8 @@
 import uuid
 
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 import data.models
 from carnatic import models
@@ -221,3 +223,33 @@ class CollaboratingArtistsTest(TestCase):
         self.assertEqual((self.a3, [self.c1, self.c2], 1), coll[1])
         self.assertEqual((self.a4, [], 2), coll[2])
         self.assertEqual((self.a5, [self.c1], 0), coll[3])
+
+    def test_performers_and_groups(self):
+        """ Artists in performances and concerts of groups count as collaborators """
+        recording = models.Recording.objects.create(title="r1")
+        models.ConcertRecording.objects.create(concert=self.c1, recording=recording, track=1, disc=1, disctrack=1)
+        a6 = models.Artist.objects.create(name="a6")
+        models.InstrumentPerformance.objects.create(recording=recording, artist=a6)
+
+        group = models.Artist.objects.create(name="group", artist_type="G")
+        group.group_members.add(self.a1)
+        col5 = data.models.Collection.objects.create(name="collection 5", collectionid=uuid.uuid4(), permission="U")
+        c5 = models.Concert.objects.create(collection=col5, title="c5")
+        c5.artists.add(group, self.a5)
+
+        coll = self.a1.collaborating_artists(collection_ids=[self.coll1id, str(col5.collectionid)], permission=['U'])
+        self.assertEqual([self.a2, self.a3, self.a5, self.a4, a6, group], [c[0] for c in coll])
+        self.assertEqual((self.a5, [self.c1, c5], 0), coll[2])
+        self.assertEqual((a6, [self.c1], 0), coll[4])
+
+    def test_number_of_queries(self):
+        """ The number of queries doesn't depend on the number of concerts """
+        with CaptureQueriesContext(connection) as few:
+            self.a1.collaborating_artists(collection_ids=[self.coll1id], permission=['U'])
+        for i in range(10):
+            concert = models.Concert.objects.create(collection=self.col1, title="concert %s" % i)
+            concert.artists.add(self.a1, models.Artist.objects.create(name="artist %s" % i))
+        with CaptureQueriesContext(connection) as many:
+            coll = self.a1.collaborating_artists(collection_ids=[self.coll1id], permission=['U'])
+        self.assertEqual(14, len(coll))
+        self.assertEqual(len(few), len(many))
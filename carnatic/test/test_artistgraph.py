@@ -0,0 +1,92 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib import auth
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from carnatic import artistgraph
+from carnatic import models
+
+
+class ArtistGraphTest(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        patcher = mock.patch("carnatic.artistgraph.GRAPH_PATH", os.path.join(self.root, "graph.json"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        artistgraph._graph = None
+
+        self.guru = models.Artist.objects.create(name="guru", begin="1900", mbid="a484bcbc-c0d9-468a-952c-9938d5811f85")
+        self.a = models.Artist.objects.create(name="a", begin="1930", mbid="dcf14452-e13e-450f-82c2-8ae705a58971")
+        self.b = models.Artist.objects.create(name="b", begin="1940")
+        self.c = models.Artist.objects.create(name="c", begin="1925")
+        self.student = models.Artist.objects.create(name="student", begin="1960",
+                                                    mbid="b287fe20-e8e1-11e4-bf83-0002a5d5c51b")
+        self.other = models.Artist.objects.create(name="other", mbid="34275e18-0aef-4fa5-9618-b5938cb73a24")
+        self.a.gurus.add(self.guru)
+        self.b.gurus.add(self.guru)
+        self.c.gurus.add(self.guru)
+        self.student.gurus.add(self.a)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_similar_artists(self):
+        similar = self.a.similar_artists()
+        self.assertEqual([
+            (self.guru, "guru is the guru of a"),
+            (self.student, "student is a student of a"),
+            (self.c, "a and c share the same guru (guru)"),
+            (self.b, "a and b share the same guru (guru)")], similar)
+
+    def test_save_load(self):
+        graph = artistgraph.build()
+        loaded = artistgraph.ArtistGraph.load(artistgraph.GRAPH_PATH)
+        self.assertEqual(graph.artists, loaded.artists)
+        self.assertEqual(graph.gurus, loaded.gurus)
+        self.assertEqual(graph.students, loaded.students)
+
+    def test_lineage(self):
+        graph = artistgraph.get_graph()
+        self.assertEqual([[self.a.id], [self.guru.id]], graph.lineage(self.student.id, "gurus"))
+        self.assertEqual([[self.a.id, self.b.id, self.c.id], [self.student.id]],
+                         graph.lineage(self.guru.id, "students"))
+        self.assertEqual([], graph.lineage(self.other.id))
+
+    def test_shortest_path(self):
+        graph = artistgraph.get_graph()
+        self.assertEqual([self.student.id, self.a.id, self.guru.id, self.b.id],
+                         graph.shortest_path(self.student.id, self.b.id))
+        self.assertEqual([self.a.id], graph.shortest_path(self.a.id, self.a.id))
+        self.assertIsNone(graph.shortest_path(self.a.id, self.other.id))
+
+    def test_graph_is_reloaded(self):
+        graph = artistgraph.get_graph()
+        self.assertIs(graph, artistgraph.get_graph())
+        self.b.gurus.clear()
+        artistgraph.build()
+        # Make sure the modification time changes
+        mtime = os.stat(artistgraph.GRAPH_PATH).st_mtime
+        os.utime(artistgraph.GRAPH_PATH, (mtime + 1, mtime + 1))
+        self.assertEqual([[self.a.id, self.c.id], [self.student.id]],
+                         artistgraph.get_graph().lineage(self.guru.id, "students"))
+
+    def test_api(self):
+        client = APIClient()
+        client.force_authenticate(user=auth.models.User.objects.create_user("normaluser"))
+        response = client.get("/api/carnatic/artist/dcf14452-e13e-450f-82c2-8ae705a58971/relations",
+                              {"to": "b287fe20-e8e1-11e4-bf83-0002a5d5c51b"})
+        self.assertEqual(200, response.status_code)
+        data = response.data
+        self.assertEqual(["guru", "student", "c", "b"], [s["name"] for s in data["similar"]])
+        self.assertEqual("guru is the guru of a", data["similar"][0]["relation"])
+        self.assertEqual([["guru"]], [[g["name"] for g in gen] for gen in data["gurus"]])
+        self.assertEqual([["student"]], [[s["name"] for s in gen] for gen in data["students"]])
+        self.assertEqual(["a", "student"], [p["name"] for p in data["path"]])
+
+        response = client.get("/api/carnatic/artist/dcf14452-e13e-450f-82c2-8ae705a58971/relations",
+                              {"to": "34275e18-0aef-4fa5-9618-b5938cb73a24"})
+        self.assertIsNone(response.data["path"])
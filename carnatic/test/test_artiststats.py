@@ -0,0 +1,151 @@
+import threading
+import unittest
+import uuid
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+import data.models
+from carnatic import artiststats
+from carnatic import models
+
+
+class ArtistStatsTest(TestCase):
+    def setUp(self):
+        self.i = models.Instrument.objects.create(name="Violin")
+        self.a1 = models.Artist.objects.create(name="Artist1", main_instrument=self.i)
+        self.a2 = models.Artist.objects.create(name="Artist2", main_instrument=self.i)
+        self.group = models.Artist.objects.create(name="Group", artist_type="G")
+        self.group.group_members.add(self.a2)
+
+        self.raaga1 = models.Raaga.objects.create(name="Raaga1", common_name="raaga1", uuid=uuid.uuid4())
+        self.raaga2 = models.Raaga.objects.create(name="Raaga2", common_name="raaga2", uuid=uuid.uuid4())
+        self.taala = models.Taala.objects.create(name="Taala", common_name="taala", uuid=uuid.uuid4())
+        self.w1 = models.Work.objects.create(title="Work1", raaga=self.raaga1, taala=self.taala)
+        self.w2 = models.Work.objects.create(title="Work2", raaga=self.raaga2)
+
+        self.coll1id = str(uuid.uuid4())
+        self.col1 = data.models.Collection.objects.create(name="collection 1", collectionid=self.coll1id, permission="U")
+        self.coll2id = str(uuid.uuid4())
+        self.col2 = data.models.Collection.objects.create(name="collection 2", collectionid=self.coll2id, permission="R")
+
+        # artist 1 is the primary artist of c1, and performs on a recording of c2
+        self.c1 = self.concert(self.col1, "Concert1", [self.w1, self.w1])
+        self.c1.artists.add(self.a1)
+        self.c2 = self.concert(self.col2, "Concert2", [self.w2])
+        models.InstrumentPerformance.objects.create(instrument=self.i, artist=self.a1, recording=self.c2.recordings.get())
+        # The group of artist 2 is on c3, which is universal, and c4, which is restricted
+        self.c3 = self.concert(self.col1, "Concert3", [self.w2])
+        self.c3.artists.add(self.group)
+        self.c4 = self.concert(self.col2, "Concert4", [self.w1])
+        self.c4.artists.add(self.group)
+
+    def concert(self, collection, title, works):
+        concert = models.Concert.objects.create(collection=collection, title=title)
+        for i, work in enumerate(works, 1):
+            recording = models.Recording.objects.create(title="%s %s" % (title, i))
+            models.ConcertRecording.objects.create(concert=concert, recording=recording, track=i, disc=1, disctrack=i)
+            models.RecordingWork.objects.create(recording=recording, work=work, sequence=1)
+        return concert
+
+    def live(self, artist):
+        """ What concerts(), get_performed_raagas() and get_performed_taalas() return.
+            Concerts from the same year and raagas with the same count can be in any order """
+        artist = models.Artist.objects.get(pk=artist.pk)
+        everyone = ["U", "R", "S"]
+
+        def counts(items):
+            return sorted(items, key=lambda item: (-item[1], item[0].pk))
+        return (sorted(c.pk for c in artist.concerts()),
+                sorted(c.pk for c in artist.concerts(permission=everyone)),
+                sorted(c.pk for c in artist.concerts(collection_ids=[self.coll2id], permission=everyone)),
+                counts(artist.get_performed_raagas()), counts(artist.get_performed_taalas()))
+
+    def test_same_as_live(self):
+        for artist in [self.a1, self.a2, self.group]:
+            expected = self.live(artist)
+            artiststats.update_artists([artist.pk])
+            self.assertIsNotNone(models.Artist.objects.get(pk=artist.pk).get_stats())
+            self.assertEqual(expected, self.live(artist))
+            models.ArtistStats.objects.all().delete()
+
+    def test_counts(self):
+        artiststats.update_all()
+        a1 = models.Artist.objects.get(pk=self.a1.pk)
+        self.assertEqual([(self.raaga1, 2), (self.raaga2, 1)], a1.get_performed_raagas())
+        self.assertEqual([(self.taala, 2)], a1.get_performed_taalas())
+
+    def test_group_concerts(self):
+        """ Concerts of a group are only listed for its members from universal collections """
+        artiststats.update_all()
+        a2 = models.Artist.objects.get(pk=self.a2.pk)
+        self.assertEqual([self.c3], a2.concerts(permission=["U", "R", "S"]))
+        group = models.Artist.objects.get(pk=self.group.pk)
+        self.assertEqual({self.c3, self.c4}, set(group.concerts(permission=["U", "R", "S"])))
+
+    def test_update_concert(self):
+        artiststats.update_all()
+        c5 = self.concert(self.col1, "Concert5", [self.w2])
+        c5.artists.add(self.group)
+        models.InstrumentPerformance.objects.create(instrument=self.i, artist=self.a1, recording=c5.recordings.get())
+        artiststats.update_concert(c5)
+
+        a1 = models.Artist.objects.get(pk=self.a1.pk)
+        self.assertEqual({self.c1, c5}, set(a1.concerts()))
+        self.assertEqual([(self.raaga1, 2), (self.raaga2, 2)], a1.get_performed_raagas())
+        a2 = models.Artist.objects.get(pk=self.a2.pk)
+        self.assertEqual({self.c3, c5}, set(a2.concerts()))
+
+        # Artists who are taken off a concert are updated too
+        c5.artists.remove(self.group)
+        artiststats.update_concert(c5)
+        a2 = models.Artist.objects.get(pk=self.a2.pk)
+        self.assertEqual([self.c3], a2.concerts())
+
+
+class ConcurrentUpdateTest(TransactionTestCase):
+    def setUp(self):
+        self.a1 = models.Artist.objects.create(name="Artist1")
+        self.a2 = models.Artist.objects.create(name="Artist2")
+        concert = models.Concert.objects.create(title="Concert")
+        concert.artists.add(self.a1, self.a2)
+
+    @unittest.skipUnless(connection.vendor == "postgresql", "Stats are only locked on postgresql")
+    def test_overlapping_updates(self):
+        """ Two imports updating the same artist at the same time don't insert the same stats """
+        deleted = threading.Event()
+        resume = threading.Event()
+        bulk_create = models.ArtistStats.objects.bulk_create
+        errors = []
+
+        def paused_bulk_create(objs, *args, **kwargs):
+            # Stop the first update between deleting the old stats and inserting the new ones
+            if threading.current_thread().name == "first":
+                deleted.set()
+                resume.wait(10)
+            return bulk_create(objs, *args, **kwargs)
+
+        def update(artistids):
+            try:
+                artiststats.update_artists(artistids)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        with mock.patch.object(models.ArtistStats.objects, "bulk_create", paused_bulk_create):
+            first = threading.Thread(target=update, args=([self.a1.pk, self.a2.pk], ), name="first")
+            second = threading.Thread(target=update, args=([self.a2.pk], ), name="second")
+            first.start()
+            deleted.wait(10)
+            second.start()
+            # Give the second update time to reach its insert before the first one goes on
+            second.join(1)
+            resume.set()
+            first.join()
+            second.join()
+
+        self.assertEqual([], errors)
+        self.assertEqual({self.a1.pk, self.a2.pk}, set(models.ArtistStats.objects.values_list('artist_id', flat=True)))
+        self.assertEqual(2, models.ArtistStatsConcert.objects.count())
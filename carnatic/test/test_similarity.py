@@ -0,0 +1,92 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from carnatic import similarity
+
+
+class DistanceMatrixTest(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.histograms = rng.rand(7, 20)
+        self.histograms[2, 5] = 0
+
+    def kl(self, p, q):
+        return np.sum(p * np.log(p / q))
+
+    def test_kl_matrix(self):
+        p = similarity.normalise(self.histograms)
+        div = similarity.kl_matrix(self.histograms)
+        for i in range(len(p)):
+            for j in range(len(p)):
+                expected = 0 if i == j else self.kl(p[i], p[j]) + self.kl(p[j], p[i])
+                self.assertAlmostEqual(div[i, j], expected)
+
+    def test_js_matrix(self):
+        p = similarity.normalise(self.histograms)
+        div = similarity.js_matrix(self.histograms, blocksize=3)
+        for i in range(len(p)):
+            for j in range(len(p)):
+                m = (p[i] + p[j]) / 2
+                expected = (self.kl(p[i], m) + self.kl(p[j], m)) / 2
+                self.assertAlmostEqual(div[i, j], expected)
+
+    def test_save_and_load(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp, "raaga", "1.npz")
+            mbids = ["a", "b", "c"]
+            similarity.save_matrix(path, mbids, similarity.kl_matrix(self.histograms[:3]))
+            loaded_mbids, distances = similarity.load_matrix(path)
+        finally:
+            shutil.rmtree(tmp)
+        self.assertEqual(loaded_mbids, mbids)
+        self.assertEqual(distances.shape, (3, 3))
+        nearest = similarity.most_similar(loaded_mbids, distances, "b")
+        self.assertEqual(len(nearest), 2)
+        self.assertNotIn("b", [m for m, d in nearest])
+        self.assertLessEqual(nearest[0][1], nearest[1][1])
+
+
+class SimilarityIndexTest(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.RandomState(1)
+        self.histograms = rng.rand(10, 12)
+        self.mbids = ["r%s" % i for i in range(10)]
+
+    def test_nearest_matches_kl_matrix(self):
+        index = similarity.SimilarityIndex(self.mbids, self.histograms)
+        distances = similarity.kl_matrix(self.histograms)
+        expected = similarity.most_similar(self.mbids, distances, "r3", 4)
+        nearest = index.nearest("r3", 4)
+        self.assertEqual([m for m, d in nearest], [m for m, d in expected])
+        for (_, d1), (_, d2) in zip(nearest, expected):
+            self.assertAlmostEqual(d1, d2)
+
+    def test_add(self):
+        index = similarity.SimilarityIndex([], [])
+        for mbid, hist in zip(self.mbids, self.histograms):
+            index.add(mbid, hist)
+        self.assertEqual(len(index), 10)
+        full = similarity.SimilarityIndex(self.mbids, self.histograms)
+        np.testing.assert_allclose(index.distances("r0"), full.distances("r0"))
+
+        index.add("r0", self.histograms[1])
+        self.assertEqual(len(index), 10)
+        self.assertEqual(index.nearest("r0", 1)[0][0], "r1")
+        self.assertRaises(ValueError, index.add, "new", [1, 2, 3])
+
+    def test_save_and_load(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp, "carnatic.npz")
+            similarity.SimilarityIndex(self.mbids, self.histograms).save(path)
+            index = similarity.SimilarityIndex.load(path)
+        finally:
+            shutil.rmtree(tmp)
+        self.assertEqual(index.mbids, self.mbids)
+        self.assertIn("r5", index)
+        self.assertEqual(len(index.nearest("r5", 20)), 9)
@@ -21,16 +21,18 @@ import math
 
 from django.conf import settings
 from django.contrib.auth.decorators import user_passes_test
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from django.http import HttpResponse, Http404, JsonResponse
+from django.http import HttpResponse, Http404
 from django.shortcuts import render, get_object_or_404, redirect
 
 import dashboard.models
 import dashboard.views
+import data.autocomplete
+import data.filters
+import data.search
 import docserver
 import docserver.exceptions
 import docserver.util
-from carnatic.models import Artist, Recording, Concert, Work, Taala, Raaga, Instrument, Form, RecordingForm
+from carnatic.models import Artist, Recording, Concert, Taala, Raaga, Instrument, Form, RecordingForm
 from data import utils
 
 
@@ -38,10 +40,7 @@ def searchcomplete(request):
     term = request.GET.get("input")
     ret = []
     if term:
-        suggestions = Concert.objects.filter(title__istartswith=term)[:3]
-        ret = [{"category": "concerts", "name": l.title, 'mbid': str(l.mbid)} for i, l in enumerate(suggestions, 1)]
-        suggestions = Artist.objects.filter(name__istartswith=term)[:3]
-        ret += [{"category": "artists", "name": l.name, 'mbid': str(l.mbid)} for i, l in enumerate(suggestions, len(ret))]
+        ret = data.autocomplete.suggestions("carnatic", term)
     return HttpResponse(json.dumps(ret), content_type="application/json")
 
 
@@ -54,14 +53,11 @@ def recordings_search(request):
     s_raga = request.GET.get('ragas', '')
     s_tala = request.GET.get('talas', '')
 
-    recordings = Recording.objects
+    recordings = Recording.objects.all()
     if s_artists != '' or s_concerts != '' or q\
             or s_instruments != '' or s_raga != '' or s_tala != '':
         if q and q != '':
-            ids = list(Work.objects.filter(title__unaccent__icontains=q).values_list('pk', flat=True))
-            recordings = recordings.filter(works__id__in=ids)\
-                    | recordings.filter(title__unaccent__icontains=q)\
-                    | recordings.filter(concert__title__unaccent__icontains=q)
+            recordings = data.search.filter_text(recordings, q)
 
         if s_artists and s_artists != '':
             artists = s_artists.split()
@@ -81,24 +77,10 @@ def recordings_search(request):
         if s_tala and s_tala != '':
             recordings = recordings.filter(works__taala__uuid__in=s_tala.split())
 
-    paginator = Paginator(recordings.all(), 25)
-    page = request.GET.get('page')
-    next_page = None
-    try:
-        recordings = paginator.page(page)
-        if recordings.has_next():
-            next_page = recordings.next_page_number()
-    except PageNotAnInteger:
-        # If page is not an integer, deliver first page.
-        recordings = paginator.page(1)
-        if recordings.has_next():
-            next_page = recordings.next_page_number()
-    except EmptyPage:
-        # If page is out of range (e.g. 9999), deliver last page of results.
-        recordings = paginator.page(paginator.num_pages)
+    recordings, next_page = data.search.keyset_page(recordings.distinct(), request.GET.get('after'))
     results = {
-            "results": [item.get_dict() for item in recordings.object_list],
-            "moreResults": next_page
+        "results": [item.get_dict() for item in recordings],
+        "moreResults": next_page
     }
     return HttpResponse(json.dumps(results), content_type='application/json')
 
@@ -107,8 +89,8 @@ def main(request):
     return render(request, "carnatic/index.html")
 
 
-def filters(request):
-
+def filters_payload():
+    """ The data returned by `filters`, see data.filters """
     taalas = Taala.objects.prefetch_related('aliases').all()
     taalalist = []
     for r in taalas:
@@ -146,7 +128,11 @@ def filters(request):
            u"talas": taalalist,
            }
 
-    return JsonResponse(ret)
+    return ret
+
+
+def filters(request):
+    return data.filters.response(request, "carnatic")
 
 
 def recordingbyid(request, recordingid, title=None):
@@ -163,24 +149,31 @@ def recording(request, uuid, title=None):
     elif recording.is_restricted() and not request.show_bootlegs:
         raise Http404
 
-    try:
-        wave = docserver.util.docserver_get_url(recording.mbid, "audioimages", "waveform32", 1, version=settings.FEAT_VERSION_IMAGE)
-    except docserver.exceptions.NoFileException:
-        wave = None
-    try:
-        spec = docserver.util.docserver_get_url(recording.mbid, "audioimages", "spectrum32", 1, version=settings.FEAT_VERSION_IMAGE)
-    except docserver.exceptions.NoFileException:
-        spec = None
-    try:
-        small = docserver.util.docserver_get_url(recording.mbid, "audioimages", "smallfull", version=settings.FEAT_VERSION_IMAGE)
-    except docserver.exceptions.NoFileException:
-        small = None
-    try:
-        audio = docserver.util.docserver_get_mp3_url(recording.mbid)
-    except docserver.exceptions.NoFileException:
-        audio = None
-    try:
-        tonic = docserver.util.docserver_get_contents(recording.mbid, "carnaticvotedtonic", "tonic", version=settings.FEAT_VERSION_TONIC)
+    wavelookup = ("audioimages", "waveform32", 1, settings.FEAT_VERSION_IMAGE)
+    speclookup = ("audioimages", "spectrum32", 1, settings.FEAT_VERSION_IMAGE)
+    smalllookup = ("audioimages", "smallfull", None, settings.FEAT_VERSION_IMAGE)
+    mp3lookup = ("mp3", None, None, None)
+    toniclookup = ("carnaticvotedtonic", "tonic", 1, settings.FEAT_VERSION_TONIC)
+    aksharalookup = ("rhythm", "aksharaPeriod", 1, settings.FEAT_VERSION_RHYTHM)
+    pitchlookup = ("carnaticnormalisedpitch", "packedpitch", None, settings.FEAT_VERSION_CARNATIC_NORMALISED_PITCH)
+    histogramlookup = ("carnaticnormalisedpitch", "drawhistogram", None, settings.FEAT_VERSION_CARNATIC_NORMALISED_PITCH)
+    rhythmlookup = ("rhythm", "aksharaTicks", None, settings.FEAT_VERSION_RHYTHM)
+    apcurvelookup = ("rhythm", "APcurve", None, settings.FEAT_VERSION_RHYTHM)
+    files = docserver.util.docserver_get_files(recording.mbid, [
+        wavelookup, speclookup, smalllookup, mp3lookup, toniclookup, aksharalookup,
+        pitchlookup, histogramlookup, rhythmlookup, apcurvelookup])
+    urls = {lookup: f.get_absolute_url(partnumber=lookup[2]) if f else None for lookup, f in files.items()}
+
+    wave = urls[wavelookup]
+    spec = urls[speclookup]
+    small = urls[smalllookup]
+    audio = None
+    if files[mp3lookup]:
+        audio = files[mp3lookup].get_absolute_url("ds-download-mp3")
+
+    tonic = docserver.util.docserver_read_file(files[toniclookup])
+    tonicname = None
+    if tonic is not None:
         notenames = ["A", "A♯", "B", "C", "C♯", "D", "D♯", "E", "F", "F♯", "G", "G♯"]
         tonic = round(float(tonic), 2)
         thebin = (12 * math.log(tonic / 440.0) / math.log(2)) % 12
@@ -190,32 +183,21 @@ def recording(request, uuid, title=None):
             tonicname = notenames[thebin]
         else:
             tonicname = ""
-    except docserver.exceptions.NoFileException:
-        tonic = None
-        tonicname = None
-    try:
-        akshara = docserver.util.docserver_get_contents(recording.mbid, "rhythm", "aksharaPeriod", version=settings.FEAT_VERSION_RHYTHM)
+    akshara = docserver.util.docserver_read_file(files[aksharalookup])
+    if akshara is not None:
         akshara = str(round(float(akshara), 3) * 1000)
-    except docserver.exceptions.NoFileException:
-        akshara = None
 
-    try:
-        pitchtrackurl = docserver.util.docserver_get_url(recording.mbid, "carnaticnormalisedpitch", "packedpitch", version=settings.FEAT_VERSION_CARNATIC_NORMALISED_PITCH)
-        pitchtrackurl = request.build_absolute_uri(pitchtrackurl)
-        histogramurl = docserver.util.docserver_get_url(recording.mbid, "carnaticnormalisedpitch", "drawhistogram", version=settings.FEAT_VERSION_CARNATIC_NORMALISED_PITCH)
-        histogramurl = request.build_absolute_uri(histogramurl)
-    except docserver.exceptions.NoFileException:
-        pitchtrackurl = ""
-        histogramurl = ""
-
-    try:
-        rhythmurl = docserver.util.docserver_get_url(recording.mbid, "rhythm", "aksharaTicks", version=settings.FEAT_VERSION_RHYTHM)
-        rhythmurl = request.build_absolute_uri(rhythmurl)
-        aksharaurl = docserver.util.docserver_get_url(recording.mbid, "rhythm", "APcurve", version=settings.FEAT_VERSION_RHYTHM)
-        aksharaurl = request.build_absolute_uri(aksharaurl)
-    except docserver.exceptions.NoFileException:
-        rhythmurl = ""
-        aksharaurl = ""
+    pitchtrackurl = ""
+    histogramurl = ""
+    if urls[pitchlookup] and urls[histogramlookup]:
+        pitchtrackurl = request.build_absolute_uri(urls[pitchlookup])
+        histogramurl = request.build_absolute_uri(urls[histogramlookup])
+
+    rhythmurl = ""
+    aksharaurl = ""
+    if urls[rhythmlookup] and urls[apcurvelookup]:
+        rhythmurl = request.build_absolute_uri(urls[rhythmlookup])
+        aksharaurl = request.build_absolute_uri(urls[apcurvelookup])
 
     try:
         permission = utils.get_user_permissions(request.user)
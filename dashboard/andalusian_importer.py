@@ -15,10 +15,10 @@
 # this program.  If not, see http://www.gnu.org/licenses/
 
 from __future__ import print_function
-import compmusic
 
 import andalusian
 import andalusian.models
+from dashboard import musicbrainz
 from dashboard import release_importer
 from dashboard.log import logger
 
@@ -34,7 +34,8 @@ class AndalusianReleaseImporter(release_importer.ReleaseImporter):
     _RecordingClass = andalusian.models.Recording
     _InstrumentClass = andalusian.models.Instrument
     _WorkClass = andalusian.models.Work
-    imported_orchestras = []
+    _recording_release_field = "album"
+    imported_orchestras = set()
 
     def _link_release_recording(self, release, recording, trackorder, mnum, tnum):
         if not release.recordings.filter(pk=recording.pk).exists():
@@ -112,9 +113,9 @@ class AndalusianReleaseImporter(release_importer.ReleaseImporter):
         if artistid in self.imported_artists:
             print("Artist already updated in this import. Not doing it again")
             return self._ArtistClass.objects.get(mbid=artistid)
-        mbartist = compmusic.mb.get_artist_by_id(artistid, includes=["url-rels", "artist-rels", "aliases"])["artist"]
+        mbartist = musicbrainz.get_artist_by_id(artistid, includes=["url-rels", "artist-rels", "aliases"])["artist"]
         artist = self._create_artist_object(self._ArtistClass, self._ArtistAliasClass, mbartist)
-        self.imported_artists.append(artistid)
+        self.imported_artists.add(artistid)
         return artist
 
     def add_and_get_orchestra(self, orchestraid):
@@ -122,7 +123,7 @@ class AndalusianReleaseImporter(release_importer.ReleaseImporter):
             print("Orchestra already updated in this import. Not doing it again")
             return self._OrchestraClass.objects.get(mbid=orchestraid)
 
-        mborchestra = compmusic.mb.get_artist_by_id(orchestraid, includes=["url-rels", "artist-rels", "aliases"])["artist"]
+        mborchestra = musicbrainz.get_artist_by_id(orchestraid, includes=["url-rels", "artist-rels", "aliases"])["artist"]
         orchestra = self._create_artist_object(self._OrchestraClass, self._OrchestraAliasClass, mborchestra, alias_ref="orchestra")
 
         orchestra.group_members.clear()
@@ -134,5 +135,5 @@ class AndalusianReleaseImporter(release_importer.ReleaseImporter):
                     inst = self._get_instrument(instrument)
                     op.instruments.add(inst)
 
-        self.imported_orchestras.append(orchestraid)
+        self.imported_orchestras.add(orchestraid)
         return orchestra
@@ -17,6 +17,7 @@
 
 import compmusic
 
+import carnatic.artiststats
 import carnatic.models
 from dashboard import release_importer
 from dashboard.log import logger
@@ -31,6 +32,10 @@ class CarnaticReleaseImporter(release_importer.ReleaseImporter):
     _RecordingClass = carnatic.models.Recording
     _InstrumentClass = carnatic.models.Instrument
     _WorkClass = carnatic.models.Work
+    _recording_release_field = "concert"
+
+    supports_bulk_import = True
+    _work_attribute_fields = ["raaga", "taala"]
 
     def remove_nonimported_items(self):
         # Artists as the performer of a concert
@@ -62,12 +67,22 @@ class CarnaticReleaseImporter(release_importer.ReleaseImporter):
         non_composer = self._ComposerClass.objects.exclude(works__recordingwork__recording__concertrecording__concert__mbid__in=self.imported_releases).exclude(lyric_works__recordingwork__recording__concertrecording__concert__mbid__in=self.imported_releases)
         non_composer.delete()
 
+    def _update_release_stats(self, concert):
+        carnatic.artiststats.update_concert(concert)
+
     def _link_release_recording(self, concert, recording, trackorder, mnum, tnum):
         if not concert.recordings.filter(pk=recording.pk).exists():
-            carnatic.models.ConcertRecording.objects.create(
-                concert=concert, recording=recording, track=trackorder, disc=mnum, disctrack=tnum)
+            self._release_recording_link(concert, recording, trackorder, mnum, tnum).save()
+
+    def _release_recording_link(self, concert, recording, trackorder, mnum, tnum):
+        return carnatic.models.ConcertRecording(
+            concert=concert, recording=recording, track=trackorder, disc=mnum, disctrack=tnum)
 
     def _add_work_attributes(self, work, mbwork, created):
+        self._set_work_attributes(work, mbwork)
+        work.save()
+
+    def _set_work_attributes(self, work, mbwork):
         """ Read raaga and taala attributes from the webservice query
         and add them to the object """
         work.raaga = None
@@ -82,34 +97,36 @@ class CarnaticReleaseImporter(release_importer.ReleaseImporter):
             taala = self._get_taala(taala_attr)
             if taala:
                 work.taala = taala
-        work.save()
 
     def _join_recording_and_works(self, recording, works):
         carnatic.models.RecordingWork.objects.filter(recording=recording).delete()
+        for link in self._recording_work_links(recording, works):
+            link.save()
+
+    def _recording_work_links(self, recording, works):
         # A carnatic recording only has many works.
-        for i, w in list(enumerate(works)):
-            carnatic.models.RecordingWork.objects.create(work=w, recording=recording, sequence=i)
+        return [carnatic.models.RecordingWork(work=w, recording=recording, sequence=i)
+                for i, w in enumerate(works)]
 
     def _apply_tags(self, recording, works, tags):
         recording.forms.clear()
         recording.raagas.clear()
         recording.taalas.clear()
-
-        # Check that there is not more than one form
-        noform = False
-        forms = recording.forms.all()
-        if len(forms) > 1:
-            raise release_importer.ImportFailedException('TODO: Support more than one form per recording')
-        elif len(forms) < 1:
-            form = self._get_form_tag(tags)
-            if form:
-                # TODO: If there is more than one form, set sequence properly
-                carnatic.models.RecordingForm.objects.create(recording=recording, form=form, sequence=1)
-            else:
-                # If we have no form, we import anyway and put the tags on the recording
-                noform = True
-        else:
-            form = forms[0]
+        for link in self._recording_tag_links(recording, works, tags):
+            link.save()
+
+    def _clear_recording_links(self, recordings):
+        for Klass in [carnatic.models.RecordingWork, carnatic.models.RecordingForm,
+                      carnatic.models.RecordingRaaga, carnatic.models.RecordingTaala]:
+            Klass.objects.filter(recording__in=recordings).delete()
+
+    def _recording_tag_links(self, recording, works, tags):
+        links = []
+        form = self._get_form_tag(tags)
+        if form:
+            # TODO: If there is more than one form, set sequence properly
+            links.append(carnatic.models.RecordingForm(recording=recording, form=form, sequence=1))
+        # If we have no form, we import anyway and put the tags on the recording
 
         # If we are missing a work, or if the work is missing raaga & taala, we should
         # add the information to the recording from the tag
@@ -121,7 +138,7 @@ class CarnaticReleaseImporter(release_importer.ReleaseImporter):
                 nowork = True
                 break
 
-        if noform or form.attrfromrecording or nowork:
+        if not form or form.attrfromrecording or nowork:
             # Create the relation with Raaga and Taala
 
             raaga_tag = self._get_raaga_tags(tags)
@@ -130,16 +147,14 @@ class CarnaticReleaseImporter(release_importer.ReleaseImporter):
             if raaga_tag:
                 r = self._get_raaga(raaga_tag)
                 if r:
-                    carnatic.models.RecordingRaaga.objects.create(recording=recording, raaga=r, sequence=1)
+                    links.append(carnatic.models.RecordingRaaga(recording=recording, raaga=r, sequence=1))
 
             if taala_tag:
                 t = self._get_taala(taala_tag)
                 if t:
-                    carnatic.models.RecordingTaala.objects.create(recording=recording, taala=t, sequence=1)
-        elif not form.attrfromrecording:
-            # In this case, we read attributes from the work. If the work has no attributes
-            # we should add these tags to the recording anyway.
-            pass
+                    links.append(carnatic.models.RecordingTaala(recording=recording, taala=t, sequence=1))
+        # Otherwise we read attributes from the work
+        return links
 
     def _get_form_tag(self, tags):
         for t in tags:
@@ -179,6 +194,9 @@ class CarnaticReleaseImporter(release_importer.ReleaseImporter):
         return None
 
     def _get_form(self, form):
+        return self._cached_lookup("form", form, self._find_form)
+
+    def _find_form(self, form):
         try:
             return carnatic.models.Form.objects.fuzzy(form)
         except carnatic.models.Form.DoesNotExist:
@@ -186,6 +204,9 @@ class CarnaticReleaseImporter(release_importer.ReleaseImporter):
             return None
 
     def _get_raaga(self, raaganame):
+        return self._cached_lookup("raaga", raaganame, self._find_raaga)
+
+    def _find_raaga(self, raaganame):
         try:
             return carnatic.models.Raaga.objects.fuzzy(raaganame)
         except carnatic.models.Raaga.DoesNotExist:
@@ -193,6 +214,9 @@ class CarnaticReleaseImporter(release_importer.ReleaseImporter):
             return None
 
     def _get_taala(self, taalaname):
+        return self._cached_lookup("taala", taalaname, self._find_taala)
+
+    def _find_taala(self, taalaname):
         try:
             return carnatic.models.Taala.objects.fuzzy(taalaname)
         except carnatic.models.Taala.DoesNotExist:
@@ -200,6 +224,9 @@ class CarnaticReleaseImporter(release_importer.ReleaseImporter):
             return None
 
     def _get_instrument(self, instname):
+        return self._cached_lookup("instrument", instname, self._find_instrument)
+
+    def _find_instrument(self, instname):
         try:
             return carnatic.models.Instrument.objects.fuzzy(instname)
         except carnatic.models.Instrument.DoesNotExist:
@@ -207,18 +234,22 @@ class CarnaticReleaseImporter(release_importer.ReleaseImporter):
 
     def _performance_type_to_instrument(self, perf_type, attrs):
         is_lead = False
-        if perf_type == release_importer.RELATION_VOCAL:
+        instr_name = None
+        if perf_type in [release_importer.RELATION_RECORDING_VOCAL, release_importer.RELATION_RELEASE_VOCAL]:
             instr_name = "voice"
             if "lead vocals" in attrs:
                 is_lead = True
-        elif perf_type == release_importer.RELATION_INSTRUMENT:
+        elif perf_type in [release_importer.RELATION_RECORDING_INSTRUMENT,
+                           release_importer.RELATION_RELEASE_INSTRUMENT] and attrs:
             instr_name = attrs[-1]
             attrs = attrs[:-1]
             if "lead" in attrs:
                 is_lead = True
 
         attributes = " ".join(attrs)
-        instrument = self._get_instrument(instr_name)
+        instrument = None
+        if instr_name:
+            instrument = self._get_instrument(instr_name)
 
         return instrument, attributes, is_lead
 
@@ -227,10 +258,16 @@ class CarnaticReleaseImporter(release_importer.ReleaseImporter):
         artist = self.add_and_get_artist(artistid)
         recording = carnatic.models.Recording.objects.get(mbid=recordingid)
 
-        instrument, attributes, is_lead = self._performance_type_to_instrument(perf_type, attrs)
+        performance = self._recording_performance(recording, artist, perf_type, attrs)
+        if performance:
+            performance.save()
 
+    def _recording_performance(self, recording, artist, perf_type, attrs):
+        instrument, attributes, is_lead = self._performance_type_to_instrument(perf_type, attrs)
         if instrument:
-            carnatic.models.InstrumentPerformance.objects.create(recording=recording, instrument=instrument, artist=artist, lead=is_lead, attributes=attributes)
+            return carnatic.models.InstrumentPerformance(
+                recording=recording, instrument=instrument, artist=artist, lead=is_lead, attributes=attributes)
+        return None
 
     def _add_release_performance(self, releaseid, artistid, perf_type, attrs):
         logger.info("  Adding concert performance...")
@@ -249,6 +286,11 @@ class CarnaticReleaseImporter(release_importer.ReleaseImporter):
                     ip.lead = True
                     ip.save()
 
+    def _set_release_artist_leads(self, performances, release_artists):
+        for ip in performances:
+            if ip.artist in release_artists:
+                ip.lead = True
+
     def _clear_work_composers(self, work):
         work.composers.clear()
         work.lyricists.clear()
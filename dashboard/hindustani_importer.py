@@ -32,6 +32,7 @@ class HindustaniReleaseImporter(release_importer.ReleaseImporter):
     _RecordingClass = hindustani.models.Recording
     _InstrumentClass = hindustani.models.Instrument
     _WorkClass = hindustani.models.Work
+    _recording_release_field = "release"
 
     def _link_release_recording(self, release, recording, trackorder, mnum, tnum):
         if not release.recordings.filter(pk=recording.pk).exists():
@@ -1,9 +1,9 @@
 # -*- coding: utf-8 -*-
 from __future__ import print_function
-import compmusic
 import re
 
 import jingju.models
+from dashboard import musicbrainz
 from dashboard import release_importer
 from dashboard.log import logger
 
@@ -21,7 +21,7 @@ class JingjuReleaseImporter(release_importer.ReleaseImporter):
     def _join_recording_and_works(self, recording, works):
         if works:
             work = works[0]
-            mbwork = compmusic.mb.get_work_by_id(work.mbid, includes=["artist-rels", "work-rels", "series-rels"])["work"]
+            mbwork = musicbrainz.get_work_by_id(work.mbid, includes=["artist-rels", "work-rels", "series-rels"])["work"]
             if 'series-relation-list' in mbwork:
                 mbscore = mbwork['series-relation-list'][0]['series']
                 score = jingju.models.Score.objects.create(name=mbscore['name'], uuid=mbscore['id'])
@@ -108,7 +108,7 @@ class JingjuReleaseImporter(release_importer.ReleaseImporter):
             print("Artist already updated in this import. Not doing it again")
             return self._ArtistClass.objects.get(mbid=artistid)
 
-        mbartist = compmusic.mb.get_artist_by_id(artistid, includes=["url-rels", "artist-rels", "aliases", "tags"])["artist"]
+        mbartist = musicbrainz.get_artist_by_id(artistid, includes=["url-rels", "artist-rels", "aliases", "tags"])["artist"]
         artist = self._create_artist_object(self._ArtistClass, self._ArtistAliasClass, mbartist)
 
         sortname = mbartist['sort-name'].replace(", ", " ")
@@ -119,7 +119,7 @@ class JingjuReleaseImporter(release_importer.ReleaseImporter):
             artist.role_type = role_type
         artist.save()
 
-        self.imported_artists.append(artistid)
+        self.imported_artists.add(artistid)
         return artist
 
     def _get_roletype_from_tags(self, tags):
@@ -17,13 +17,20 @@
 from __future__ import print_function
 from __future__ import absolute_import
 
+import json
 import os
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 
 import celery
 import compmusic
+from django.conf import settings
 
+import carnatic.artistgraph
 import data
+import data.apicache
+import data.autocomplete
+import data.filters
 import docserver
 import docserver.util
 from dashboard import andalusian_importer
@@ -32,6 +39,7 @@ from dashboard import hindustani_importer
 from dashboard import makam_importer
 from dashboard import jingju_importer
 from dashboard import models
+from dashboard import musicbrainz
 from dashboard.log import import_logger
 from dunya.celery import app
 
@@ -112,7 +120,17 @@ def import_single_release(releasepk):
         release.add_log_message("Cannot discover importer based on collection name (does it include carnatic/hindustani/makam/andalusian?)")
         release.set_state_error()
         return
-    import_release(releasepk, ri)
+    # Get the release from MusicBrainz again in case it was edited since the last import
+    with musicbrainz.refreshing():
+        import_release(releasepk, ri)
+    queue_post_import_tasks(ri._ReleaseClass._meta.app_label)
+
+
+# Write releases with ReleaseImporter.bulk_import_release
+BULK_IMPORT = getattr(settings, "DASHBOARD_BULK_IMPORT", True)
+# How many releases each task imports when importing a whole collection.
+# If 0, all releases are imported in one task
+IMPORT_SHARD_SIZE = getattr(settings, "DASHBOARD_IMPORT_SHARD_SIZE", 10)
 
 
 def import_release(releasepk, ri):
@@ -142,7 +160,10 @@ def import_release(releasepk, ri):
             directories = [os.path.join(collection.audio_directory, d.path) for d in release.collectiondirectory_set.all()]
             # Set the release logger releaseid to the id of the current release
             import_logger.releaseid = release.pk
-            ri.import_release(release.mbid, directories)
+            if BULK_IMPORT and ri.supports_bulk_import:
+                ri.bulk_import_release(release.mbid, directories)
+            else:
+                ri.import_release(release.mbid, directories)
         except Exception:
             abort = True
             tb = traceback.format_exc()
@@ -206,19 +227,141 @@ def force_import_all_releases(collectionid):
                 r.ignore = False
                 r.save()
             unstarted.append(r)
+    if IMPORT_SHARD_SIZE and len(unstarted) > IMPORT_SHARD_SIZE:
+        # Import the releases in separate tasks so that they're shared
+        # between all workers, and finish once they are all done
+        releasepks = [r.pk for r in unstarted]
+        shards = [releasepks[i:i + IMPORT_SHARD_SIZE] for i in range(0, len(releasepks), IMPORT_SHARD_SIZE)]
+        collection.add_log_message("Importing %s releases in %s tasks" % (len(releasepks), len(shards)))
+        header = [import_release_shard.si(collectionid, shard) for shard in shards]
+        celery.chord(header)(finish_import_all_releases.si(collectionid))
+        return
     for r in unstarted:
         import_release(r.id, ri)
     collection.set_state_finished()
+    queue_post_import_tasks(ri._ReleaseClass._meta.app_label)
+
+
+@app.task(base=CollectionDunyaTask)
+def import_release_shard(collectionid, releasepks):
+    """ Import some of the releases of a collection, as part of force_import_all_releases """
+    collection = models.Collection.objects.get(collectionid=collectionid)
+    ri = get_release_importer(collection)
+    for releasepk in releasepks:
+        import_release(releasepk, ri)
+
+
+@app.task(base=CollectionDunyaTask)
+def finish_import_all_releases(collectionid):
+    """ Run once all import_release_shard tasks of a collection have finished """
+    collection = models.Collection.objects.get(collectionid=collectionid)
+    collection.add_log_message("Release import finished")
+    collection.set_state_finished()
+    ri = get_release_importer(collection)
+    queue_post_import_tasks(ri._ReleaseClass._meta.app_label)
+
+
+def queue_post_import_tasks(app_label):
+    """ Rebuild the data derived from an app's tables once its releases are imported """
+    data.apicache.bump(app_label)
+    update_filter_payloads.delay(app_label)
+    update_autocomplete.delay(app_label)
+    if app_label == "carnatic":
+        update_artist_graph.delay()
+
 
+@app.task(ignore_result=True)
+def update_filter_payloads(app_label):
+    """ Build the saved filters.json responses which use data from an app again """
+    data.filters.update_app(app_label)
+
+
+@app.task(ignore_result=True)
+def update_autocomplete(app_label):
+    """ Build the searchcomplete suggestions of an app again """
+    if app_label in data.autocomplete.SOURCES:
+        data.autocomplete.update_app(app_label)
+
+
+@app.task(ignore_result=True)
+def update_artist_graph():
+    """ Build the carnatic guru/student graph again """
+    carnatic.artistgraph.build()
+
+
+# How many files to read tags from at the same time when scanning a collection
+SCAN_THREADS = getattr(settings, "DASHBOARD_SCAN_THREADS", 8)
+# How many paths to look up in the FileMetadata table in one query
+METADATA_QUERY_SIZE = 1000
 
-def _get_musicbrainz_release_for_dir(dirname):
+
+def _read_metadata(paths):
+    """ Get the tags of many audio files. Returns a dictionary {path: metadata}
+    with paths normalised with os.path.normpath.
+
+    Tags are taken from the FileMetadata table if the size and modification
+    time of the file haven't changed since they were stored. The other files
+    are read in a thread pool and the table is updated.
+    """
+    paths = [os.path.normpath(p) for p in paths]
+    stats = {}
+    for path in paths:
+        try:
+            st = os.stat(path)
+            stats[path] = (st.st_size, st.st_mtime)
+        except OSError:
+            # compmusic.file_metadata will deal with it, but we can't cache it
+            pass
+
+    ret = {}
+    stale = []
+    statpaths = list(stats.keys())
+    for i in range(0, len(statpaths), METADATA_QUERY_SIZE):
+        chunk = statpaths[i:i + METADATA_QUERY_SIZE]
+        for cached in models.FileMetadata.objects.filter(path__in=chunk):
+            if (cached.size, cached.mtime) == stats[cached.path]:
+                ret[cached.path] = json.loads(cached.metadata)
+            else:
+                stale.append(cached.path)
+
+    to_read = [p for p in paths if p not in ret]
+    if to_read:
+        with ThreadPoolExecutor(max_workers=SCAN_THREADS) as executor:
+            for path, meta in zip(to_read, executor.map(compmusic.file_metadata, to_read)):
+                ret[path] = meta
+
+    to_cache = [p for p in to_read if p in stats]
+    for i in range(0, len(stale), METADATA_QUERY_SIZE):
+        models.FileMetadata.objects.filter(path__in=stale[i:i + METADATA_QUERY_SIZE]).delete()
+    # Another scan may have stored some of the same files while we read them
+    models.FileMetadata.objects.bulk_create(
+        [models.FileMetadata(path=p, size=stats[p][0], mtime=stats[p][1], metadata=json.dumps(ret[p]))
+         for p in to_cache], batch_size=METADATA_QUERY_SIZE, ignore_conflicts=True)
+    return ret
+
+
+def _get_metadata(path, metadata=None):
+    """ The tags of a file from a dictionary returned by _read_metadata,
+    or read from the file if it isn't in the dictionary """
+    if metadata is not None:
+        normpath = os.path.normpath(path)
+        if normpath in metadata:
+            return metadata[normpath]
+    return compmusic.file_metadata(path)
+
+
+def _get_musicbrainz_release_for_dir(dirname, metadata=None):
     """ Get a unique list of all the musicbrainz release IDs that
     are in tags in mp3 files in the given directory.
+
+    metadata: optionally, tags of files already read with _read_metadata
     """
+    paths = [os.path.join(dirname, fname) for fname in _get_mp3_files(os.listdir(dirname))]
+    if metadata is None:
+        metadata = _read_metadata(paths)
     release_ids = set()
-    for fname in _get_mp3_files(os.listdir(dirname)):
-        fpath = os.path.join(dirname, fname)
-        meta = compmusic.file_metadata(fpath)
+    for fpath in paths:
+        meta = _get_metadata(fpath, metadata)
         if meta:
             rel = meta["meta"]["releaseid"]
             if rel:
@@ -248,7 +391,7 @@ def update_collection(collectionid):
 
     for relid in to_add:
         try:
-            mbrelease = compmusic.mb.get_release_by_id(relid, includes=["artists"])["release"]
+            mbrelease = musicbrainz.get_release_by_id(relid, includes=["artists"])["release"]
             title = mbrelease["title"]
             artist = mbrelease["artist-credit-phrase"]
             rel, created = models.MusicbrainzRelease.objects.get_or_create(
@@ -262,12 +405,13 @@ def update_collection(collectionid):
         coll.musicbrainzrelease_set.filter(mbid=relid).delete()
 
 
-def _match_directory_to_release(collectionid, root):
+def _match_directory_to_release(collectionid, root, metadata=None):
     """ Try and match a single directory containing audio files to a release
         that exists in the given collection.
 
         collectionid: the ID of the collection we want the directory to be in
         root: the root path of the directory containing audio files
+        metadata: optionally, tags of files already read with _read_metadata
     """
     coll = models.Collection.objects.get(collectionid=collectionid)
     collectionroot = coll.audio_directory
@@ -281,7 +425,7 @@ def _match_directory_to_release(collectionid, root):
         shortpath = root
     # Try and find the musicbrainz release for the files in the directory
     cd, created = models.CollectionDirectory.objects.get_or_create(collection=coll, path=shortpath)
-    rels = _get_musicbrainz_release_for_dir(root)
+    rels = _get_musicbrainz_release_for_dir(root, metadata)
     if len(rels) == 1:
         releaseid = rels[0]
         try:
@@ -291,18 +435,19 @@ def _match_directory_to_release(collectionid, root):
 
             mp3files = _get_mp3_files(os.listdir(root))
             for f in mp3files:
-                _create_collectionfile(cd, f)
+                _create_collectionfile(cd, f, metadata)
         except models.MusicbrainzRelease.DoesNotExist:
             pass
 
 
-def _create_collectionfile(cd, name):
+def _create_collectionfile(cd, name, metadata=None):
     """arguments:
        cd: a collectiondirectory
        name: the name of the file, with no path information
+       metadata: optionally, tags of files already read with _read_metadata
     """
     path = os.path.join(cd.full_path, name)
-    meta = compmusic.file_metadata(path)
+    meta = _get_metadata(path, metadata)
     recordingid = meta["meta"].get("recordingid")
     size = os.path.getsize(path)
     cfile, created = models.CollectionFile.objects.get_or_create(name=name, directory=cd, recordingid=recordingid, defaults={'filesize': size})
@@ -325,17 +470,21 @@ def scan_and_link(collectionid):
     if not collectionroot.endswith("/"):
         collectionroot += "/"
     found_directories = []
+    found_files = []
     for root, d, files in os.walk(collectionroot):
         mp3files = _get_mp3_files(files)
         if len(mp3files) > 0:
             found_directories.append(root)
+            found_files.extend([os.path.join(root, f) for f in mp3files])
+    # Read the tags of all files at once, so that they can be read in parallel
+    metadata = _read_metadata(found_files)
     existing_directories = [c.full_path for c in coll.collectiondirectory_set.all()]
 
     to_remove = set(existing_directories) - set(found_directories)
     to_add = set(found_directories) - set(existing_directories)
 
     for d in to_add:
-        _match_directory_to_release(collectionid, d)
+        _match_directory_to_release(collectionid, d, metadata)
 
     for d in to_remove:
         # We have a full path, but collectiondirectories are
@@ -347,36 +496,44 @@ def scan_and_link(collectionid):
     # try and match it
     cds = coll.collectiondirectory_set.filter(musicbrainzrelease__isnull=True)
     for cd in cds:
-        _match_directory_to_release(coll.collectionid, cd.full_path)
+        _match_directory_to_release(coll.collectionid, cd.full_path, metadata)
 
-    _check_existing_directories(coll)
+    _check_existing_directories(coll, metadata)
 
 
-def _check_existing_directories(coll):
+def _check_existing_directories(coll, metadata=None):
     # For all of the matched directories, look at the contents of them and
     # remove/add files as needed
     # We don't remove from the docserver because it's not very important to
     # remove them, and it's complex to cover all cases. We do this separately
-    for cd in coll.collectiondirectory_set.all():
+    directories = []
+    for cd in coll.collectiondirectory_set.select_related("collection"):
         files = os.listdir(cd.full_path)
         mp3files = _get_mp3_files(files)
-        existing_f = cd.collectionfile_set.all()
-        existing_names = [f.name for f in existing_f]
+        existing_f = {f.name: f for f in cd.collectionfile_set.all()}
+        existing_names = list(existing_f.keys())
 
         to_remove = set(existing_names) - set(mp3files)
         to_add = set(mp3files) - set(existing_names)
         same_files = set(mp3files) & set(existing_names)
+        directories.append((cd, existing_f, to_remove, to_add, same_files))
+
+    if metadata is None:
+        # Read the tags of all the files that we need to check at once
+        metadata = _read_metadata([os.path.join(cd.full_path, f)
+                                   for cd, _, _, _, same_files in directories for f in same_files])
 
+    for cd, existing_f, to_remove, to_add, same_files in directories:
         for rm in to_remove:
             # If it was renamed, we will make a CollectionFile in
             # the to_add block below
-            cd.collectionfile_set.get(name=rm).delete()
+            existing_f[rm].delete()
 
         for f in same_files:
             # Look through all files and see if the mbid has changed. If it's changed,
             # update the reference
-            fileobject = cd.collectionfile_set.get(name=f)
-            meta = compmusic.file_metadata(os.path.join(cd.full_path, f))
+            fileobject = existing_f[f]
+            meta = _get_metadata(os.path.join(cd.full_path, f), metadata)
             recordingid = meta["meta"].get("recordingid")
             if recordingid != fileobject.recordingid:
                 fileobject.recordingid = recordingid
@@ -385,7 +542,7 @@ def _check_existing_directories(coll):
         if to_add:
             # If there are new files in the directory, just run _match again and
             # it will create the new file objects
-            _match_directory_to_release(coll.collectionid, cd.full_path)
+            _match_directory_to_release(coll.collectionid, cd.full_path, metadata)
 
 
 @app.task
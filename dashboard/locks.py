@@ -0,0 +1,69 @@
+# Copyright 2013-2018 Music Technology Group - Universitat Pompeu Fabra
+#
+# This file is part of Dunya
+#
+# Dunya is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Affero General Public License as published by the Free Software
+# Foundation (FSF), either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see http://www.gnu.org/licenses/
+
+""" Locks shared between the threads and processes of the importers.
+
+Keys are strings such as "artist:<mbid>". On postgresql they are held as
+advisory locks so that celery workers on different hosts wait for each
+other. Other databases only get the lock between threads of a process.
+"""
+
+import collections
+import contextlib
+import hashlib
+import threading
+
+from django.db import connection
+
+_locks = collections.defaultdict(threading.RLock)
+_locks_lock = threading.Lock()
+
+
+def _lockid(key):
+    """ A postgres bigint for a key """
+    return int(hashlib.sha1(key.encode("utf-8")).hexdigest()[:15], 16)
+
+
+@contextlib.contextmanager
+def advisory_lock(key):
+    """ Only let one thread of one process run the block for the same key at a time.
+        The lock can be taken again by the thread that holds it """
+    with _locks_lock:
+        lock = _locks[key]
+    with lock:
+        if connection.vendor != "postgresql":
+            yield
+            return
+        lockid = _lockid(key)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_lock(%s)", [lockid])
+        try:
+            yield
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", [lockid])
+
+
+def transaction_locks(keys):
+    """ Lock many keys until the end of the current transaction, with one query.
+        Locks are taken in a fixed order so that two transactions locking
+        some of the same keys can't deadlock """
+    if connection.vendor != "postgresql" or not keys:
+        return
+    lockids = sorted(set(_lockid(k) for k in keys))
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(l) FROM (SELECT unnest(%s::bigint[]) AS l ORDER BY l) AS locks",
+                       [lockids])
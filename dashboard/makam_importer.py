@@ -34,6 +34,7 @@ class MakamReleaseImporter(release_importer.ReleaseImporter):
     _RecordingClass = makam.models.Recording
     _InstrumentClass = makam.models.Instrument
     _WorkClass = makam.models.Work
+    _recording_release_field = "release"
 
     def _link_release_recording(self, release, recording, trackorder, mnum, tnum):
         if not release.recordings.filter(pk=recording.pk).exists():
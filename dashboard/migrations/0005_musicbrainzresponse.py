@@ -0,0 +1,20 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0004_filemetadata'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MusicbrainzResponse',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=500, unique=True)),
+                ('response', models.TextField()),
+                ('fetched', models.DateTimeField()),
+            ],
+        ),
+    ]
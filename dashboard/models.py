@@ -387,3 +387,34 @@ class CollectionFile(models.Model):
 
     def get_absolute_url(self):
         return reverse('dashboard-file', args=[int(self.id)])
+
+
+class FileMetadata(models.Model):
+    """ The tags of an audio file, as returned by compmusic.file_metadata.
+    A collection scan only reads the tags of a file again if its size
+    or modification time are different to the ones stored here. """
+
+    path = models.CharField(max_length=1000, unique=True)
+    size = models.BigIntegerField()
+    mtime = models.FloatField()
+    # json-encoded metadata
+    metadata = models.TextField()
+
+    def __str__(self):
+        return self.path
+
+
+class MusicbrainzResponse(models.Model):
+    """ A response from the MusicBrainz web service, stored so that
+    imports don't have to request the same entity again. See
+    dashboard.musicbrainz """
+
+    # entity type, mbid and includes of the request
+    key = models.CharField(max_length=500, unique=True)
+    # json-encoded response
+    response = models.TextField()
+    # When we last requested it from MusicBrainz
+    fetched = models.DateTimeField()
+
+    def __str__(self):
+        return self.key
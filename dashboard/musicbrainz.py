@@ -0,0 +1,138 @@
+# Copyright 2013-2018 Music Technology Group - Universitat Pompeu Fabra
+#
+# This file is part of Dunya
+#
+# Dunya is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Affero General Public License as published by the Free Software
+# Foundation (FSF), either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see http://www.gnu.org/licenses/
+
+""" Cached lookups of MusicBrainz entities for the importers.
+
+Responses are stored in the MusicbrainzResponse table, so they are shared
+between importers and celery workers and kept between imports. A response
+is used for MUSICBRAINZ_CACHE_TIMEOUT seconds and then requested again.
+
+An explicit re-import of a release runs in refreshing(), so that it gets
+the entities that it uses from MusicBrainz again and sees recent edits.
+
+Only one request for the same entity is made at a time. Other threads of
+the same process wait on a lock, and other processes wait on a postgres
+advisory lock. Once they have the lock they use the response that the
+first request stored.
+"""
+
+import contextlib
+import datetime
+import json
+import threading
+
+import compmusic
+import django.utils.timezone
+from django.conf import settings
+
+from dashboard import locks
+from dashboard import models
+
+CACHE_TIMEOUT = getattr(settings, "MUSICBRAINZ_CACHE_TIMEOUT", 7 * 24 * 60 * 60)
+
+_local = threading.local()
+
+
+def _key(entity, mbid, includes):
+    return "%s:%s:%s" % (entity, mbid, "+".join(includes))
+
+
+def _oldest():
+    """ Stored responses fetched before this time are requested again """
+    oldest = django.utils.timezone.now() - datetime.timedelta(seconds=CACHE_TIMEOUT)
+    since = getattr(_local, "refresh_since", None)
+    if since is not None and since > oldest:
+        return since
+    return oldest
+
+
+@contextlib.contextmanager
+def refreshing():
+    """ Request entities from MusicBrainz again if their stored response was
+        fetched before the block started. Responses fetched after that are
+        still used, so an entity is only requested once in a re-import """
+    previous = getattr(_local, "refresh_since", None)
+    _local.refresh_since = django.utils.timezone.now()
+    try:
+        yield
+    finally:
+        _local.refresh_since = previous
+
+
+def _get_fresh(key):
+    """ The stored response for `key` if it's recent enough, otherwise None """
+    oldest = _oldest()
+    try:
+        cached = models.MusicbrainzResponse.objects.get(key=key, fetched__gte=oldest)
+    except models.MusicbrainzResponse.DoesNotExist:
+        return None
+    return json.loads(cached.response)
+
+
+def _store(key, response):
+    """ Save a response, replacing the one already stored """
+    models.MusicbrainzResponse.objects.update_or_create(
+        key=key, defaults={"response": json.dumps(response, sort_keys=True), "fetched": django.utils.timezone.now()})
+
+
+def get(entity, mbid, includes=None):
+    """ Get an entity from MusicBrainz, like compmusic.mb.get_<entity>_by_id.
+        Raises compmusic.mb.ResponseError if MusicBrainz can't return it """
+    includes = sorted(includes or [])
+    key = _key(entity, mbid, includes)
+    response = _get_fresh(key)
+    if response is not None:
+        return response
+
+    with locks.advisory_lock(key):
+        # Someone else may have requested it while we were waiting for the lock
+        response = _get_fresh(key)
+        if response is None:
+            method = getattr(compmusic.mb, "get_%s_by_id" % entity)
+            response = method(mbid, includes=includes)
+            _store(key, response)
+    return response
+
+
+def get_many(entity, mbids, includes=None):
+    """ Get many entities of the same type. Returns a dictionary {mbid: response}.
+        Stored responses are loaded in one query """
+    includes = sorted(includes or [])
+    keys = {_key(entity, mbid, includes): mbid for mbid in mbids}
+    oldest = _oldest()
+    ret = {}
+    for cached in models.MusicbrainzResponse.objects.filter(key__in=list(keys.keys()), fetched__gte=oldest):
+        ret[keys[cached.key]] = json.loads(cached.response)
+    for mbid in mbids:
+        if mbid not in ret:
+            ret[mbid] = get(entity, mbid, includes)
+    return ret
+
+
+def get_release_by_id(mbid, includes=None):
+    return get("release", mbid, includes)
+
+
+def get_artist_by_id(mbid, includes=None):
+    return get("artist", mbid, includes)
+
+
+def get_recording_by_id(mbid, includes=None):
+    return get("recording", mbid, includes)
+
+
+def get_work_by_id(mbid, includes=None):
+    return get("work", mbid, includes)
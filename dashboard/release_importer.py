@@ -15,11 +15,15 @@
 # this program.  If not, see http://www.gnu.org/licenses/
 
 from __future__ import print_function
-import compmusic
 import django.utils.timezone
+from django.db import transaction
+from django.db.models import Q
 
 import data.models
+import data.search
 from dashboard import external_data
+from dashboard import locks
+from dashboard import musicbrainz
 from dashboard.log import import_logger
 from dashboard.log import logger
 
@@ -38,7 +42,21 @@ RELATION_RELEASE_VOCAL = "eb10f8a0-0f4c-4dce-aa47-87bcb2bc42f3"
 RELATION_RECORDING_INSTRUMENT = "59054b12-01ac-43ee-a618-285fd397e461"
 RELATION_RELEASE_INSTRUMENT = "67555849-61e5-455b-96e3-29733f0115f5"
 
+RELEASE_INCLUDES = ["artists", "recordings", "artist-rels", "release-groups"]
+ARTIST_INCLUDES = ["url-rels", "artist-rels", "aliases"]
+RECORDING_INCLUDES = ["tags", "work-rels", "artist-rels", "artists"]
+WORK_INCLUDES = ["artist-rels"]
+
+
 class ReleaseImporter(object):
+    # Set in subclasses which implement the hooks used by bulk_import_release
+    supports_bulk_import = False
+    # Fields set by _set_work_attributes, saved by bulk_import_release
+    _work_attribute_fields = []
+    # The relation from _RecordingClass to _ReleaseClass, used to update the
+    # search text of recordings (see data.search). None if recordings have no search text
+    _recording_release_field = None
+
     def __init__(self, collection):
         """Create a release importer.
         Arguments:
@@ -47,9 +65,26 @@ class ReleaseImporter(object):
         self.date_import_started = django.utils.timezone.now()
         self.collection = collection
 
-        self.imported_artists = []
-        self.imported_composers = []
+        self.imported_artists = set()
+        self.imported_composers = set()
         self.imported_releases = []
+        # Lookups of raagas, instruments etc. by name, see _cached_lookup
+        self._lookups = {}
+
+    def _cached_lookup(self, kind, name, lookup):
+        """ Return lookup(name), only calling it once per kind and name
+            during this import """
+        key = (kind, name)
+        if key not in self._lookups:
+            self._lookups[key] = lookup(name)
+        return self._lookups[key]
+
+    def _lock_key(self, Klass, mbid):
+        return "%s:%s" % (Klass._meta.db_table, mbid)
+
+    def _lock(self, Klass, mbid):
+        """ Stop other importers from writing the same object at the same time """
+        return locks.advisory_lock(self._lock_key(Klass, mbid))
 
     def _get_year_from_date(self, date):
         if date:
@@ -60,27 +95,29 @@ class ReleaseImporter(object):
         return date
 
     def make_mb_source(self, url):
-        sn = data.models.SourceName.objects.get(name="MusicBrainz")
-        source, created = data.models.Source.objects.get_or_create(source_name=sn, uri=url)
-        if not created:
-            source.last_updated = django.utils.timezone.now()
-            source.save()
-        return source
+        with locks.advisory_lock("source:%s" % url):
+            sn = data.models.SourceName.objects.get(name="MusicBrainz")
+            source, created = data.models.Source.objects.get_or_create(source_name=sn, uri=url)
+            if not created:
+                source.last_updated = django.utils.timezone.now()
+                source.save()
+            return source
 
     def make_wikipedia_source(self, url):
-        sn = data.models.SourceName.objects.get(name="Wikipedia")
-        source, created = data.models.Source.objects.get_or_create(source_name=sn, uri=url)
-        if not created:
-            source.last_updated = django.utils.timezone.now()
-            source.save()
-        return source
+        with locks.advisory_lock("source:%s" % url):
+            sn = data.models.SourceName.objects.get(name="Wikipedia")
+            source, created = data.models.Source.objects.get_or_create(source_name=sn, uri=url)
+            if not created:
+                source.last_updated = django.utils.timezone.now()
+                source.save()
+            return source
 
     def import_release(self, releaseid, directories):
         if releaseid in self.imported_releases:
             print("Release already updated in this import. Not doing it again")
             return self._ReleaseClass.objects.get(mbid=releaseid)
 
-        rel = compmusic.mb.get_release_by_id(releaseid, includes=["artists", "recordings", "artist-rels", "release-groups"])
+        rel = musicbrainz.get_release_by_id(releaseid, includes=RELEASE_INCLUDES)
         rel = rel["release"]
 
         mbid = rel["id"]
@@ -115,11 +152,23 @@ class ReleaseImporter(object):
             self._add_release_performance(release.mbid, artistid, perf_type, attrs)
 
         self._add_release_artists_as_relationship(release, rel["artist-credit"])
+        self._update_search_text(release)
+        self._update_release_stats(release)
 
         self._add_image_to_release(release, directories)
         self.imported_releases.append(releaseid)
         return release
 
+    def _update_search_text(self, release):
+        if self._recording_release_field:
+            recordings = self._RecordingClass.objects.filter(**{self._recording_release_field: release})
+            data.search.update_recordings(self._RecordingClass, self._recording_release_field, recordings)
+
+    def _update_release_stats(self, release):
+        """ Update any saved statistics which depend on the release. Importers
+            which keep statistics override this """
+        pass
+
     def _add_image_to_release(self, release, directories):
         external_data.import_release_image(release, directories)
 
@@ -129,30 +178,63 @@ class ReleaseImporter(object):
         pass
 
     def _create_release_object(self, mbrelease):
-        release, created = self._ReleaseClass.objects.get_or_create(
-            mbid=mbrelease["id"], defaults={"title": mbrelease["title"]})
-        if "release-group" in mbrelease and "primary-type" in mbrelease["release-group"]:
-            release.rel_type = mbrelease["release-group"]["primary-type"]
-        if "status" in mbrelease:
-            release.status = mbrelease["status"]
-        release.title = mbrelease["title"]
-        year = self._get_year_from_date(mbrelease.get("date"))
-        release.year = year
-        credit_phrase = mbrelease.get("artist-credit-phrase")
-        release.artistcredit = credit_phrase
-        release.collection = self.collection
-        release.save()
-
-        return release
+        with self._lock(self._ReleaseClass, mbrelease["id"]):
+            release, created = self._ReleaseClass.objects.get_or_create(
+                mbid=mbrelease["id"], defaults={"title": mbrelease["title"]})
+            if "release-group" in mbrelease and "primary-type" in mbrelease["release-group"]:
+                release.rel_type = mbrelease["release-group"]["primary-type"]
+            if "status" in mbrelease:
+                release.status = mbrelease["status"]
+            release.title = mbrelease["title"]
+            year = self._get_year_from_date(mbrelease.get("date"))
+            release.year = year
+            credit_phrase = mbrelease.get("artist-credit-phrase")
+            release.artistcredit = credit_phrase
+            release.collection = self.collection
+            release.save()
+
+            return release
 
     def _create_artist_object(self, ArtistKlass, AliasKlass, mbartist, alias_ref="artist"):
         artistid = mbartist["id"]
 
-        artist, created = ArtistKlass.objects.get_or_create(
-            mbid=artistid,
-            defaults={"name": mbartist["name"]})
-
-        logger.info("  adding artist/composer %s" % (artistid, ))
+        with self._lock(ArtistKlass, artistid):
+            artist, created = ArtistKlass.objects.get_or_create(
+                mbid=artistid,
+                defaults={"name": mbartist["name"]})
+
+            logger.info("  adding artist/composer %s" % (artistid, ))
+            self._set_artist_fields(artist, mbartist)
+            artist.save()
+
+            # add wikipedia references if they exist
+            wikipedia_url = self._get_wikipedia_url(mbartist)
+
+            # We can't 'clear' an alias list from artist because an alias
+            # object requires an artist.
+            # TODO Deleting these each time we overwrite means we churn the
+            # alias ids. This may or may not be a good idea
+            if AliasKlass:
+                args = {alias_ref: artist}
+                AliasKlass.objects.filter(**args).delete()
+                for alias in mbartist.get("alias-list", []):
+                    a = alias["alias"]
+                    primary = alias.get("primary")
+                    locale = alias.get("locale")
+                    args = {"alias": a, alias_ref: artist}
+                    aob, created = AliasKlass.objects.get_or_create(**args)
+                    if primary:
+                        aob.primary = True
+                    if locale:
+                        aob.locale = locale
+                    aob.save()
+
+            if wikipedia_url:
+                source = self.make_wikipedia_source(wikipedia_url)
+                external_data.import_artist_wikipedia(artist, source)
+            return artist
+
+    def _set_artist_fields(self, artist, mbartist):
         artist.name = mbartist["name"]
         if mbartist.get("type") == "Person":
             artist.artist_type = "P"
@@ -166,37 +248,21 @@ class ReleaseImporter(object):
         if dates:
             artist.begin = dates.get("begin")
             artist.end = dates.get("end")
-        artist.save()
 
-        # add wikipedia references if they exist
+    def _get_wikipedia_url(self, mbartist):
         wikipedia_url = None
         for rel in mbartist.get("url-relation-list", []):
             if rel["type-id"] == RELEASE_TYPE_WIKIPEDIA:
                 wikipedia_url = rel["target"]
+        return wikipedia_url
 
-        # We can't 'clear' an alias list from artist because an alias
-        # object requires an artist.
-        # TODO Deleting these each time we overwrite means we churn the
-        # alias ids. This may or may not be a good idea
-        if AliasKlass:
-            args = {alias_ref: artist}
-            AliasKlass.objects.filter(**args).delete()
-            for alias in mbartist.get("alias-list", []):
-                a = alias["alias"]
-                primary = alias.get("primary")
-                locale = alias.get("locale")
-                args = {"alias": a, alias_ref: artist}
-                aob, created = AliasKlass.objects.get_or_create(**args)
-                if primary:
-                    aob.primary = True
-                if locale:
-                    aob.locale = locale
-                aob.save()
-
-        if wikipedia_url:
-            source = self.make_wikipedia_source(wikipedia_url)
-            external_data.import_artist_wikipedia(artist, source)
-        return artist
+    def _get_group_member_ids(self, mbartist):
+        members = []
+        if mbartist.get("type") == "Group":
+            for member in mbartist.get("artist-relation-list", []):
+                if member["type-id"] == MEMBER_OF_GROUP and member.get("direction") == "backward":
+                    members.append(member["target"])
+        return members
 
     def add_and_get_release_artist(self, artistid):
         return self.add_and_get_artist(artistid)
@@ -206,28 +272,28 @@ class ReleaseImporter(object):
             print("Artist already updated in this import. Not doing it again")
             return self._ArtistClass.objects.get(mbid=artistid)
 
-        mbartist = compmusic.mb.get_artist_by_id(artistid, includes=["url-rels", "artist-rels", "aliases"])["artist"]
-        artist = self._create_artist_object(self._ArtistClass, self._ArtistAliasClass, mbartist)
+        with self._lock(self._ArtistClass, artistid):
+            mbartist = musicbrainz.get_artist_by_id(artistid, includes=ARTIST_INCLUDES)["artist"]
+            artist = self._create_artist_object(self._ArtistClass, self._ArtistAliasClass, mbartist)
 
-        artist.group_members.clear()
-        if mbartist.get("type") == "Group":
-            for member in mbartist.get("artist-relation-list", []):
-                if member["type-id"] == MEMBER_OF_GROUP and member.get("direction") == "backward":
-                    memberartist = self.add_and_get_artist(member["target"])
-                    if not artist.group_members.filter(mbid=memberartist.mbid).exists():
-                        artist.group_members.add(memberartist)
-        self.imported_artists.append(artistid)
-        return artist
+            artist.group_members.clear()
+            for memberid in self._get_group_member_ids(mbartist):
+                memberartist = self.add_and_get_artist(memberid)
+                if not artist.group_members.filter(mbid=memberartist.mbid).exists():
+                    artist.group_members.add(memberartist)
+            self.imported_artists.add(artistid)
+            return artist
 
     def add_and_get_composer(self, artistid):
         if artistid in self.imported_composers:
             print("Composer already updated in this import. Not doing it again")
             return self._ComposerClass.objects.get(mbid=artistid)
 
-        mbartist = compmusic.mb.get_artist_by_id(artistid, includes=["url-rels", "artist-rels", "aliases"])["artist"]
-        composer = self._create_artist_object(self._ComposerClass, self._ComposerAliasClass, mbartist, alias_ref="composer")
-        self.imported_composers.append(artistid)
-        return composer
+        with self._lock(self._ComposerClass, artistid):
+            mbartist = musicbrainz.get_artist_by_id(artistid, includes=ARTIST_INCLUDES)["artist"]
+            composer = self._create_artist_object(self._ComposerClass, self._ComposerAliasClass, mbartist, alias_ref="composer")
+            self.imported_composers.add(artistid)
+            return composer
 
     def _get_artist_performances(self, artistrelationlist):
         performances = []
@@ -243,45 +309,46 @@ class ReleaseImporter(object):
         return performances
 
     def add_and_get_recording(self, recordingid):
-        mbrec = compmusic.mb.get_recording_by_id(recordingid, includes=["tags", "work-rels", "artist-rels", "artists"])
-        mbrec = mbrec["recording"]
-
-        rec, created = self._RecordingClass.objects.get_or_create(mbid=recordingid)
-        logger.info("  adding recording %s" % (recordingid,))
-        import_logger.info("importing recording %s", mbrec["title"])
-        rec.length = mbrec.get("length")
-        rec.title = mbrec["title"]
-        rec.save()
-
-        artistids = []
-        # Create recording primary artists
-        for a in mbrec.get("artist-credit", []):
-            if isinstance(a, dict):
-                artistid = a["artist"]["id"]
-                artistids.append(artistid)
-        self._add_recording_artists(rec, artistids)
-
-        works = []
-        for work in mbrec.get("work-relation-list", []):
-            if work["type"] == "performance":
-                w = self.add_and_get_work(work["target"])
-                works.append(w)
-
-        tags = mbrec.get("tag-list", [])
-        # Join recording and works in a subclass because some models
-        # have 1 work per recording and others have many
-        self._join_recording_and_works(rec, works)
-
-        # Sometime we attach tags to works, sometimes to recordings
-        self._apply_tags(rec, works, tags)
-
-        IPClass = rec.get_object_map("performance")
-        IPClass.objects.filter(recording=rec).delete()
-        for perf in self._get_artist_performances(mbrec.get("artist-relation-list", [])):
-            artistid, perf_type, attrs = perf
-            self._add_recording_performance(recordingid, artistid, perf_type, attrs)
-
-        return rec
+        with self._lock(self._RecordingClass, recordingid):
+            mbrec = musicbrainz.get_recording_by_id(recordingid, includes=RECORDING_INCLUDES)
+            mbrec = mbrec["recording"]
+
+            rec, created = self._RecordingClass.objects.get_or_create(mbid=recordingid)
+            logger.info("  adding recording %s" % (recordingid,))
+            import_logger.info("importing recording %s", mbrec["title"])
+            rec.length = mbrec.get("length")
+            rec.title = mbrec["title"]
+            rec.save()
+
+            artistids = []
+            # Create recording primary artists
+            for a in mbrec.get("artist-credit", []):
+                if isinstance(a, dict):
+                    artistid = a["artist"]["id"]
+                    artistids.append(artistid)
+            self._add_recording_artists(rec, artistids)
+
+            works = []
+            for work in mbrec.get("work-relation-list", []):
+                if work["type"] == "performance":
+                    w = self.add_and_get_work(work["target"])
+                    works.append(w)
+
+            tags = mbrec.get("tag-list", [])
+            # Join recording and works in a subclass because some models
+            # have 1 work per recording and others have many
+            self._join_recording_and_works(rec, works)
+
+            # Sometime we attach tags to works, sometimes to recordings
+            self._apply_tags(rec, works, tags)
+
+            IPClass = rec.get_object_map("performance")
+            IPClass.objects.filter(recording=rec).delete()
+            for perf in self._get_artist_performances(mbrec.get("artist-relation-list", [])):
+                artistid, perf_type, attrs = perf
+                self._add_recording_performance(recordingid, artistid, perf_type, attrs)
+
+            return rec
 
     def _clear_work_composers(self, work):
         pass
@@ -293,29 +360,363 @@ class ReleaseImporter(object):
         pass
 
     def add_and_get_work(self, workid):
-        mbwork = compmusic.mb.get_work_by_id(workid, includes=["artist-rels"])["work"]
-        import_logger.info("adding work %s", mbwork["title"])
-        work, created = self._WorkClass.objects.get_or_create(
-            mbid=workid,
-            defaults={"title": mbwork["title"]})
-
-        work.title = mbwork["title"]
-        work.save()
-
-        self._clear_work_composers(work)
-        self._add_work_attributes(work, mbwork, created)
-
-        for artist in mbwork.get("artist-relation-list", []):
-            if artist["type-id"] == RELATION_COMPOSER:
-                composer = self.add_and_get_composer(artist["target"])
-                if not work.composers.filter(pk=composer.pk).exists():
-                    work.composers.add(composer)
-            elif artist["type-id"] == RELATION_LYRICIST:
-                lyricist = self.add_and_get_composer(artist["target"])
-                if not work.lyricists.filter(pk=lyricist.pk).exists():
-                    work.lyricists.add(lyricist)
-
-        return work
+        with self._lock(self._WorkClass, workid):
+            mbwork = musicbrainz.get_work_by_id(workid, includes=WORK_INCLUDES)["work"]
+            import_logger.info("adding work %s", mbwork["title"])
+            work, created = self._WorkClass.objects.get_or_create(
+                mbid=workid,
+                defaults={"title": mbwork["title"]})
+
+            work.title = mbwork["title"]
+            work.save()
+
+            self._clear_work_composers(work)
+            self._add_work_attributes(work, mbwork, created)
+
+            for artist in mbwork.get("artist-relation-list", []):
+                if artist["type-id"] == RELATION_COMPOSER:
+                    composer = self.add_and_get_composer(artist["target"])
+                    if not work.composers.filter(pk=composer.pk).exists():
+                        work.composers.add(composer)
+                elif artist["type-id"] == RELATION_LYRICIST:
+                    lyricist = self.add_and_get_composer(artist["target"])
+                    if not work.lyricists.filter(pk=lyricist.pk).exists():
+                        work.lyricists.add(lyricist)
+
+            return work
+
+    # Bulk import. Instead of requesting and saving each entity in turn,
+    # bulk_import_release requests everything that a release refers to and
+    # then saves each type of object with a few queries.
+    # Importers which set supports_bulk_import implement the hooks below.
+
+    def bulk_import_release(self, releaseid, directories):
+        """ Import a release like import_release, but write the release, its
+        recordings, works, artists and composers and the relations between them
+        with bulk queries in one transaction. Importers which don't set
+        supports_bulk_import don't implement the hooks that this needs,
+        so the release is imported with import_release instead.
+        """
+        if not self.supports_bulk_import:
+            logger.info("Bulk import isn't supported by %s, importing release %s one object at a time"
+                        % (type(self).__name__, releaseid))
+            return self.import_release(releaseid, directories)
+        if releaseid in self.imported_releases:
+            print("Release already updated in this import. Not doing it again")
+            return self._ReleaseClass.objects.get(mbid=releaseid)
+
+        mbrelease = musicbrainz.get_release_by_id(releaseid, includes=RELEASE_INCLUDES)["release"]
+        logger.info("Adding release %s" % mbrelease["id"])
+        graph = self._fetch_release_graph(mbrelease)
+
+        with transaction.atomic():
+            release, wikipedia = self._bulk_write_release(mbrelease, graph)
+            self._update_search_text(release)
+            self._update_release_stats(release)
+        self.imported_artists.update(graph["artists"].keys())
+        self.imported_composers.update(graph["composers"].keys())
+
+        # These make requests to other sites, so they're done outside of the transaction
+        for artist, url in wikipedia:
+            source = self.make_wikipedia_source(url)
+            external_data.import_artist_wikipedia(artist, source)
+        self._add_image_to_release(release, directories)
+        self.imported_releases.append(releaseid)
+        return release
+
+    def _fetch_release_graph(self, mbrelease):
+        """ Get the recordings, works, artists and composers of a release
+        from MusicBrainz. Artists and composers which have already been imported
+        by this importer are not requested again. """
+        tracks = []
+        for mnum, medium in enumerate(mbrelease["medium-list"], 1):
+            for tnum, track in enumerate(medium["track-list"], 1):
+                tracks.append((track["recording"]["id"], mnum, tnum))
+        recordingids = _unique([t[0] for t in tracks])
+        mbrecordings = musicbrainz.get_many("recording", recordingids, RECORDING_INCLUDES)
+        mbrecordings = {recid: mbrecordings[recid]["recording"] for recid in recordingids}
+
+        recording_works = {}
+        for recid, mbrec in mbrecordings.items():
+            recording_works[recid] = [w["target"] for w in mbrec.get("work-relation-list", [])
+                                      if w["type"] == "performance"]
+        workids = _unique([w for works in recording_works.values() for w in works])
+        mbworks = musicbrainz.get_many("work", workids, WORK_INCLUDES)
+        mbworks = {workid: mbworks[workid]["work"] for workid in workids}
+
+        composerids = [a["target"] for mbwork in mbworks.values() for a in mbwork.get("artist-relation-list", [])
+                       if a["type-id"] in [RELATION_COMPOSER, RELATION_LYRICIST]]
+
+        release_artists = _unique([a["artist"]["id"] for a in mbrelease["artist-credit"] if isinstance(a, dict)])
+        release_performances = self._get_artist_performances(mbrelease.get("artist-relation-list", []))
+        recording_performances = {}
+        for recid, mbrec in mbrecordings.items():
+            recording_performances[recid] = self._get_artist_performances(mbrec.get("artist-relation-list", []))
+        artistids = release_artists + [p[0] for p in release_performances] + \
+            [p[0] for perfs in recording_performances.values() for p in perfs]
+
+        return {
+            "tracks": tracks,
+            "recordings": mbrecordings,
+            "recording_works": recording_works,
+            "works": mbworks,
+            "composerids": _unique(composerids),
+            "composers": self._fetch_artists(composerids, self.imported_composers, follow_groups=False),
+            "release_artists": release_artists,
+            "release_performances": release_performances,
+            "recording_performances": recording_performances,
+            "artistids": _unique(artistids),
+            "artists": self._fetch_artists(artistids, self.imported_artists, follow_groups=True),
+        }
+
+    def _fetch_artists(self, artistids, imported, follow_groups):
+        """ {mbid: artist response} for the artists that are not in `imported`.
+            If follow_groups is set, also get the members of groups """
+        mbartists = {}
+        to_fetch = _unique([a for a in artistids if a not in imported])
+        while to_fetch:
+            fetched = musicbrainz.get_many("artist", to_fetch, ARTIST_INCLUDES)
+            for mbid in to_fetch:
+                mbartists[mbid] = fetched[mbid]["artist"]
+            members = []
+            if follow_groups:
+                members = [m for mbid in to_fetch for m in self._get_group_member_ids(mbartists[mbid])]
+            to_fetch = _unique([m for m in members if m not in imported and m not in mbartists])
+        return mbartists
+
+    def _bulk_write_release(self, mbrelease, graph):
+        """ Save everything in a graph from _fetch_release_graph. Returns the
+            release and a list of (artist, wikipedia url) to import """
+        # Other importers may be writing some of the same objects
+        keys = [(self._ReleaseClass, mbrelease["id"])]
+        keys += [(self._ArtistClass, mbid) for mbid in graph["artists"]]
+        keys += [(self._ComposerClass, mbid) for mbid in graph["composers"]]
+        keys += [(self._WorkClass, mbid) for mbid in graph["works"]]
+        keys += [(self._RecordingClass, mbid) for mbid in graph["recordings"]]
+        locks.transaction_locks([self._lock_key(Klass, mbid) for Klass, mbid in keys])
+
+        artists, wikipedia = self._bulk_save_artists(self._ArtistClass, self._ArtistAliasClass, graph["artists"])
+        members = [m for mbartist in graph["artists"].values() for m in self._get_group_member_ids(mbartist)]
+        artists.update(self._get_by_mbid(self._ArtistClass, set(graph["artistids"] + members) - set(artists.keys())))
+        self._bulk_set_group_members(artists, graph["artists"])
+
+        composers, composer_wikipedia = self._bulk_save_artists(
+            self._ComposerClass, self._ComposerAliasClass, graph["composers"], alias_ref="composer")
+        wikipedia.extend(composer_wikipedia)
+        composers.update(self._get_by_mbid(self._ComposerClass, set(graph["composerids"]) - set(composers.keys())))
+
+        works = self._bulk_save_works(graph["works"], composers)
+        recordings = self._bulk_save_recordings(graph["recordings"], graph["recording_works"], works)
+
+        release = self._create_release_object(mbrelease)
+        release_artists = [artists[a] for a in graph["release_artists"]]
+        release.artists.set(release_artists)
+
+        release.recordings.clear()
+        links = []
+        release_recordings = []
+        for trackorder, (recid, mnum, tnum) in enumerate(graph["tracks"], 1):
+            recording = recordings[recid]
+            if recording not in release_recordings:
+                release_recordings.append(recording)
+                link = self._release_recording_link(release, recording, trackorder, mnum, tnum)
+                if link:
+                    links.append(link)
+        _bulk_create_all(links)
+
+        IPClass = self._RecordingClass().get_object_map("performance")
+        IPClass.objects.filter(recording__in=list(recordings.values())).delete()
+        performances = []
+        for recid, perfs in graph["recording_performances"].items():
+            for artistid, perf_type, attrs in perfs:
+                performances.append(self._recording_performance(recordings[recid], artists[artistid], perf_type, attrs))
+        for artistid, perf_type, attrs in graph["release_performances"]:
+            for recording in release_recordings:
+                performances.append(self._recording_performance(recording, artists[artistid], perf_type, attrs))
+        performances = [p for p in performances if p]
+        self._set_release_artist_leads(performances, release_artists)
+        IPClass.objects.bulk_create(performances)
+
+        return release, wikipedia
+
+    def _get_by_mbid(self, Klass, mbids):
+        mbids = list(mbids)
+        if not mbids:
+            return {}
+        return {str(ob.mbid): ob for ob in Klass.objects.filter(mbid__in=mbids)}
+
+    def _bulk_save_artists(self, ArtistKlass, AliasKlass, mbartists, alias_ref="artist"):
+        """ Create or update artists or composers like _create_artist_object.
+            Returns {mbid: artist} and a list of (artist, wikipedia url) """
+        if not mbartists:
+            return {}, []
+        artists = self._get_by_mbid(ArtistKlass, mbartists.keys())
+        existing = list(artists.values())
+        new = []
+        wikipedia = []
+        for mbid, mbartist in mbartists.items():
+            logger.info("  adding artist/composer %s" % (mbid, ))
+            if mbid not in artists:
+                artists[mbid] = ArtistKlass(mbid=mbid)
+                new.append(artists[mbid])
+            self._set_artist_fields(artists[mbid], mbartist)
+            wikipedia_url = self._get_wikipedia_url(mbartist)
+            if wikipedia_url:
+                wikipedia.append((artists[mbid], wikipedia_url))
+        ArtistKlass.objects.bulk_create(new)
+        fieldnames = [f.name for f in ArtistKlass._meta.get_fields()]
+        fields = [f for f in ["name", "artist_type", "gender", "begin", "end"] if f in fieldnames]
+        ArtistKlass.objects.bulk_update(existing, fields)
+
+        if AliasKlass:
+            AliasKlass.objects.filter(**{"%s__in" % alias_ref: list(artists.values())}).delete()
+            aliases = {}
+            for mbid, mbartist in mbartists.items():
+                for alias in mbartist.get("alias-list", []):
+                    key = (mbid, alias["alias"])
+                    if key not in aliases:
+                        aliases[key] = AliasKlass(alias=alias["alias"], **{alias_ref: artists[mbid]})
+                    if alias.get("primary"):
+                        aliases[key].primary = True
+                    if alias.get("locale"):
+                        aliases[key].locale = alias["locale"]
+            AliasKlass.objects.bulk_create(aliases.values())
+        return artists, wikipedia
+
+    def _bulk_set_group_members(self, artists, mbartists):
+        """ Replace the group members of the artists in `mbartists`,
+            like add_and_get_artist """
+        field = self._ArtistClass._meta.get_field("group_members")
+        through = field.remote_field.through
+        source = field.m2m_field_name()
+        target = field.m2m_reverse_field_name()
+        written = [artists[mbid] for mbid in mbartists]
+        # group_members is symmetrical, so clearing it removes relations in both directions
+        through.objects.filter(Q(**{"%s__in" % source: written}) | Q(**{"%s__in" % target: written})).delete()
+        pairs = set()
+        for mbid, mbartist in mbartists.items():
+            for memberid in self._get_group_member_ids(mbartist):
+                group, member = artists[mbid].pk, artists[memberid].pk
+                pairs.add((group, member))
+                pairs.add((member, group))
+        through.objects.bulk_create([through(**{"%s_id" % source: a, "%s_id" % target: b}) for a, b in pairs])
+
+    def _bulk_set_m2m(self, Klass, fieldname, objects, related):
+        """ Replace the many-to-many relation `fieldname` of each object in
+            `objects` ({mbid: object}) with the objects in related[mbid] """
+        field = Klass._meta.get_field(fieldname)
+        through = field.remote_field.through
+        source = field.m2m_field_name()
+        target = field.m2m_reverse_field_name()
+        through.objects.filter(**{"%s__in" % source: list(objects.values())}).delete()
+        pairs = _unique([(objects[mbid].pk, ob.pk) for mbid, obs in related.items() for ob in obs])
+        through.objects.bulk_create([through(**{"%s_id" % source: a, "%s_id" % target: b}) for a, b in pairs])
+
+    def _bulk_save_works(self, mbworks, composers):
+        """ Create or update works and their composers and lyricists like
+            add_and_get_work. Returns {mbid: work} """
+        works = self._get_by_mbid(self._WorkClass, mbworks.keys())
+        existing = list(works.values())
+        new = []
+        work_composers = {}
+        work_lyricists = {}
+        for workid, mbwork in mbworks.items():
+            import_logger.info("adding work %s", mbwork["title"])
+            if workid not in works:
+                works[workid] = self._WorkClass(mbid=workid)
+                new.append(works[workid])
+            work = works[workid]
+            work.title = mbwork["title"]
+            self._set_work_attributes(work, mbwork)
+            for artist in mbwork.get("artist-relation-list", []):
+                if artist["type-id"] == RELATION_COMPOSER:
+                    work_composers.setdefault(workid, []).append(composers[artist["target"]])
+                elif artist["type-id"] == RELATION_LYRICIST:
+                    work_lyricists.setdefault(workid, []).append(composers[artist["target"]])
+        self._WorkClass.objects.bulk_create(new)
+        self._WorkClass.objects.bulk_update(existing, ["title"] + self._work_attribute_fields)
+
+        self._bulk_set_m2m(self._WorkClass, "composers", works, work_composers)
+        self._bulk_set_m2m(self._WorkClass, "lyricists", works, work_lyricists)
+        return works
+
+    def _bulk_save_recordings(self, mbrecordings, recording_works, works):
+        """ Create or update recordings and their works and tags like
+            add_and_get_recording. Returns {mbid: recording} """
+        recordings = self._get_by_mbid(self._RecordingClass, mbrecordings.keys())
+        existing = list(recordings.values())
+        new = []
+        for recid, mbrec in mbrecordings.items():
+            logger.info("  adding recording %s" % (recid,))
+            import_logger.info("importing recording %s", mbrec["title"])
+            if recid not in recordings:
+                recordings[recid] = self._RecordingClass(mbid=recid)
+                new.append(recordings[recid])
+            recordings[recid].length = mbrec.get("length")
+            recordings[recid].title = mbrec["title"]
+        self._RecordingClass.objects.bulk_create(new)
+        self._RecordingClass.objects.bulk_update(existing, ["title", "length"])
+
+        self._clear_recording_links(list(recordings.values()))
+        links = []
+        for recid, mbrec in mbrecordings.items():
+            recworks = [works[w] for w in recording_works[recid]]
+            links.extend(self._recording_work_links(recordings[recid], recworks))
+            links.extend(self._recording_tag_links(recordings[recid], recworks, mbrec.get("tag-list", [])))
+        _bulk_create_all(links)
+        return recordings
+
+    # Hooks for bulk_import_release, which importers that set
+    # supports_bulk_import override. These return unsaved objects, which
+    # are then saved with bulk_create. By default there are no objects
+
+    def _set_work_attributes(self, work, mbwork):
+        """ Set attributes in _work_attribute_fields on an unsaved work """
+        pass
+
+    def _clear_recording_links(self, recordings):
+        """ Delete the relations to works, tags etc. of these recordings """
+        pass
+
+    def _recording_work_links(self, recording, works):
+        """ A list of objects which link a recording to its works """
+        return []
+
+    def _recording_tag_links(self, recording, works, tags):
+        """ A list of objects which link a recording to the raagas etc. in its tags """
+        return []
+
+    def _recording_performance(self, recording, artist, perf_type, attrs):
+        """ An instrument performance object, or None if the performance isn't imported """
+        return None
+
+    def _release_recording_link(self, release, recording, trackorder, mnum, tnum):
+        """ An object which links a release to a recording, or None """
+        return None
+
+    def _set_release_artist_leads(self, performances, release_artists):
+        """ Like _add_release_artists_as_relationship, for unsaved performances """
+        pass
+
+
+def _unique(items):
+    """ The items of a list without duplicates, in the order they first appear """
+    seen = set()
+    ret = []
+    for item in items:
+        if item not in seen:
+            seen.add(item)
+            ret.append(item)
+    return ret
+
+
+def _bulk_create_all(objects):
+    """ Save a list of objects of different models with one bulk_create per model """
+    bymodel = {}
+    for ob in objects:
+        bymodel.setdefault(type(ob), []).append(ob)
+    for klass, obs in bymodel.items():
+        klass.objects.bulk_create(obs)
 
 
 class ImportFailedException(Exception):
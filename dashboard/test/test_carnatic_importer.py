@@ -1,11 +1,15 @@
 # -*- coding: utf-8 -*-
 import uuid
+from unittest import mock
 
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 import data
 from carnatic import models
 from dashboard import carnatic_importer
+from dashboard import release_importer
 
 
 class CarnaticImporterTest(TestCase):
@@ -158,3 +162,125 @@ class CarnaticImporterTest(TestCase):
             models.Composer.objects.get(mbid=self.composer3id)
         self.assertIsNotNone(models.Composer.objects.get(mbid=self.composer1id))
         self.assertIsNotNone(models.Composer.objects.get(mbid=self.composer4id))
+
+
+class BulkImportTest(TestCase):
+    """ bulk_import_release writes the same data as import_release """
+
+    def setUp(self):
+        self.coll = data.models.Collection.objects.create(name="A collection", collectionid=uuid.uuid4())
+        self.raaga = models.Raaga.objects.create(name="Kalyāṇi", common_name="kalyani", uuid=uuid.uuid4())
+        self.taala = models.Taala.objects.create(name="Ādi", common_name="adi", uuid=uuid.uuid4())
+        models.Instrument.objects.create(name="Voice")
+        models.Instrument.objects.create(name="Violin")
+        models.Instrument.objects.create(name="Mridangam", percussion=True)
+
+        self.responses = {}
+        self.releaseid = str(uuid.uuid4())
+        vocalist = self.add_artist("Vocalist", aliases=[{"alias": "Singer", "primary": "primary", "locale": "en"},
+                                                        {"alias": "Singer"}])
+        violinist = self.add_artist("Violinist")
+        mridangist = self.add_artist("Mridangist")
+        group = self.add_artist("Group", artist_type="Group", members=[vocalist, violinist])
+        composers = [self.add_artist("Composer %s" % i) for i in range(3)]
+
+        works = []
+        for i in range(10):
+            workid = str(uuid.uuid4())
+            rels = [{"type-id": release_importer.RELATION_COMPOSER, "target": composers[i % 3]}]
+            if i % 2:
+                rels.append({"type-id": release_importer.RELATION_LYRICIST, "target": composers[0]})
+            attributes = [{"attribute": "Rāga (Carnatic)", "value": "kalyani"}]
+            if i % 2:
+                attributes.append({"attribute": "Tāla (Carnatic)", "value": "adi"})
+            self.responses[workid] = {"work": {"id": workid, "title": "Work %s" % i,
+                                               "artist-relation-list": rels, "attribute-list": attributes}}
+            works.append(workid)
+
+        tracks = []
+        for i in range(30):
+            recordingid = str(uuid.uuid4())
+            self.responses[recordingid] = {"recording": {
+                "id": recordingid, "title": "Recording %s" % i, "length": str(1000 * i),
+                "work-relation-list": [{"type": "performance", "target": works[i % 10]}],
+                "artist-relation-list": [
+                    {"type-id": release_importer.RELATION_RECORDING_VOCAL, "target": vocalist,
+                     "attribute-list": ["lead vocals"]},
+                    {"type-id": release_importer.RELATION_RECORDING_INSTRUMENT, "target": violinist,
+                     "attribute-list": ["violin"]},
+                ]}}
+            tracks.append({"recording": {"id": recordingid}})
+
+        self.responses[self.releaseid] = {"release": {
+            "id": self.releaseid, "title": "Concert", "date": "1980", "status": "Official",
+            "artist-credit-phrase": "Group", "artist-credit": [{"artist": {"id": group}}],
+            "artist-relation-list": [{"type-id": release_importer.RELATION_RELEASE_INSTRUMENT,
+                                      "target": mridangist, "attribute-list": ["mridangam"]}],
+            "medium-list": [{"track-list": tracks[:20]}, {"track-list": tracks[20:]}]}}
+
+        patches = [mock.patch("compmusic.mb.get_%s_by_id" % entity, side_effect=self.get)
+                   for entity in ["release", "artist", "recording", "work"]]
+        patches.append(mock.patch("dashboard.external_data.import_release_image"))
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def add_artist(self, name, artist_type="Person", aliases=None, members=None):
+        artistid = str(uuid.uuid4())
+        rels = [{"type-id": release_importer.MEMBER_OF_GROUP, "direction": "backward", "target": m}
+                for m in members or []]
+        self.responses[artistid] = {"artist": {"id": artistid, "name": name, "type": artist_type,
+                                               "life-span": {"begin": "1950"}, "alias-list": aliases or [],
+                                               "artist-relation-list": rels}}
+        return artistid
+
+    def get(self, mbid, includes=None):
+        return self.responses[mbid]
+
+    def snapshot(self):
+        concert = models.Concert.objects.get(mbid=self.releaseid)
+        return {
+            "concert": (concert.title, concert.year, concert.status, concert.artistcredit,
+                        sorted(str(a.mbid) for a in concert.artists.all())),
+            "tracks": sorted((str(cr.recording.mbid), cr.track, cr.disc, cr.disctrack)
+                             for cr in models.ConcertRecording.objects.filter(concert=concert)),
+            "recordings": sorted((str(r.mbid), r.title, r.length) for r in models.Recording.objects.all()),
+            "recordingworks": sorted((str(rw.recording.mbid), str(rw.work.mbid), rw.sequence)
+                                     for rw in models.RecordingWork.objects.all()),
+            "works": sorted((str(w.mbid), w.title, w.raaga_id, w.taala_id,
+                             sorted(str(c.mbid) for c in w.composers.all()),
+                             sorted(str(c.mbid) for c in w.lyricists.all())) for w in models.Work.objects.all()),
+            "recordingraagas": sorted((str(r.recording.mbid), r.raaga_id) for r in models.RecordingRaaga.objects.all()),
+            "recordingtaalas": sorted((str(r.recording.mbid), r.taala_id) for r in models.RecordingTaala.objects.all()),
+            "performances": sorted((str(ip.recording.mbid), str(ip.artist.mbid), ip.instrument.name, ip.lead,
+                                    ip.attributes) for ip in models.InstrumentPerformance.objects.all()),
+            "artists": sorted((str(a.mbid), a.name, a.artist_type, a.begin,
+                               sorted(str(m.mbid) for m in a.group_members.all())) for a in models.Artist.objects.all()),
+            "artistaliases": sorted((str(a.artist.mbid), a.alias, a.primary, a.locale)
+                                    for a in models.ArtistAlias.objects.all()),
+            "composers": sorted((str(c.mbid), c.name) for c in models.Composer.objects.all()),
+        }
+
+    def test_same_data_as_import_release(self):
+        carnatic_importer.CarnaticReleaseImporter(self.coll).import_release(self.releaseid, [])
+        expected = self.snapshot()
+        self.assertEqual(len(expected["performances"]), 90)
+
+        for Klass in [models.Concert, models.Recording, models.Work, models.Artist, models.Composer]:
+            Klass.objects.all().delete()
+        carnatic_importer.CarnaticReleaseImporter(self.coll).bulk_import_release(self.releaseid, [])
+        self.assertEqual(expected, self.snapshot())
+
+    def test_reimport_query_count(self):
+        carnatic_importer.CarnaticReleaseImporter(self.coll).import_release(self.releaseid, [])
+
+        # Artist stats are updated with the same queries after either kind of import
+        with mock.patch.object(carnatic_importer.CarnaticReleaseImporter, "_update_release_stats"):
+            with CaptureQueriesContext(connection) as row_queries:
+                carnatic_importer.CarnaticReleaseImporter(self.coll).import_release(self.releaseid, [])
+            expected = self.snapshot()
+
+            with CaptureQueriesContext(connection) as bulk_queries:
+                carnatic_importer.CarnaticReleaseImporter(self.coll).bulk_import_release(self.releaseid, [])
+        self.assertEqual(expected, self.snapshot())
+        self.assertLessEqual(len(bulk_queries) * 10, len(row_queries))
@@ -1,10 +1,16 @@
+import os
+import shutil
+import tempfile
 import uuid
 
 from unittest import mock
+from celery.backends.base import DisabledBackend
 from django.test import TestCase
 
+import data.models
 from dashboard import jobs
 from dashboard import models
+from dashboard import musicbrainz
 
 
 class CollectionTest(TestCase):
@@ -42,7 +48,7 @@ class CollectionTest(TestCase):
         meta.side_effect = metadata_side
 
         jobs._check_existing_directories(self.collection)
-        match.assert_called_once_with(self.collection.collectionid, "/a/directory/audio/subdir")
+        match.assert_called_once_with(self.collection.collectionid, "/a/directory/audio/subdir", mock.ANY)
 
     @mock.patch("os.listdir")
     @mock.patch("compmusic.file_metadata")
@@ -76,7 +82,7 @@ class CollectionTest(TestCase):
         cd = models.CollectionDirectory.objects.get(collection=self.collection, path="sub")
 
         # Check that we called create_collectionfile
-        calls = [mock.call(cd, "one.mp3"), mock.call(cd, "two.mp3")]
+        calls = [mock.call(cd, "one.mp3", None), mock.call(cd, "two.mp3", None)]
         self.assertEqual(create_cf.mock_calls, calls)
 
         # Now that it's run once, we can get the CollectionDirectory and try
@@ -85,7 +91,7 @@ class CollectionTest(TestCase):
         create_cf.reset_mock()
 
         jobs._match_directory_to_release(self.collection.collectionid, "/a/directory/audio/sub")
-        calls = [mock.call(cd, "one.mp3"), mock.call(cd, "two.mp3"), mock.call(cd, "three.mp3")]
+        calls = [mock.call(cd, "one.mp3", None), mock.call(cd, "two.mp3", None), mock.call(cd, "three.mp3", None)]
         self.assertEqual(create_cf.mock_calls, calls)
 
     @mock.patch("os.path.getsize")
@@ -125,3 +131,140 @@ class CollectionTest(TestCase):
         files = ["one.mp3", "two.wav", "three.flac", "four.mp3", "five.mp3"]
         out = jobs._get_mp3_files(files)
         self.assertEqual(out, ["one.mp3", "four.mp3", "five.mp3"])
+
+
+class ReadMetadataTest(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.paths = []
+        for name in ["one.mp3", "two.mp3"]:
+            path = os.path.join(self.root, name)
+            with open(path, "wb") as fp:
+                fp.write(b"ID3")
+            self.paths.append(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    @mock.patch("compmusic.file_metadata")
+    def test_unchanged_files_are_not_read(self, meta):
+        meta.side_effect = lambda path: {"meta": {"recordingid": os.path.basename(path)}}
+        first = jobs._read_metadata(self.paths)
+        self.assertEqual(2, meta.call_count)
+        self.assertEqual(2, models.FileMetadata.objects.count())
+
+        second = jobs._read_metadata(self.paths)
+        self.assertEqual(2, meta.call_count)
+        self.assertEqual(first, second)
+        self.assertEqual({"meta": {"recordingid": "one.mp3"}}, second[self.paths[0]])
+
+    @mock.patch("compmusic.file_metadata")
+    def test_changed_file_is_read(self, meta):
+        meta.return_value = {"meta": {"recordingid": "old"}}
+        jobs._read_metadata(self.paths)
+
+        with open(self.paths[1], "ab") as fp:
+            fp.write(b"more tags")
+        meta.reset_mock()
+        meta.return_value = {"meta": {"recordingid": "new"}}
+        ret = jobs._read_metadata(self.paths)
+
+        meta.assert_called_once_with(self.paths[1])
+        self.assertEqual("new", ret[self.paths[1]]["meta"]["recordingid"])
+        self.assertEqual("old", ret[self.paths[0]]["meta"]["recordingid"])
+        self.assertEqual(2, models.FileMetadata.objects.count())
+
+    @mock.patch("dashboard.jobs.ThreadPoolExecutor")
+    @mock.patch("compmusic.file_metadata")
+    def test_concurrent_scan(self, meta, executor):
+        """ Files stored by another scan while we read them are not inserted again """
+        # Read the files in this thread, so that it uses the test's transaction
+        executor.return_value.__enter__.return_value.map = map
+
+        def read_and_store(path):
+            models.FileMetadata.objects.get_or_create(path=path, defaults={"size": 3, "mtime": 0, "metadata": "{}"})
+            return {"meta": {"recordingid": os.path.basename(path)}}
+        meta.side_effect = read_and_store
+
+        ret = jobs._read_metadata(self.paths)
+        self.assertEqual({"meta": {"recordingid": "one.mp3"}}, ret[self.paths[0]])
+        self.assertEqual(2, models.FileMetadata.objects.count())
+
+
+class ShardedImportTest(TestCase):
+    def setUp(self):
+        u = str(uuid.uuid4())
+        self.collection = models.Collection.objects.create(collectionid=u, name="Carnatic collection", root_directory="/a/directory")
+        data.models.Collection.objects.create(collectionid=u, name="Carnatic collection")
+        self.releases = []
+        for i in range(5):
+            release = models.MusicbrainzRelease.objects.create(mbid=uuid.uuid4(), collection=self.collection, title="release %s" % i)
+            models.CollectionDirectory.objects.create(collection=self.collection, musicbrainzrelease=release, path="dir%s" % i)
+            self.releases.append(release.pk)
+
+    @mock.patch("dashboard.jobs.IMPORT_SHARD_SIZE", 2)
+    @mock.patch("dashboard.jobs.import_release")
+    @mock.patch("celery.chord")
+    def test_releases_are_sharded(self, chord, import_release):
+        jobs.force_import_all_releases(self.collection.collectionid)
+
+        import_release.assert_not_called()
+        header = chord.call_args[0][0]
+        shards = [sig.args[1] for sig in header]
+        self.assertEqual([2, 2, 1], [len(s) for s in shards])
+        self.assertEqual(sorted(self.releases), sorted(pk for s in shards for pk in s))
+        callback = chord.return_value.call_args[0][0]
+        self.assertEqual("dashboard.jobs.finish_import_all_releases", callback.task)
+        self.assertEqual("i", self.collection.get_current_state().state)
+
+    def test_result_backend(self):
+        """ Chords can only be started with a result backend """
+        self.assertNotIsInstance(jobs.app.backend, DisabledBackend)
+
+    @mock.patch("dashboard.jobs.IMPORT_SHARD_SIZE", 2)
+    @mock.patch("dashboard.jobs.queue_post_import_tasks")
+    @mock.patch("dashboard.jobs.import_release")
+    def test_sharded_import_finishes(self, import_release, queue_post_import_tasks):
+        always_eager = jobs.app.conf.task_always_eager
+        jobs.app.conf.task_always_eager = True
+        self.addCleanup(setattr, jobs.app.conf, "task_always_eager", always_eager)
+
+        jobs.force_import_all_releases(self.collection.collectionid)
+
+        self.assertEqual(sorted(self.releases), sorted(c[0][0] for c in import_release.call_args_list))
+        self.assertEqual("f", self.collection.get_current_state().state)
+        queue_post_import_tasks.assert_called_once_with("carnatic")
+
+    @mock.patch("dashboard.jobs.IMPORT_SHARD_SIZE", 0)
+    @mock.patch("dashboard.jobs.queue_post_import_tasks")
+    @mock.patch("dashboard.jobs.import_release")
+    @mock.patch("compmusic.mb.get_artist_by_id")
+    def test_reimport_uses_stored_responses(self, get_artist, import_release, queue_post_import_tasks):
+        mbid = "a484bcbc-c0d9-468a-952c-9938d5811f85"
+        get_artist.return_value = {"artist": {"id": mbid}}
+        import_release.side_effect = lambda releasepk, ri: musicbrainz.get_artist_by_id(mbid)
+        musicbrainz.get_artist_by_id(mbid)
+
+        # A whole collection only requests entities whose response has expired
+        jobs.force_import_all_releases(self.collection.collectionid)
+        self.assertEqual(1, get_artist.call_count)
+
+        # An explicit re-import of a release requests them again
+        jobs.import_single_release(self.releases[0])
+        self.assertEqual(2, get_artist.call_count)
+
+    @mock.patch("dashboard.jobs.import_release")
+    def test_import_shard(self, import_release):
+        jobs.import_release_shard(self.collection.collectionid, self.releases[:2])
+        self.assertEqual(self.releases[:2], [c[0][0] for c in import_release.call_args_list])
+
+    @mock.patch("dashboard.jobs.update_artist_graph")
+    @mock.patch("dashboard.jobs.update_autocomplete")
+    @mock.patch("dashboard.jobs.update_filter_payloads")
+    def test_finish(self, update_filters, update_autocomplete, update_artist_graph):
+        self.collection.set_state_importing()
+        jobs.finish_import_all_releases(self.collection.collectionid)
+        self.assertEqual("f", self.collection.get_current_state().state)
+        update_filters.delay.assert_called_once_with("carnatic")
+        update_autocomplete.delay.assert_called_once_with("carnatic")
+        update_artist_graph.delay.assert_called_once_with()
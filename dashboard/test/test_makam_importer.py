@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 import uuid
+from unittest import mock
 
 from django.test import TestCase
 
@@ -34,3 +35,10 @@ class MakamImporterTest(TestCase):
         get_m = self.mi._get_makam("Not a makam")
         self.assertEqual(None, get_m)
 
+    @mock.patch("dashboard.makam_importer.MakamReleaseImporter.import_release")
+    def test_bulk_import_not_supported(self, import_release):
+        """ Importers without the bulk import hooks import one object at a time """
+        self.assertFalse(self.mi.supports_bulk_import)
+        releaseid = str(uuid.uuid4())
+        self.mi.bulk_import_release(releaseid, ["/a/directory"])
+        import_release.assert_called_once_with(releaseid, ["/a/directory"])
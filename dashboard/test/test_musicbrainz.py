@@ -0,0 +1,65 @@
+import datetime
+from unittest import mock
+
+from django.test import TestCase
+
+from dashboard import models
+from dashboard import musicbrainz
+
+
+class MusicbrainzCacheTest(TestCase):
+    def setUp(self):
+        self.mbid = "a484bcbc-c0d9-468a-952c-9938d5811f85"
+        self.response = {"artist": {"id": self.mbid, "name": "Artist"}}
+
+    @mock.patch("compmusic.mb.get_artist_by_id")
+    def test_response_is_cached(self, get_artist):
+        get_artist.return_value = self.response
+        first = musicbrainz.get_artist_by_id(self.mbid, includes=["url-rels", "aliases"])
+        # includes in a different order are the same request
+        second = musicbrainz.get_artist_by_id(self.mbid, includes=["aliases", "url-rels"])
+
+        get_artist.assert_called_once_with(self.mbid, includes=["aliases", "url-rels"])
+        self.assertEqual(first, self.response)
+        self.assertEqual(second, self.response)
+
+        musicbrainz.get_artist_by_id(self.mbid, includes=["aliases"])
+        self.assertEqual(2, get_artist.call_count)
+
+    def age_responses(self):
+        old = datetime.timedelta(seconds=musicbrainz.CACHE_TIMEOUT + 60)
+        for cached in models.MusicbrainzResponse.objects.all():
+            cached.fetched -= old
+            cached.save()
+
+    @mock.patch("compmusic.mb.get_artist_by_id")
+    def test_expired_response(self, get_artist):
+        get_artist.return_value = self.response
+        musicbrainz.get_artist_by_id(self.mbid)
+        self.age_responses()
+
+        newresponse = {"artist": {"id": self.mbid, "name": "New name"}}
+        get_artist.return_value = newresponse
+        self.assertEqual(newresponse, musicbrainz.get_artist_by_id(self.mbid))
+        self.assertEqual(2, get_artist.call_count)
+        self.assertEqual(newresponse, musicbrainz.get_artist_by_id(self.mbid))
+        self.assertEqual(2, get_artist.call_count)
+
+    @mock.patch("compmusic.mb.get_artist_by_id")
+    def test_error_is_not_cached(self, get_artist):
+        get_artist.side_effect = ValueError("no such artist")
+        self.assertRaises(ValueError, musicbrainz.get_artist_by_id, self.mbid)
+        self.assertEqual(0, models.MusicbrainzResponse.objects.count())
+
+    @mock.patch("compmusic.mb.get_artist_by_id")
+    def test_refreshing(self, get_artist):
+        get_artist.return_value = self.response
+        musicbrainz.get_artist_by_id(self.mbid)
+        with musicbrainz.refreshing():
+            # Stored before the refresh started, so it's requested again, but only once
+            musicbrainz.get_artist_by_id(self.mbid)
+            musicbrainz.get_many("artist", [self.mbid])
+        self.assertEqual(2, get_artist.call_count)
+
+        musicbrainz.get_artist_by_id(self.mbid)
+        self.assertEqual(2, get_artist.call_count)
@@ -510,8 +510,10 @@ def carnatic_artists_list(request):
 
 @user_passes_test(is_staff)
 def carnatic_artist_desc(request, artistid):
-    artist = get_object_or_404(carnatic.models.Artist, id=artistid)
-    return _edit_artist_desc(request, artist, entityurl="dashboard-carnatic-artist")
+    artist = get_object_or_404(carnatic.models.Artist.objects.select_related("stats"), id=artistid)
+    performed = [("Raagas", artist.get_performed_raagas()), ("Taalas", artist.get_performed_taalas())]
+    return _edit_artist_desc(request, artist, entityurl="dashboard-carnatic-artist", similar=artist.similar_artists(),
+                             performed=performed)
 
 
 @user_passes_test(is_staff)
@@ -755,8 +757,10 @@ def _edit_artists_list(request, data):
     return render(request, data["template"], params)
 
 
-def _edit_artist_desc(request, artist, entityurl):
-    """ Generic view for editing a data.Artist """
+def _edit_artist_desc(request, artist, entityurl, similar=None, performed=None):
+    """ Generic view for editing a data.Artist. `similar` is a list
+        of (artist, description) of related artists to show, and
+        `performed` a list of (heading, [(raaga/taala etc, count)]) """
 
     resp_msg = ""
     desc = None
@@ -785,7 +789,8 @@ def _edit_artist_desc(request, artist, entityurl):
             resp_msg = "Description successfully edited"
             desc = param_desc
 
-    params = {"artist": artist, "description": desc, "resp_msg": resp_msg, "entityurl": entityurl}
+    params = {"artist": artist, "description": desc, "resp_msg": resp_msg, "entityurl": entityurl,
+              "similar": similar, "performed": performed}
     return render(request, "dashboard/artist_edit.html", params)
 
 
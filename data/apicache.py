@@ -0,0 +1,104 @@
+# Copyright 2013-2018 Music Technology Group - Universitat Pompeu Fabra
+#
+# This file is part of Dunya
+#
+# Dunya is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Affero General Public License as published by the Free Software
+# Foundation (FSF), either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see http://www.gnu.org/licenses/
+
+""" Cached responses for the REST API.
+
+API responses only change when the catalogue does, which is during an
+import or when an editor changes something in the dashboard or the admin.
+Responses of each tradition are saved in redis under a key made from the
+URL, the collections in the Dunya-Collection header and the permission
+tier of the user (see dunya.api.CachedResponseMixin). Each key also has
+the current version of the tradition, so instead of deleting responses
+we bump the version when the tradition changes and the old ones expire.
+
+The cache is only used when the API_CACHE setting is set.
+"""
+
+import hashlib
+import json
+import logging
+import uuid
+
+import redis
+from django.conf import settings
+from rest_framework.utils.encoders import JSONEncoder
+
+logger = logging.getLogger(__name__)
+
+ENABLED = getattr(settings, "API_CACHE", False)
+TIMEOUT = getattr(settings, "API_CACHE_TIMEOUT", 24 * 60 * 60)
+# The traditions whose responses are cached
+APPS = ["carnatic", "hindustani", "makam", "andalusian", "jingju"]
+
+_redis = redis.StrictRedis(host=settings.WORKER_REDIS_HOST)
+
+
+def _version_key(app_label):
+    return "api-version:%s" % app_label
+
+
+def bump(*app_labels):
+    """ Stop using the saved responses of some traditions (all of them if none are given) """
+    if not ENABLED:
+        return
+    try:
+        for app_label in app_labels or APPS:
+            _redis.set(_version_key(app_label), uuid.uuid4().hex)
+    except redis.RedisError:
+        logger.exception("Cannot update the API cache version of %s", app_labels)
+
+
+def key(app_label, url, collection_ids, permission):
+    """ The key of a response, or None if it can't be cached right now """
+    try:
+        version = _redis.get(_version_key(app_label))
+        if version is None:
+            version = uuid.uuid4().hex
+            # Someone else may have made the version first
+            if not _redis.set(_version_key(app_label), version, nx=True):
+                version = _redis.get(_version_key(app_label))
+    except redis.RedisError:
+        return None
+    if isinstance(version, bytes):
+        version = version.decode("utf-8")
+    request = json.dumps([url, sorted(collection_ids), sorted(permission)])
+    return "api:%s:%s:%s" % (app_label, version, hashlib.sha1(request.encode("utf-8")).hexdigest())
+
+
+def load(key):
+    """ The saved (etag, data) of a response, or None """
+    try:
+        content = _redis.get(key)
+    except redis.RedisError:
+        return None
+    if content is None:
+        return None
+    return etag(content), json.loads(content.decode("utf-8"))
+
+
+def save(key, data):
+    """ Save the data of a response, if `key` isn't None. Returns its etag """
+    content = json.dumps(data, cls=JSONEncoder).encode("utf-8")
+    if key is not None:
+        try:
+            _redis.set(key, content, ex=TIMEOUT)
+        except redis.RedisError:
+            logger.exception("Cannot save an API response")
+    return etag(content)
+
+
+def etag(content):
+    return '"%s"' % hashlib.sha1(content).hexdigest()
@@ -0,0 +1,153 @@
+# Copyright 2013-2018 Music Technology Group - Universitat Pompeu Fabra
+#
+# This file is part of Dunya
+#
+# Dunya is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Affero General Public License as published by the Free Software
+# Foundation (FSF), either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see http://www.gnu.org/licenses/
+
+""" Suggestions for the searchcomplete views.
+
+Every name and alias of the artists, releases, raagas, works etc. of a
+tradition is saved as an AutocompleteEntry, in the same unaccented,
+lowercase form as data.search uses. Entries have a btree index for prefix
+matches and a trigram index for matches in the middle of a name, so a
+suggestion is an index scan instead of a scan of each table that is
+searched. The entries of a tradition are built again after an import (see
+dashboard.jobs) or with the updateautocomplete command.
+"""
+
+import collections
+
+from django.apps import apps
+from django.db import transaction
+
+from data import models
+from data.search import normalise
+
+# app: [(category, model, response key, id field, [name lookups])]
+# The first lookup is the name that is shown, the others are aliases.
+# The categories are keys of the filters.json response of the app, so
+# that the frontend can select a suggestion in the filters
+SOURCES = {
+    "carnatic": [
+        ("concerts", "carnatic.Concert", "mbid", "mbid", ["title"]),
+        ("artists", "carnatic.Artist", "mbid", "mbid", ["name", "aliases__alias"]),
+        ("ragas", "carnatic.Raaga", "uuid", "uuid", ["name", "common_name", "aliases__name"]),
+        ("talas", "carnatic.Taala", "uuid", "uuid", ["name", "common_name", "aliases__name"]),
+    ],
+    "hindustani": [
+        ("releases", "hindustani.Release", "mbid", "mbid", ["title"]),
+        ("artists", "hindustani.Artist", "mbid", "mbid", ["name", "aliases__alias"]),
+        ("rags", "hindustani.Raag", "uuid", "uuid", ["name", "common_name", "aliases__name"]),
+        ("tals", "hindustani.Taal", "uuid", "uuid", ["name", "common_name", "aliases__name"]),
+    ],
+    "makam": [
+        ("artists", "makam.Artist", "mbid", "mbid", ["name", "aliases__alias"]),
+        ("makams", "makam.Makam", "uuid", "uuid", ["name", "aliases__name"]),
+        ("forms", "makam.Form", "uuid", "uuid", ["name", "aliases__name"]),
+        ("usuls", "makam.Usul", "uuid", "uuid", ["name", "aliases__name"]),
+        ("composers", "makam.Composer", "mbid", "mbid", ["name", "aliases__alias"]),
+    ],
+    "andalusian": [
+        ("artists", "andalusian.Artist", "mbid", "mbid", ["name", "transliterated_name", "aliases__alias"]),
+        ("nawbas", "andalusian.Nawba", "uuid", "id", ["name", "transliterated_name"]),
+        ("mizans", "andalusian.Mizan", "uuid", "id", ["name", "transliterated_name"]),
+    ],
+}
+
+# How many suggestions of each category are returned
+PER_CATEGORY = 3
+# Matches in the middle of a name are only searched for once the query is
+# this long, because shorter strings don't have a trigram to use the index with
+MIN_CONTAINS_LENGTH = 3
+CREATE_BATCH_SIZE = 1000
+
+
+def _entries(app_label, category, model, id_field, lookups):
+    Model = apps.get_model(model)
+    names = {}
+    texts = collections.defaultdict(list)
+    for pk, identifier, name in Model.objects.values_list("pk", id_field, lookups[0]):
+        if identifier is not None and name:
+            names[pk] = (str(identifier), name)
+            texts[pk].append(name)
+    for lookup in lookups[1:]:
+        for pk, alias in Model.objects.filter(**{"%s__gt" % lookup: ""}).values_list("pk", lookup):
+            if pk in names:
+                texts[pk].append(alias)
+
+    for pk, (identifier, name) in names.items():
+        seen = set()
+        for text in texts[pk]:
+            norm = normalise(text).strip()
+            if not norm or norm in seen:
+                continue
+            seen.add(norm)
+            yield models.AutocompleteEntry(app=app_label, category=category, identifier=identifier,
+                                           name=name, alias=text if text != name else "", text=norm)
+
+
+def update_app(app_label):
+    """ Replace all entries of an app. Returns the number of entries """
+    entries = []
+    for category, model, key, id_field, lookups in SOURCES[app_label]:
+        entries.extend(_entries(app_label, category, model, id_field, lookups))
+    with transaction.atomic():
+        models.AutocompleteEntry.objects.filter(app=app_label).delete()
+        models.AutocompleteEntry.objects.bulk_create(entries, batch_size=CREATE_BATCH_SIZE)
+    return len(entries)
+
+
+def _query(querysets):
+    """ The entries of a union of querysets, in one query """
+    if not querysets:
+        return []
+    return list(querysets[0].union(*querysets[1:], all=True))
+
+
+def suggestions(app_label, term, per_category=PER_CATEGORY):
+    """ Entries matching `term` for the searchcomplete view of an app, as
+        a list of dicts. Names starting with `term` come before names which
+        only contain it. There are at most two queries """
+    text = normalise(term).strip()
+    if not text:
+        return []
+    categories = [s[0] for s in SOURCES[app_label]]
+    keys = {s[0]: s[2] for s in SOURCES[app_label]}
+    entries = models.AutocompleteEntry.objects.filter(app=app_label)
+    # An object can match with its name and with an alias, so
+    # get twice as many entries as needed in case of duplicates
+    fetch = per_category * 2
+
+    found = collections.OrderedDict((c, collections.OrderedDict()) for c in categories)
+
+    def add(results):
+        for entry in sorted(results, key=lambda e: (len(e.text), e.text)):
+            matches = found[entry.category]
+            if len(matches) < per_category and entry.identifier not in matches:
+                matches[entry.identifier] = entry
+
+    add(_query([entries.filter(category=c, text__startswith=text).order_by("text")[:fetch]
+                for c in categories]))
+    if len(text) >= MIN_CONTAINS_LENGTH:
+        remaining = [c for c in categories if len(found[c]) < per_category]
+        add(_query([entries.filter(category=c, text__contains=text).exclude(text__startswith=text)
+                    .order_by("text")[:fetch] for c in remaining]))
+
+    ret = []
+    for category, matches in found.items():
+        for entry in matches.values():
+            suggestion = {"category": category, "name": entry.name, keys[category]: entry.identifier}
+            if entry.alias:
+                suggestion["alias"] = entry.alias
+            ret.append(suggestion)
+    return ret
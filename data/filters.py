@@ -0,0 +1,101 @@
+# Copyright 2013-2018 Music Technology Group - Universitat Pompeu Fabra
+#
+# This file is part of Dunya
+#
+# Dunya is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Affero General Public License as published by the Free Software
+# Foundation (FSF), either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see http://www.gnu.org/licenses/
+
+""" Saved responses for the filters.json views of the browse pages.
+
+A filters response lists every artist, release, raaga etc. of a tradition,
+so building it reads several whole tables. Instead of doing this on each
+request we build it after an import (see dashboard.jobs) or with the
+updatefilters command, and save it gzipped in a FilterPayload. The views
+return the saved content with ETag and Last-Modified headers.
+"""
+
+import calendar
+import gzip
+import hashlib
+import io
+import json
+
+import django.utils.timezone
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from django.utils.module_loading import import_string
+
+from data import models
+
+# name: (function which returns the payload, apps whose data is in the payload)
+PAYLOADS = {
+    "carnatic": ("carnatic.views.filters_payload", ["carnatic"]),
+    "hindustani": ("hindustani.views.filters_payload", ["hindustani"]),
+    "makam": ("makam.views.filters_payload", ["makam"]),
+    "andalusian": ("andalusian.views.filters_payload", ["andalusian"]),
+    "frontend": ("frontend.views.filters_payload", ["carnatic"]),
+}
+
+
+def _gzip(content):
+    buf = io.BytesIO()
+    # A fixed mtime means that the same content always gives the same bytes
+    with gzip.GzipFile(fileobj=buf, mode="wb", mtime=0) as fp:
+        fp.write(content)
+    return buf.getvalue()
+
+
+def update(name):
+    """ Build a payload and save it. The modified date only changes
+        if the content is different. Returns the FilterPayload """
+    builder = import_string(PAYLOADS[name][0])
+    content = json.dumps(builder(), cls=DjangoJSONEncoder).encode("utf-8")
+    etag = '"%s"' % hashlib.sha1(content).hexdigest()
+    payload, created = models.FilterPayload.objects.get_or_create(
+        name=name, defaults={"content": _gzip(content), "etag": etag})
+    if not created and payload.etag != etag:
+        payload.content = _gzip(content)
+        payload.etag = etag
+        payload.modified = django.utils.timezone.now()
+        payload.save()
+    return payload
+
+
+def update_app(app_label):
+    """ Update every payload that contains data from an app """
+    for name, (builder, apps) in PAYLOADS.items():
+        if app_label in apps:
+            update(name)
+
+
+def response(request, name):
+    """ A response with the saved payload `name`, which is built if it doesn't exist yet """
+    try:
+        payload = models.FilterPayload.objects.get(name=name)
+    except models.FilterPayload.DoesNotExist:
+        payload = update(name)
+
+    last_modified = calendar.timegm(payload.modified.utctimetuple())
+    response = get_conditional_response(request, etag=payload.etag, last_modified=last_modified)
+    if response is None:
+        content = bytes(payload.content)
+        if "gzip" in request.META.get("HTTP_ACCEPT_ENCODING", ""):
+            response = HttpResponse(content, content_type="application/json")
+            response["Content-Encoding"] = "gzip"
+        else:
+            response = HttpResponse(gzip.decompress(content), content_type="application/json")
+    response["ETag"] = payload.etag
+    response["Last-Modified"] = http_date(last_modified)
+    patch_vary_headers(response, ["Accept-Encoding"])
+    return response
@@ -0,0 +1,66 @@
+# Copyright 2013-2018 Music Technology Group - Universitat Pompeu Fabra
+#
+# This file is part of Dunya
+#
+# Dunya is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Affero General Public License as published by the Free Software
+# Foundation (FSF), either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see http://www.gnu.org/licenses/
+
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries
+
+from data import autocomplete
+from data import models
+
+
+class Command(BaseCommand):
+    help = "Time searchcomplete suggestions for prefixes of names in the catalogue of a tradition"
+
+    def add_arguments(self, parser):
+        parser.add_argument("tradition", help="One of %s" % ", ".join(sorted(autocomplete.SOURCES)))
+        parser.add_argument("-n", "--names", type=int, default=200,
+                            help="How many names to type, chosen at random from all names (default 200)")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        tradition = options["tradition"]
+        if tradition not in autocomplete.SOURCES:
+            raise CommandError("Unknown tradition %s" % tradition)
+        texts = list(models.AutocompleteEntry.objects.filter(app=tradition).values_list("text", flat=True))
+        if not texts:
+            raise CommandError("No entries for %s, run updateautocomplete first" % tradition)
+        random.seed(options["seed"])
+        names = random.sample(texts, min(options["names"], len(texts)))
+
+        # Each keystroke of typing the name, as the search box does
+        terms = [name[:i] for name in names for i in range(1, len(name) + 1)]
+        autocomplete.suggestions(tradition, terms[0])
+        times = []
+        queries = 0
+        for term in terms:
+            reset_queries()
+            start = time.perf_counter()
+            autocomplete.suggestions(tradition, term)
+            times.append((time.perf_counter() - start) * 1000)
+            queries += len(connection.queries)
+        times.sort()
+
+        def percentile(p):
+            return times[min(len(times) - 1, int(len(times) * p / 100))]
+
+        self.stdout.write("%s entries, %s suggestions for %s names" % (len(texts), len(terms), len(names)))
+        self.stdout.write("median %.2fms, 95%% %.2fms, 99%% %.2fms, max %.2fms" % (
+            percentile(50), percentile(95), percentile(99), times[-1]))
+        if connection.queries_logged:
+            self.stdout.write("%.2f database queries per suggestion" % (queries / len(terms)))
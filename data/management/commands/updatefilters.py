@@ -0,0 +1,35 @@
+# Copyright 2013-2018 Music Technology Group - Universitat Pompeu Fabra
+#
+# This file is part of Dunya
+#
+# Dunya is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Affero General Public License as published by the Free Software
+# Foundation (FSF), either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see http://www.gnu.org/licenses/
+
+from django.core.management.base import BaseCommand, CommandError
+
+from data import filters
+
+
+class Command(BaseCommand):
+    help = "Build the saved responses of the filters.json views (all of them if no names are given)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("names", nargs="*", help="One of %s" % ", ".join(sorted(filters.PAYLOADS)))
+
+    def handle(self, *args, **options):
+        names = options["names"] or sorted(filters.PAYLOADS)
+        for name in names:
+            if name not in filters.PAYLOADS:
+                raise CommandError("Unknown filters name %s" % name)
+        for name in names:
+            payload = filters.update(name)
+            self.stdout.write("%s: %s bytes, modified %s" % (name, len(payload.content), payload.modified))
@@ -0,0 +1,45 @@
+# Copyright 2013-2018 Music Technology Group - Universitat Pompeu Fabra
+#
+# This file is part of Dunya
+#
+# Dunya is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Affero General Public License as published by the Free Software
+# Foundation (FSF), either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see http://www.gnu.org/licenses/
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from data import search
+
+# tradition: the relation from its Recording to its releases
+TRADITIONS = {
+    "carnatic": "concert",
+    "hindustani": "release",
+    "makam": "release",
+    "andalusian": "album",
+}
+
+
+class Command(BaseCommand):
+    help = "Set the search text of all recordings of some traditions (all of them if none are given)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("traditions", nargs="*", help="One of %s" % ", ".join(sorted(TRADITIONS)))
+
+    def handle(self, *args, **options):
+        traditions = options["traditions"] or sorted(TRADITIONS)
+        for tradition in traditions:
+            if tradition not in TRADITIONS:
+                raise CommandError("Unknown tradition %s" % tradition)
+        for tradition in traditions:
+            Recording = apps.get_model(tradition, "Recording")
+            count = search.update_recordings(Recording, TRADITIONS[tradition])
+            self.stdout.write("%s: updated %s recordings" % (tradition, count))
@@ -0,0 +1,34 @@
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data', '0006_filterpayload'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.CreateModel(
+            name='AutocompleteEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('app', models.CharField(max_length=20)),
+                ('category', models.CharField(max_length=20)),
+                ('identifier', models.CharField(max_length=100)),
+                ('name', models.CharField(max_length=255)),
+                ('alias', models.CharField(blank=True, max_length=255)),
+                ('text', models.TextField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='autocompleteentry',
+            index=models.Index(fields=['app', 'category', 'text'], name='data_autocomplete_prefix', opclasses=['varchar_pattern_ops', 'varchar_pattern_ops', 'text_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='autocompleteentry',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['text'], name='data_autocomplete_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
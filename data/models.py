@@ -18,8 +18,10 @@ import math
 import os
 import time
 
+import django.utils.timezone
 import unidecode
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
 from django.contrib.sites.models import Site
 from django.urls import reverse
 from django.db import models
@@ -232,6 +234,43 @@ class Collection(models.Model):
         return u"data/%s[%s] (%s)" % (self.name, self.collectionid, self.permission)
 
 
+class FilterPayload(models.Model):
+    """ The saved response of a filters.json view, see data.filters """
+    name = models.CharField(max_length=50, unique=True)
+    # gzipped json
+    content = models.BinaryField()
+    etag = models.CharField(max_length=50)
+    modified = models.DateTimeField(default=django.utils.timezone.now)
+
+    def __str__(self):
+        return u"Filters for %s (%s)" % (self.name, self.modified)
+
+
+class AutocompleteEntry(models.Model):
+    """ A name or alias which the searchcomplete view of an app
+        suggests, see data.autocomplete """
+    class Meta:
+        indexes = [
+            models.Index(fields=["app", "category", "text"], name="data_autocomplete_prefix",
+                         opclasses=["varchar_pattern_ops", "varchar_pattern_ops", "text_pattern_ops"]),
+            GinIndex(fields=["text"], name="data_autocomplete_trgm", opclasses=["gin_trgm_ops"]),
+        ]
+
+    app = models.CharField(max_length=20)
+    category = models.CharField(max_length=20)
+    # The mbid or uuid of the object
+    identifier = models.CharField(max_length=100)
+    name = models.CharField(max_length=255)
+    # Set if `text` is from an alias of the object instead of its name
+    alias = models.CharField(max_length=255, blank=True)
+    # Unaccented and lowercase, see data.search.normalise. Transliterating
+    # a name can make it longer than the name
+    text = models.TextField()
+
+    def __str__(self):
+        return u"%s %s: %s" % (self.app, self.category, self.text)
+
+
 class Work(BaseModel):
     class Meta:
         abstract = True
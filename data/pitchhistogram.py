@@ -0,0 +1,133 @@
+# Copyright 2013-2018 Music Technology Group - Universitat Pompeu Fabra
+#
+# This file is part of Dunya
+#
+# Dunya is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Affero General Public License as published by the Free Software
+# Foundation (FSF), either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see http://www.gnu.org/licenses/
+
+""" A cache of the pitch histogram of each recording, used to build raaga profiles.
+
+Computing a histogram means reading the full pitch track of a recording,
+so we save each one to disk. The filename includes the versions of the
+pitch and votedtonic modules that it was computed from, so a histogram is
+only computed again when one of these modules has new results.
+"""
+
+import glob
+import os
+import tempfile
+
+import compmusic.extractors.similaritylib.raaga
+import numpy as np
+from django.conf import settings
+
+from docserver import models as docmodels
+from docserver import util
+
+CACHE_DIR = getattr(settings, "PITCH_HISTOGRAM_DIR", "pitchhistograms")
+
+PITCH_LOOKUP = ("pitch", "pitch", None, None)
+TONIC_LOOKUP = ("votedtonic", "tonic", None, None)
+
+
+def compute_histogram(pitch, tonic):
+    """ The tonic-normalised pitch histogram of one recording """
+    raaga = compmusic.extractors.similaritylib.raaga.Raaga("", "")
+    raaga.compute_average_hist_data([pitch], [tonic])
+    return np.asarray(raaga.average_hist)
+
+
+def _cache_path(mbid, pitchfile, tonicfile):
+    name = "%s-%s-%s.npy" % (mbid, pitchfile.module_version_id, tonicfile.module_version_id)
+    return os.path.join(CACHE_DIR, mbid[:2], name)
+
+
+def _read_pitch(pitchfile):
+    if pitchfile.is_array:
+        return util.docserver_read_array(pitchfile, mmap=False)
+    pitch = util.docserver_read_json(pitchfile)
+    if pitch is None:
+        return None
+    return np.array(pitch)
+
+
+def _read_tonic(tonicfile):
+    tonic = util.docserver_read_file(tonicfile)
+    if tonic is None:
+        return None
+    try:
+        return float(tonic)
+    except ValueError:
+        return None
+
+
+def _save(path, histogram):
+    """ Write the histogram to a temporary file and rename it, so that
+        other processes never load a partially written file """
+    dirname = os.path.dirname(path)
+    if not os.path.exists(dirname):
+        try:
+            os.makedirs(dirname)
+        except OSError:
+            # Another process made it
+            pass
+    fd, tmpname = tempfile.mkstemp(dir=dirname, suffix=".npy")
+    with os.fdopen(fd, "wb") as fp:
+        np.save(fp, histogram)
+    os.rename(tmpname, path)
+
+
+def _remove_stale(mbid, path):
+    """ Remove histograms of this recording computed from other module versions """
+    for other in glob.glob(os.path.join(os.path.dirname(path), "%s-*.npy" % mbid)):
+        if other != path:
+            os.unlink(other)
+
+
+def get_histogram(mbid, compute=compute_histogram):
+    """ The pitch histogram of a recording, or None if it has no pitch or tonic.
+        The histogram is only computed if there isn't one in the cache for the
+        current versions of the pitch and tonic files """
+    mbid = str(mbid)
+    files = util.docserver_get_files(mbid, [PITCH_LOOKUP, TONIC_LOOKUP])
+    pitchfile = files[PITCH_LOOKUP]
+    tonicfile = files[TONIC_LOOKUP]
+    if not isinstance(pitchfile, docmodels.DerivedFile) or not isinstance(tonicfile, docmodels.DerivedFile):
+        return None
+
+    path = _cache_path(mbid, pitchfile, tonicfile)
+    try:
+        return np.load(path)
+    except IOError:
+        pass
+
+    pitch = _read_pitch(pitchfile)
+    tonic = _read_tonic(tonicfile)
+    if pitch is None or tonic is None:
+        return None
+    histogram = compute(pitch, tonic)
+    _save(path, histogram)
+    _remove_stale(mbid, path)
+    return histogram
+
+
+def average_histogram(recordings, compute=compute_histogram):
+    """ The mean of the pitch histograms of some recordings, or
+        None if none of them have a histogram """
+    histograms = []
+    for r in recordings:
+        histogram = get_histogram(r.mbid, compute)
+        if histogram is not None:
+            histograms.append(histogram)
+    if not histograms:
+        return None
+    return np.mean(histograms, axis=0)
@@ -0,0 +1,87 @@
+# Copyright 2013-2018 Music Technology Group - Universitat Pompeu Fabra
+#
+# This file is part of Dunya
+#
+# Dunya is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Affero General Public License as published by the Free Software
+# Foundation (FSF), either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see http://www.gnu.org/licenses/
+
+""" Text search over recordings for the recordings_search views.
+
+Each tradition's Recording has a `search_text` field with the unaccented,
+lowercase titles of the recording, its works and its releases. The field
+has a trigram index, so a substring search on it doesn't have to join
+and scan the work and release tables. It is filled in by the release
+importers, or for a whole tradition by the updatesearchindex command.
+
+Search results are paginated by recording id: the response of a page
+contains the id to start the next page after, so a page is one index
+range scan however far into the results it is.
+"""
+
+import collections
+
+import unidecode
+
+# How many recordings are returned for each page of search results
+PAGE_SIZE = 25
+# How many recordings to update with one query
+UPDATE_BATCH_SIZE = 1000
+
+
+def normalise(text):
+    """ The form of some text which is stored and searched for """
+    return unidecode.unidecode(text or "").lower()
+
+
+def filter_text(recordings, query):
+    """ Recordings whose title, work titles or release titles contain `query` """
+    return recordings.filter(search_text__contains=normalise(query))
+
+
+def update_recordings(Recording, release_field, recordings=None):
+    """ Set the search text of some recordings of a tradition, or all of them.
+    Arguments:
+      Recording: the Recording model of a tradition
+      release_field: the name of the relation from a Recording to its releases
+      recordings: a queryset of recordings, or None for all recordings
+    """
+    if recordings is None:
+        recordings = Recording.objects.all()
+    texts = collections.OrderedDict()
+    for pk, title in recordings.order_by("pk").values_list("pk", "title"):
+        texts[pk] = [title]
+    for lookup in ["works__title", "%s__title" % release_field]:
+        for pk, title in recordings.filter(**{"%s__isnull" % lookup: False}).values_list("pk", lookup).distinct():
+            texts[pk].append(title)
+    # Titles are separated by a newline so that a search can't match across two of them
+    objects = [Recording(pk=pk, search_text=normalise("\n".join(titles))) for pk, titles in texts.items()]
+    Recording.objects.bulk_update(objects, ["search_text"], batch_size=UPDATE_BATCH_SIZE)
+    return len(objects)
+
+
+def keyset_page(recordings, after=None, size=PAGE_SIZE):
+    """ The first `size` recordings with an id greater than `after`.
+        Returns (recordings, next) where `next` is the `after` value for the
+        next page, or None if this is the last page """
+    recordings = recordings.order_by("pk")
+    try:
+        after = int(after)
+    except (TypeError, ValueError):
+        after = None
+    if after is not None:
+        recordings = recordings.filter(pk__gt=after)
+    page = list(recordings[:size + 1])
+    next_after = None
+    if len(page) > size:
+        page = page[:size]
+        next_after = page[-1].pk
+    return page, next_after
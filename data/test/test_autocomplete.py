@@ -0,0 +1,85 @@
+import json
+import uuid
+
+from django.test import TestCase, RequestFactory
+from django.utils.module_loading import import_string
+
+import carnatic.views
+import data.models
+from carnatic import models
+from data import autocomplete
+from data.search import normalise
+
+
+class AutocompleteTest(TestCase):
+    def setUp(self):
+        coll = data.models.Collection.objects.create(name="collection", collectionid=uuid.uuid4())
+        self.concert = models.Concert.objects.create(title="Live in Chennai", mbid=uuid.uuid4(), collection=coll)
+        self.artist = models.Artist.objects.create(name="M. S. Subbulakshmi", mbid=uuid.uuid4())
+        models.ArtistAlias.objects.create(artist=self.artist, alias="MS Amma")
+        self.raaga = models.Raaga.objects.create(name="Śankarābharaṇaṃ", common_name="sankarabharanam", uuid=uuid.uuid4())
+        models.RaagaAlias.objects.create(raaga=self.raaga, name="Dheerasankarabharanam")
+        self.taala = models.Taala.objects.create(name="Misra Chapu", common_name="misra chapu", uuid=uuid.uuid4())
+        models.Artist.objects.create(name="No mbid")
+        autocomplete.update_app("carnatic")
+
+    def test_update(self):
+        entries = data.models.AutocompleteEntry.objects.filter(app="carnatic")
+        # The raaga's common name is the same as its name without accents
+        self.assertEqual(6, entries.count())
+        self.assertEqual(["dheerasankarabharanam", "sankarabharanam"],
+                         sorted(entries.filter(category="ragas").values_list("text", flat=True)))
+        # Updating replaces the entries
+        autocomplete.update_app("carnatic")
+        self.assertEqual(6, entries.count())
+
+    def test_long_transliteration(self):
+        """ Transliterating a name can make it longer than the name """
+        name = "\u4e2d" * 200
+        models.Artist.objects.create(name=name, mbid=uuid.uuid4())
+        autocomplete.update_app("carnatic")
+        entry = data.models.AutocompleteEntry.objects.get(app="carnatic", name=name)
+        self.assertEqual(normalise(name).strip(), entry.text)
+        self.assertGreater(len(entry.text), 255)
+
+    def test_prefix(self):
+        self.assertEqual([{"category": "artists", "name": "M. S. Subbulakshmi", "mbid": str(self.artist.mbid)}],
+                         autocomplete.suggestions("carnatic", "m. s"))
+        self.assertEqual([{"category": "ragas", "name": "Śankarābharaṇaṃ", "uuid": str(self.raaga.uuid)}],
+                         autocomplete.suggestions("carnatic", "śankara"))
+
+    def test_alias(self):
+        self.assertEqual([{"category": "artists", "name": "M. S. Subbulakshmi", "mbid": str(self.artist.mbid),
+                           "alias": "MS Amma"}],
+                         autocomplete.suggestions("carnatic", "ms am"))
+
+    def test_contains(self):
+        # Prefix matches are first
+        suggestions = autocomplete.suggestions("carnatic", "sankara")
+        self.assertEqual(1, len(suggestions))
+        self.assertNotIn("alias", suggestions[0])
+        # Short terms only match the start of a name
+        self.assertEqual([], autocomplete.suggestions("carnatic", "ch"))
+        self.assertEqual([{"category": "concerts", "name": "Live in Chennai", "mbid": str(self.concert.mbid)}],
+                         autocomplete.suggestions("carnatic", "chen"))
+        self.assertEqual([{"category": "talas", "name": "Misra Chapu", "uuid": str(self.taala.uuid)}],
+                         autocomplete.suggestions("carnatic", "chapu"))
+
+    def test_per_category(self):
+        for i in range(5):
+            models.Artist.objects.create(name="Misra %s" % i, mbid=uuid.uuid4())
+        autocomplete.update_app("carnatic")
+        suggestions = autocomplete.suggestions("carnatic", "misra")
+        self.assertEqual(["artists"] * 3 + ["talas"], [s["category"] for s in suggestions])
+
+    def test_view(self):
+        request = RequestFactory().get("/carnatic/searchcomplete", {"input": "Live"})
+        response = json.loads(carnatic.views.searchcomplete(request).content.decode("utf-8"))
+        self.assertEqual([{"category": "concerts", "name": "Live in Chennai", "mbid": str(self.concert.mbid)}], response)
+
+    def test_categories_are_filters(self):
+        """ The frontend can only select suggestions in the categories of its filters """
+        for app_label, sources in autocomplete.SOURCES.items():
+            payload = import_string("%s.views.filters_payload" % app_label)()
+            for category, model, key, id_field, lookups in sources:
+                self.assertIn(category, payload)
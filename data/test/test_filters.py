@@ -0,0 +1,64 @@
+import gzip
+import json
+import uuid
+from unittest import mock
+
+from django.test import TestCase, RequestFactory
+
+import carnatic.models
+import carnatic.views
+from data import filters
+from data import models
+
+PAYLOAD = {"artists": [{"name": "Artist"}]}
+
+
+def payload():
+    return PAYLOAD
+
+
+@mock.patch.dict(filters.PAYLOADS, {"test": ("data.test.test_filters.payload", ["test"])})
+class FiltersTest(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_built_on_first_request(self):
+        response = filters.response(self.factory.get("/filters.json"), "test")
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(PAYLOAD, json.loads(response.content.decode("utf-8")))
+        self.assertEqual(models.FilterPayload.objects.get(name="test").etag, response["ETag"])
+        self.assertIn("Last-Modified", response)
+
+    def test_gzip(self):
+        response = filters.response(self.factory.get("/filters.json", HTTP_ACCEPT_ENCODING="gzip, deflate"), "test")
+        self.assertEqual("gzip", response["Content-Encoding"])
+        self.assertEqual(PAYLOAD, json.loads(gzip.decompress(response.content).decode("utf-8")))
+
+    def test_not_modified(self):
+        etag = filters.update("test").etag
+        response = filters.response(self.factory.get("/filters.json", HTTP_IF_NONE_MATCH=etag), "test")
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(etag, response["ETag"])
+
+    def test_update(self):
+        first = filters.update("test")
+        second = filters.update("test")
+        self.assertEqual(first.modified, second.modified)
+        with mock.patch.dict(PAYLOAD, {"artists": []}):
+            third = filters.update("test")
+        self.assertNotEqual(first.etag, third.etag)
+        self.assertEqual(1, models.FilterPayload.objects.count())
+
+    def test_update_app(self):
+        filters.update_app("other")
+        self.assertEqual(0, models.FilterPayload.objects.count())
+        filters.update_app("test")
+        self.assertEqual(1, models.FilterPayload.objects.count())
+
+
+class CarnaticFiltersTest(TestCase):
+    def test_filters(self):
+        raaga = carnatic.models.Raaga.objects.create(name="Kalyāṇi", common_name="kalyani", uuid=uuid.uuid4())
+        response = carnatic.views.filters(RequestFactory().get("/carnatic/filters.json"))
+        content = json.loads(response.content.decode("utf-8"))
+        self.assertEqual([{"name": "Kalyāṇi", "uuid": str(raaga.uuid), "aliases": []}], content["ragas"])
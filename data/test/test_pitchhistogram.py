@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+import numpy as np
+from django.test import TestCase
+
+import carnatic.models
+from data import pitchhistogram
+from docserver import jobs
+from docserver import models
+
+
+class PitchHistogramTest(TestCase):
+    fixtures = ['docserver_sourcefiletype']
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.cachedir = os.path.join(self.root, "histograms")
+        coll = models.Collection.objects.create(collectionid="7a99e6f3-7d5e-4577-a07d-43605d5b4220",
+                                                name="Test collection", slug="test-collection", description="",
+                                                root_directory=self.root)
+        self.mbid = "f522f7c6-8299-44e9-889f-063d37526801"
+        self.doc = models.Document.objects.create(external_identifier=self.mbid)
+        self.doc.collections.add(coll)
+        sft = models.SourceFileType.objects.get(slug="mp3")
+        self.pitchmodule = models.Module.objects.create(slug="pitch", source_type=sft)
+        tonicmodule = models.Module.objects.create(slug="votedtonic", source_type=sft)
+        self.pitchversion = self.add_version(self.pitchmodule, "0.1", "pitch", "json", [[0.0, 146.8], [0.1, 220.0]])
+        self.add_version(tonicmodule, "0.1", "tonic", "txt", "146.8")
+        self.compute = mock.Mock(return_value=np.array([[1.0, 0.0], [3.0, 1.0]]))
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def add_version(self, module, version, outputname, extension, contents):
+        modver = models.ModuleVersion.objects.create(module=module, version=version)
+        df = models.DerivedFile.objects.create(document=self.doc, module_version=modver, outputname=outputname,
+                                               extension=extension, mimetype="text/plain", num_parts=1)
+        jobs._save_file(df, 1, extension, contents)
+        return modver
+
+    def get_histogram(self):
+        with mock.patch("data.pitchhistogram.CACHE_DIR", self.cachedir):
+            return pitchhistogram.get_histogram(self.mbid, self.compute)
+
+    def test_histogram_is_cached(self):
+        first = self.get_histogram()
+        second = self.get_histogram()
+        self.assertEqual(self.compute.call_count, 1)
+        pitch, tonic = self.compute.call_args[0]
+        self.assertEqual(pitch.tolist(), [[0.0, 146.8], [0.1, 220.0]])
+        self.assertEqual(tonic, 146.8)
+        np.testing.assert_array_equal(first, second)
+
+    def test_new_module_version_recomputes(self):
+        self.get_histogram()
+        self.add_version(self.pitchmodule, "0.2", "pitch", "json", [[0.0, 150.0]])
+        self.get_histogram()
+        self.assertEqual(self.compute.call_count, 2)
+        cached = os.listdir(os.path.join(self.cachedir, self.mbid[:2]))
+        self.assertEqual(len(cached), 1)
+
+    def test_no_tonic(self):
+        models.DerivedFile.objects.filter(outputname="tonic").delete()
+        self.assertIsNone(self.get_histogram())
+        self.compute.assert_not_called()
+
+    def test_average_histogram(self):
+        recording = carnatic.models.Recording(mbid=self.mbid, title="recording")
+        with mock.patch("data.pitchhistogram.CACHE_DIR", self.cachedir):
+            average = pitchhistogram.average_histogram([recording, recording], self.compute)
+        self.assertEqual(average.tolist(), [[1.0, 0.0], [3.0, 1.0]])
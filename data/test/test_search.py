@@ -0,0 +1,49 @@
+import json
+import uuid
+
+from django.test import TestCase, RequestFactory
+
+import carnatic.views
+import data.models
+from carnatic import models
+from data import search
+
+
+class SearchTest(TestCase):
+    def setUp(self):
+        coll = data.models.Collection.objects.create(name="collection", collectionid=uuid.uuid4())
+        self.concert = models.Concert.objects.create(title="Live in Chennai", mbid=uuid.uuid4(), collection=coll)
+        self.work = models.Work.objects.create(title="Nagumomu", mbid=uuid.uuid4())
+        self.recordings = []
+        for i in range(5):
+            recording = models.Recording.objects.create(title="Rāgam tānam %s" % i, mbid=uuid.uuid4())
+            models.ConcertRecording.objects.create(concert=self.concert, recording=recording, track=i, disc=1, disctrack=i)
+            self.recordings.append(recording)
+        models.RecordingWork.objects.create(recording=self.recordings[0], work=self.work, sequence=1)
+        self.other = models.Recording.objects.create(title="Other", mbid=uuid.uuid4())
+        search.update_recordings(models.Recording, "concert")
+
+    def test_search_text(self):
+        self.recordings[0].refresh_from_db()
+        self.assertEqual("ragam tanam 0\nnagumomu\nlive in chennai", self.recordings[0].search_text)
+
+    def test_filter_text(self):
+        recordings = models.Recording.objects.all()
+        self.assertEqual([self.recordings[0]], list(search.filter_text(recordings, "NAGUMOMU")))
+        self.assertEqual(5, search.filter_text(recordings, "tānam").count())
+        self.assertEqual(5, search.filter_text(recordings, "chennai").count())
+        self.assertEqual(0, search.filter_text(recordings, "nagumomu live").count())
+
+    def test_keyset_page(self):
+        recordings = models.Recording.objects.all()
+        first, after = search.keyset_page(recordings, None, size=4)
+        self.assertEqual(self.recordings[:4], first)
+        second, after = search.keyset_page(recordings, after, size=4)
+        self.assertEqual([self.recordings[4], self.other], second)
+        self.assertIsNone(after)
+
+    def test_view(self):
+        request = RequestFactory().get("/carnatic/search", {"recording": "ragam"})
+        response = json.loads(carnatic.views.recordings_search(request).content.decode("utf-8"))
+        self.assertEqual(5, len(response["results"]))
+        self.assertIsNone(response["moreResults"])
@@ -0,0 +1,136 @@
+# Copyright 2013-2016 Music Technology Group - Universitat Pompeu Fabra
+#
+# This file is part of Dunya
+#
+# Dunya is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Affero General Public License as published by the Free Software
+# Foundation (FSF), either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see http://www.gnu.org/licenses/
+
+""" A cache for the contents of small derived files.
+
+Pages read things like the tonic or the akshara period from the docserver
+on every view. We keep the contents of these files in a size-bounded LRU
+cache in each process, and optionally in a django cache shared between
+processes (set DOCSERVER_SHARED_CACHE to the name of a cache in CACHES).
+
+Keys include the date that the derived file was computed, which changes
+every time an extractor saves new results, so a process never serves
+old contents once it sees the new DerivedFile row. Entries are also removed
+explicitly when results are saved or a module version is deleted.
+"""
+
+import collections
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+
+# Don't cache files bigger than this (bytes)
+MAX_ITEM_SIZE = getattr(settings, "DOCSERVER_CACHE_MAX_ITEM_SIZE", 64 * 1024)
+# Total size of the process-local cache (bytes)
+MAX_SIZE = getattr(settings, "DOCSERVER_CACHE_SIZE", 16 * 1024 * 1024)
+# The name of a django cache to share contents between processes, or None
+SHARED_CACHE = getattr(settings, "DOCSERVER_SHARED_CACHE", None)
+# How long items live in the shared cache (seconds)
+SHARED_CACHE_TIMEOUT = getattr(settings, "DOCSERVER_SHARED_CACHE_TIMEOUT", 24 * 60 * 60)
+
+
+class LRUCache(object):
+    """ A dictionary of bytes values which removes the least recently
+        used items when the total size of the values goes over `maxsize` """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.size = 0
+        self._items = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._items[key] = value
+            self.size += len(value)
+            while self.size > self.maxsize and self._items:
+                _, removed = self._items.popitem(last=False)
+                self.size -= len(removed)
+
+    def delete(self, key):
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._items)
+
+
+local_cache = LRUCache(MAX_SIZE)
+
+
+def _shared_cache():
+    if SHARED_CACHE:
+        return caches[SHARED_CACHE]
+    return None
+
+
+def _key(derivedfile, partnumber):
+    return "docserver-derived-%s-%s-%s-%s-%s" % (
+        derivedfile.document_id, derivedfile.module_version_id, derivedfile.outputname,
+        partnumber, derivedfile.date.isoformat())
+
+
+def get_contents(derivedfile, partnumber):
+    """ Return the contents of part `partnumber` of a DerivedFile, reading it
+        from disk if it's not cached. Raises IOError if the file can't be read """
+    key = _key(derivedfile, partnumber)
+    data = local_cache.get(key)
+    if data is not None:
+        return data
+
+    shared = _shared_cache()
+    if shared is not None:
+        data = shared.get(key)
+        if data is not None:
+            local_cache.set(key, data)
+            return data
+
+    with open(derivedfile.full_path_for_part(partnumber), "rb") as fp:
+        data = fp.read()
+    if len(data) <= MAX_ITEM_SIZE:
+        local_cache.set(key, data)
+        if shared is not None:
+            shared.set(key, data, SHARED_CACHE_TIMEOUT)
+    return data
+
+
+def invalidate(derivedfile):
+    """ Remove all parts of a DerivedFile from the cache. Call this before
+        the files on disk are changed or removed """
+    keys = [_key(derivedfile, pn) for pn in range(1, derivedfile.num_parts + 1)]
+    for key in keys:
+        local_cache.delete(key)
+    shared = _shared_cache()
+    if shared is not None:
+        shared.delete_many(keys)
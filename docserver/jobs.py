@@ -16,12 +16,18 @@
 
 from __future__ import absolute_import
 
+import concurrent.futures
+import datetime
 import importlib
 import json
 import logging
 import os
+import tempfile
 import time
 
+import celery
+import celery.signals
+import django.db
 import django.utils.timezone
 import numpy as np
 import six
@@ -29,47 +35,112 @@ from django.conf import settings
 from django.db import transaction
 
 from dashboard.log import logger
+from docserver import cache
 from docserver import log
 from docserver import models
 from dunya.celery import app
 
 
 class DatabaseLogHandler(logging.Handler):
+    """ Save extractor log messages as DocumentLogMessages.
+
+    Messages are kept in a buffer and written with one query when
+    `capacity` messages are waiting, or when a task finishes. The
+    Document/ModuleVersion/SourceFile lookups for a message are remembered
+    until the end of the task.
+    """
+
+    def __init__(self, capacity=100):
+        super(DatabaseLogHandler, self).__init__()
+        self.capacity = capacity
+        self.buffer = []
+        self._documents = {}
+        self._moduleversions = {}
+        self._sourcefiles = {}
+
+    def _get_document(self, documentid):
+        if documentid not in self._documents:
+            self._documents[documentid] = models.Document.objects.filter(pk=documentid).exists()
+        return self._documents[documentid]
+
+    def _get_moduleversion(self, modulename, moduleversion):
+        key = (modulename, moduleversion)
+        if key not in self._moduleversions:
+            modv = models.ModuleVersion.objects.filter(
+                module__slug=modulename, version=moduleversion).values_list("pk", flat=True).first()
+            self._moduleversions[key] = modv
+        return self._moduleversions[key]
+
+    def _get_sourcefile(self, sourcefileid):
+        if sourcefileid not in self._sourcefiles:
+            self._sourcefiles[sourcefileid] = models.SourceFile.objects.filter(pk=sourcefileid).exists()
+        return self._sourcefiles[sourcefileid]
+
     def handle(self, record):
         documentid = getattr(record, "documentid", None)
         sourcefileid = getattr(record, "sourcefileid", None)
         modulename = getattr(record, "modulename", None)
         moduleversion = getattr(record, "moduleversion", None)
 
-        modv = None
-        if modulename and moduleversion:
-            try:
-                mod = models.Module.objects.get(slug=modulename)
-                modv = mod.versions.get(version=moduleversion)
-            except (models.Module.DoesNotExist, models.ModuleVersion.DoesNotExist):
-                pass
-
-        sourcef = None
-        if sourcefileid:
-            try:
-                sourcef = models.SourceFile.objects.get(pk=int(sourcefileid))
-            except models.SourceFile.DoesNotExist:
-                pass
-        doc = None
-        if documentid:
-            try:
-                doc = models.Document.objects.get(pk=int(documentid))
-                models.DocumentLogMessage.objects.create(document=doc, moduleversion=modv, sourcefile=sourcef,
-                                                         level=record.levelname, message=record.getMessage())
-            except models.Document.DoesNotExist:
-                logger.error("no document, can't create a log file")
-        else:
+        if not documentid:
             logger.error("no document, can't create a log file")
+            return
 
-
+        self.acquire()
+        try:
+            documentid = int(documentid)
+            if not self._get_document(documentid):
+                logger.error("no document, can't create a log file")
+                return
+            modv = None
+            if modulename and moduleversion:
+                modv = self._get_moduleversion(modulename, moduleversion)
+            sourcef = None
+            if sourcefileid and self._get_sourcefile(int(sourcefileid)):
+                sourcef = int(sourcefileid)
+
+            created = datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc)
+            self.buffer.append(models.DocumentLogMessage(
+                document_id=documentid, moduleversion_id=modv, sourcefile_id=sourcef,
+                level=record.levelname, message=record.getMessage(), datetime=created))
+            if len(self.buffer) >= self.capacity:
+                self.flush()
+        finally:
+            self.release()
+
+    def flush(self):
+        self.acquire()
+        try:
+            if self.buffer:
+                models.DocumentLogMessage.objects.bulk_create(self.buffer)
+        except django.db.Error:
+            logger.exception("Cannot save extractor log messages")
+        finally:
+            self.buffer = []
+            self.release()
+
+    def reset(self):
+        """ Write all waiting messages and forget remembered lookups.
+        Called at the end of every task """
+        self.acquire()
+        try:
+            self.flush()
+        finally:
+            self._documents = {}
+            self._moduleversions = {}
+            self._sourcefiles = {}
+            self.release()
+
+
+database_log_handler = DatabaseLogHandler()
 extractor_logger = logging.getLogger("extractor")
 extractor_logger.setLevel(logging.DEBUG)
-extractor_logger.addHandler(DatabaseLogHandler())
+extractor_logger.addHandler(database_log_handler)
+
+
+@celery.signals.task_postrun.connect
+def flush_extractor_log(**kwargs):
+    database_log_handler.reset()
 
 
 def _get_module_instance_by_path(modulepath):
@@ -88,6 +159,30 @@ def _get_module_instance_by_path(modulepath):
     #    return None
 
 
+# Extractor instances that have been created in this worker process,
+# {(modulepath, version): instance}
+_module_instances = {}
+
+
+def _get_cached_module_instance(modulepath, version):
+    """ Get an instance of an extractor, creating it only the first time
+    that this version is used in this process. Extractors with slow setup
+    (loading models, etc) then only do it once per worker """
+    key = (modulepath, version)
+    instance = _module_instances.get(key)
+    if instance is None:
+        instance = _get_module_instance_by_path(modulepath)
+        _module_instances[key] = instance
+    return instance
+
+
+def _invalidate_module_instances(modulepath):
+    """ Forget all cached instances of an extractor """
+    for key in list(_module_instances.keys()):
+        if key[0] == modulepath:
+            del _module_instances[key]
+
+
 def create_module(modulepath, collections):
     instance = _get_module_instance_by_path(modulepath)
     try:
@@ -131,6 +226,7 @@ def get_latest_module_version(themod_id=None):
             versions = m.versions.filter(version=version)
             if not len(versions):
                 models.ModuleVersion.objects.create(module=m, version=v)
+                _invalidate_module_instances(m.module)
         else:
             m.disabled = True
             m.save()
@@ -142,6 +238,7 @@ def delete_moduleversion(vid):
     logger.info("deleting moduleversion %s" % version)
     files = version.derivedfile_set.all()
     for f in files:
+        cache.invalidate(f)
         for pn in range(1, f.num_parts + 1):
             path = f.full_path_for_part(pn)
             try:
@@ -155,6 +252,7 @@ def delete_moduleversion(vid):
                 pass  # if the file doesn't exist, not really an error
         f.delete()
     module = version.module
+    log.delete_module_progress(version.pk)
     version.delete()
     logger.info("done")
 
@@ -201,29 +299,107 @@ class NumPyArangeEncoder(json.JSONEncoder):
         return json.JSONEncoder.default(self, obj)
 
 
+def _write_temporary_file(fullname, extension, data):
+    """ Write `data` to a temporary file in the same directory as `fullname`
+    and make sure that it is on disk. Returns the name of the temporary file,
+    which can be renamed to `fullname` atomically. """
+    fdir, fname = os.path.split(fullname)
+    fd, tmpname = tempfile.mkstemp(prefix=".%s." % fname, suffix=".tmp", dir=fdir)
+    try:
+        # json module requires a string file-pointer. Other data could be either a string
+        # or bytes. Convert all strings to bytes and write
+        if extension == "json":
+            with os.fdopen(fd, "w") as fp:
+                json.dump(data, fp, cls=NumPyArangeEncoder)
+                fp.flush()
+                os.fsync(fp.fileno())
+        elif extension in models.ARRAY_EXTENSIONS:
+            # A single array (npy) or a dictionary of named arrays (npz)
+            with os.fdopen(fd, "wb") as fp:
+                if extension == "npy":
+                    np.save(fp, np.asarray(data))
+                else:
+                    np.savez(fp, **data)
+                fp.flush()
+                os.fsync(fp.fileno())
+        else:
+            if isinstance(data, six.string_types):
+                data = data.encode("utf-8")
+            with os.fdopen(fd, "wb") as fp:
+                fp.write(data)
+                fp.flush()
+                os.fsync(fp.fileno())
+        # The default mode of mkstemp is only readable by us
+        os.chmod(tmpname, 0o644)
+    except Exception:
+        os.unlink(tmpname)
+        raise
+    return tmpname
+
+
+def _write_parts(derivedfile, extension, contents):
+    """ Write each item of `contents` as a part of `derivedfile` to a temporary file.
+    Returns a list of (temporaryname, fullname) pairs to be renamed with `_rename_parts`.
+    If there are many parts they are written in parallel. If any part fails, no
+    temporary files are left behind. """
+    fdir = derivedfile.directory()
+    try:
+        os.makedirs(fdir)
+    except OSError:
+        if not os.path.isdir(fdir):
+            logger.warn("Error making directory %s" % fdir)
+
+    fullnames = [os.path.join(fdir, derivedfile.filename_for_part(i)) for i in range(1, len(contents) + 1)]
+    parallel = getattr(settings, "DOCSERVER_PARALLEL_WRITE_PARTS", 20)
+    if len(contents) >= parallel > 0:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+            futures = [executor.submit(_write_temporary_file, f, extension, d) for f, d in zip(fullnames, contents)]
+        tmpnames = [f.result() for f in futures if not f.exception()]
+        errors = [f.exception() for f in futures if f.exception()]
+        if errors:
+            for t in tmpnames:
+                os.unlink(t)
+            raise errors[0]
+    else:
+        tmpnames = []
+        try:
+            for f, d in zip(fullnames, contents):
+                tmpnames.append(_write_temporary_file(f, extension, d))
+        except Exception:
+            for t in tmpnames:
+                os.unlink(t)
+            raise
+    return list(zip(tmpnames, fullnames))
+
+
+def _rename_parts(parts):
+    """ Move temporary files from `_write_parts` to their final names """
+    for tmpname, fullname in parts:
+        os.rename(tmpname, fullname)
+    directories = set(os.path.dirname(f) for t, f in parts)
+    for d in directories:
+        # Make sure that the renames are on disk too
+        fd = os.open(d, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
 def _save_file(derivedfile, partnumber, extension, data):
     fdir = derivedfile.directory()
     try:
         os.makedirs(fdir)
     except OSError:
-        logger.warn("Error making directory %s" % fdir)
-        pass
+        if not os.path.isdir(fdir):
+            logger.warn("Error making directory %s" % fdir)
 
     fname = derivedfile.filename_for_part(partnumber)
 
     fullname = os.path.join(fdir, fname)
     try:
-        # json module requires a string file-pointer. Other data could be either a string
-        # or bytes. Convert all strings to bytes and write
-        if extension == "json":
-            with open(fullname, "w") as fp:
-                json.dump(data, fp, cls=NumPyArangeEncoder)
-        else:
-            if isinstance(data, six.string_types):
-                data = data.encode("utf-8")
-            with open(fullname, "wb") as fp:
-                fp.write(data)
-        fp.close()
+        tmpname = _write_temporary_file(fullname, extension, data)
+        os.rename(tmpname, fullname)
     except OSError:
         logger.warn("Error writing to file %s" % fullname)
         logger.warn("Probably a permissions error")
@@ -245,7 +421,11 @@ def _save_process_results(version, instance, document, worker, results, starttim
     total_time = int(endtime - starttime)
 
     module = version.module
-    with transaction.atomic():
+    # Write all parts to temporary files before starting the transaction, so that
+    # we don't hold it while writing. Then move them into place and commit
+    # only once all of them are on disk.
+    outputs = []
+    try:
         for dataslug, contents in results.items():
             outputdata = instance._output[dataslug]
             extension = outputdata["extension"]
@@ -256,21 +436,37 @@ def _save_process_results(version, instance, document, worker, results, starttim
 
             if not multipart:
                 contents = [contents]
-            df, created = models.DerivedFile.objects.get_or_create(
-                document=document,
-                module_version=version, outputname=dataslug, extension=extension,
-                mimetype=mimetype, defaults={'computation_time': total_time, 'num_parts': len(contents)})
-            if not created:
-                df.date = django.utils.timezone.now()
-                df.num_parts = len(contents)
-                df.save()
-            if worker:
-                df.essentia = worker.essentia
-                df.pycompmusic = worker.pycompmusic
-                df.save()
-
-            for i, partdata in enumerate(contents, 1):
-                _save_file(df, i, extension, partdata)
+            # Only used to get the paths of the files
+            pathfile = models.DerivedFile(document=document, module_version=version,
+                                          outputname=dataslug, extension=extension)
+            parts = _write_parts(pathfile, extension, contents)
+            outputs.append((dataslug, extension, mimetype, parts))
+
+        with transaction.atomic():
+            for dataslug, extension, mimetype, parts in outputs:
+                df, created = models.DerivedFile.objects.get_or_create(
+                    document=document,
+                    module_version=version, outputname=dataslug, extension=extension,
+                    mimetype=mimetype, defaults={'computation_time': total_time, 'num_parts': len(parts)})
+                if not created:
+                    cache.invalidate(df)
+                    df.date = django.utils.timezone.now()
+                    df.num_parts = len(parts)
+                    df.save()
+                if worker:
+                    df.essentia = worker.essentia
+                    df.pycompmusic = worker.pycompmusic
+                    df.save()
+
+            for dataslug, extension, mimetype, parts in outputs:
+                _rename_parts(parts)
+                # These are now in place, don't remove them below
+                del parts[:]
+    finally:
+        for dataslug, extension, mimetype, parts in outputs:
+            for tmpname, fullname in parts:
+                if os.path.exists(tmpname):
+                    os.unlink(tmpname)
 
     # When we've finished, log that we processed the file. If this throws an
     # exception, we won't do the log.
@@ -281,7 +477,7 @@ def _save_process_results(version, instance, document, worker, results, starttim
 def process_collection(collectionid, moduleversionid):
     version = models.ModuleVersion.objects.get(pk=moduleversionid)
     module = version.module
-    instance = _get_module_instance_by_path(module.module)
+    instance = _get_cached_module_instance(module.module, version.version)
 
     hostname = process_collection.request.hostname
     worker = _get_worker_from_hostname(hostname)
@@ -310,26 +506,62 @@ def process_collection(collectionid, moduleversionid):
             _save_process_results(version, instance, document, worker, results, starttime, endtime)
 
 
+def _process_document(version, instance, worker, document):
+    module = version.module
+    sfiles = document.sourcefiles.filter(file_type=module.source_type)
+    if len(sfiles):
+        s = sfiles[0]
+        starttime = time.time()
+        results = instance.process_document(document.pk, s.pk, document.external_identifier, s.fullpath)
+        endtime = time.time()
+
+        if results:
+            _save_process_results(version, instance, document, worker, results, starttime, endtime)
+
+
 @app.task
 def process_document(documentid, moduleversionid):
     version = models.ModuleVersion.objects.get(pk=moduleversionid)
     module = version.module
-    instance = _get_module_instance_by_path(module.module)
+    instance = _get_cached_module_instance(module.module, version.version)
 
     hostname = process_document.request.hostname
     worker = _get_worker_from_hostname(hostname)
     instance.hostname = hostname
 
     document = models.Document.objects.get(pk=documentid)
-    sfiles = document.sourcefiles.filter(file_type=module.source_type)
-    if len(sfiles):
-        s = sfiles[0]
-        starttime = time.time()
-        results = instance.process_document(document.pk, s.pk, document.external_identifier, s.fullpath)
-        endtime = time.time()
+    try:
+        _process_document(version, instance, worker, document)
+    except Exception:
+        log.increment_module_progress(version.pk, "failed")
+        raise
+    log.increment_module_progress(version.pk, "done")
 
-        if results:
-            _save_process_results(version, instance, document, worker, results, starttime, endtime)
+
+@app.task
+def process_documents(documentids, moduleversionid):
+    """ Process a chunk of documents with the same module instance.
+    An error in one document is logged and doesn't stop the others
+    in the chunk from being processed. """
+    version = models.ModuleVersion.objects.select_related("module__source_type").get(pk=moduleversionid)
+    module = version.module
+    instance = _get_cached_module_instance(module.module, version.version)
+
+    hostname = process_documents.request.hostname
+    worker = _get_worker_from_hostname(hostname)
+    instance.hostname = hostname
+
+    documents = models.Document.objects.in_bulk(documentids)
+    for documentid in documentids:
+        document = documents.get(documentid)
+        if not document:
+            continue
+        try:
+            _process_document(version, instance, worker, document)
+            log.increment_module_progress(version.pk, "done")
+        except Exception:
+            logger.exception("error processing document %s with %s" % (document, version))
+            log.increment_module_progress(version.pk, "failed")
 
 
 def run_module(moduleid, versionid=None):
@@ -350,6 +582,7 @@ def run_module_on_recordings(moduleid, recids):
             sourcefiles__file_type=module.source_type,
             external_identifier__in=recids,
         ).exclude(derivedfiles__module_version=version)
+        log.add_module_progress_total(version.pk, docs.count())
         for d in docs:
             logger.info("  document %s" % d)
             logger.info("  docid %s" % d.pk)
@@ -357,7 +590,12 @@ def run_module_on_recordings(moduleid, recids):
 
 
 @app.task
-def run_module_on_collection(collectionid, moduleid, versionid=None):
+def run_module_on_collection(collectionid, moduleid, versionid=None, chunksize=None):
+    """ Process all documents in a collection which haven't been processed
+    with this version of the module yet.
+    If `chunksize` (default settings.DOCSERVER_PROCESS_CHUNK_SIZE) is more than 1,
+    send groups of this many documents to each task instead of one task per document.
+    """
     collection = models.Collection.objects.get(pk=collectionid)
     module = models.Module.objects.get(pk=moduleid)
     if versionid:
@@ -375,9 +613,20 @@ def run_module_on_collection(collectionid, moduleid, versionid=None):
             docs = models.Document.objects.filter(
                 sourcefiles__file_type=module.source_type,
                 collections=collection).exclude(derivedfiles__module_version=version)
-            for i, d in enumerate(docs, 1):
-                logger.info("  document %s/%s - %s" % (i, len(docs), d))
-                process_document.delay(d.pk, version.pk)
+            docids = list(docs.order_by("pk").values_list("pk", flat=True).distinct())
+            total = len(docids)
+            log.add_module_progress_total(version.pk, total)
+
+            if chunksize is None:
+                chunksize = getattr(settings, "DOCSERVER_PROCESS_CHUNK_SIZE", 1)
+            if chunksize > 1:
+                chunks = [docids[i:i + chunksize] for i in range(0, total, chunksize)]
+                logger.info("  %s documents in %s chunks" % (total, len(chunks)))
+                celery.group(process_documents.s(c, version.pk) for c in chunks).apply_async()
+            else:
+                for i, d in enumerate(docids, 1):
+                    logger.info("  document %s/%s - %s" % (i, total, d))
+                    process_document.delay(d, version.pk)
 
 
 def get_essentia_hash():
@@ -60,6 +60,33 @@ def delete_module_action(module):
     redis.delete(key)
 
 
+def add_module_progress_total(moduleversion, count):
+    """ Record that `count` more documents were queued for processing
+    with this moduleversion """
+    key = "module-progress-%s" % moduleversion
+    redis.hincrby(key, "total", count)
+
+
+def increment_module_progress(moduleversion, field):
+    """ Field is "done" or "failed" """
+    key = "module-progress-%s" % moduleversion
+    redis.hincrby(key, field, 1)
+
+
+def get_module_progress(moduleversion):
+    key = "module-progress-%s" % moduleversion
+    data = redis.hgetall(key)
+    ret = {"total": 0, "done": 0, "failed": 0}
+    for k, v in data.items():
+        ret[k.decode("utf-8")] = int(v)
+    return ret
+
+
+def delete_module_progress(moduleversion):
+    key = "module-progress-%s" % moduleversion
+    redis.delete(key)
+
+
 def get_processed_files(worker):
     key = "processed-file-%s" % worker
     data = redis.lrange(key, 0, -1)
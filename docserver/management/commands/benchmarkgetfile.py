@@ -0,0 +1,74 @@
+# Copyright 2013,2014 Music Technology Group - Universitat Pompeu Fabra
+#
+# This file is part of Dunya
+#
+# Dunya is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Affero General Public License as published by the Free Software
+# Foundation (FSF), either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see http://www.gnu.org/licenses/
+
+from __future__ import print_function
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+import docserver.exceptions
+import docserver.models
+
+
+class Command(BaseCommand):
+    help = 'Count the queries and time taken by Document.get_file for the derived files of some documents'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-n',
+                            type=int,
+                            dest='count',
+                            default=100,
+                            help='Number of documents to look up files for')
+
+    def lookups_for_document(self, document):
+        """ A (slug, subtype, part) lookup for every sourcefile and
+            derivedfile of this document """
+        lookups = []
+        for sf in document.sourcefiles.select_related('file_type'):
+            lookups.append((sf.file_type.slug, None, None))
+        for df in document.derivedfiles.select_related('module_version__module'):
+            lookups.append((df.module_version.module.slug, df.outputname, 1))
+        return lookups
+
+    def handle(self, *args, **options):
+        count = options["count"]
+
+        documents = docserver.models.Document.objects.filter(derivedfiles__isnull=False).distinct()[:count]
+        lookups = [(d, self.lookups_for_document(d)) for d in documents]
+
+        total = 0
+        errors = 0
+        start = time.time()
+        with CaptureQueriesContext(connection) as ctx:
+            for document, doclookups in lookups:
+                for slug, subtype, part in doclookups:
+                    total += 1
+                    try:
+                        thefile = document.get_file(slug, subtype, part)
+                        thefile.get_absolute_url(partnumber=part)
+                    except (docserver.exceptions.NoFileException, docserver.exceptions.TooManyFilesException):
+                        errors += 1
+        duration = time.time() - start
+
+        if not total:
+            print("No files to look up")
+            return
+        print("%s lookups on %s documents (%s errors)" % (total, len(lookups), errors))
+        print("%s queries, %.2f queries per lookup" % (len(ctx.captured_queries), len(ctx.captured_queries) / total))
+        print("%.2fms per lookup" % (duration * 1000 / total))
@@ -149,77 +149,218 @@ class Document(models.Model):
             newret[k] = items
         return newret
 
-    def get_file(self, slug, subtype=None, part=None, version=None):
-        try:
-            sourcetype = SourceFileType.objects.get_by_slug(slug)
-        except SourceFileType.DoesNotExist:
-            sourcetype = None
-
-        if sourcetype:
-            files = self.sourcefiles.filter(file_type=sourcetype)
-            if len(files) == 0:
-                raise exceptions.NoFileException("Looks like a sourcefile, but I can't find one")
-            else:
-                return files[0]
+    def _get_file_candidates(self, slug, subtype=None, version=None):
+        """ Find everything that `get_file` needs to make its decision in one query.
 
-        try:
-            module = Module.objects.get(slug=slug)
-        except Module.DoesNotExist:
-            raise exceptions.NoFileException("Cannot find a module with type %s" % slug)
-        moduleversions = module.versions
+        Returns a tuple (sourcefiletype, sourcefiles, module, versions) where
+        `versions` is a list of (ModuleVersion, [DerivedFile, ...]) ordered from
+        newest to oldest. Related objects are attached to the returned instances so
+        that building paths and urls from them doesn't cause any more queries.
+        """
+        sftfields = SourceFileType._meta.concrete_fields
+        sffields = SourceFile._meta.concrete_fields
+        modfields = Module._meta.concrete_fields
+        mvfields = ModuleVersion._meta.concrete_fields
+        dffields = DerivedFile._meta.concrete_fields
+
+        def cols(alias, fields):
+            return ['%s."%s"' % (alias, f.column) for f in fields]
+
+        def nulls(*fieldlists):
+            return ["NULL"] * sum(len(f) for f in fieldlists)
+
+        sourcecols = cols("sft", sftfields) + cols("sf", sffields) + nulls(modfields, mvfields, dffields)
+        derivedcols = nulls(sftfields, sffields) + cols("m", modfields) + cols("mv", mvfields) + cols("df", dffields)
+
+        versionclause = ""
+        subtypeclause = ""
+        derivedparams = [self.pk]
         if version:
-            moduleversions = moduleversions.filter(version=version)
-        else:
-            moduleversions = moduleversions.order_by("-date_added")
-        if len(moduleversions) == 0:
-            raise exceptions.NoFileException("No known versions for this module")
-
-        dfs = None
-        for mv in moduleversions:
-            # go through all the versions until we find a file of that version
-            # If we have a more recent version, but only a derived file for an older
-            # version, return the older version.
-            dfs = self.derivedfiles.filter(module_version=mv).all()
-            if subtype:
-                dfs = dfs.filter(outputname=subtype)
-            if dfs.count() > 0:
-                # We found some files, break
-                break
-        if dfs.count() > 1:
-            raise exceptions.TooManyFilesException(
-                "Found more than 1 subtype for this module but you haven't specified what you want")
-        elif dfs.count() == 1:
-            # Double-check if subtypes match. This is to catch the case where we
-            # have only one subtype for a type but we don't specify it in the
-            # query. By 'luck' we will get the right subtype, but this doesn't
-            # preclude the default subtype changing in a future version.
-            # Explicit is better than implicit
-            derived = dfs.get()
-            if derived.outputname != subtype:
-                raise exceptions.NoFileException(
-                    "This module has only one subtype which you must specify (%s)" % (derived.outputname,))
-            # Select the part.
-            # If the file has many parts and ?part is not set then it's an error
-            if part:
-                try:
-                    part = int(part)
-                except ValueError:
-                    raise exceptions.NoFileException("Invalid part")
-                if part > derived.num_parts:
-                    raise exceptions.NoFileException("Invalid part")
-
-            if derived.num_parts == 0:
-                raise exceptions.NoFileException("No parts on this file")
-            elif derived.num_parts > 1 and not part:
-                raise exceptions.TooManyFilesException("Found more than 1 part without part set")
+            versionclause = 'AND mv."version" = %s'
+            derivedparams = [str(version), self.pk]
+        if subtype:
+            subtypeclause = 'AND df."outputname" = %s'
+            derivedparams.append(subtype)
+        q = '''
+SELECT 'S', {sourcecols}
+FROM "docserver_sourcefiletype" sft
+LEFT OUTER JOIN "docserver_sourcefile" sf ON (sf."file_type_id" = sft."id" AND sf."document_id" = %s)
+WHERE sft."slug" = %s
+UNION ALL
+SELECT 'D', {derivedcols}
+FROM "docserver_module" m
+LEFT OUTER JOIN "docserver_moduleversion" mv ON (mv."module_id" = m."id" {versionclause})
+LEFT OUTER JOIN "docserver_derivedfile" df ON (df."module_version_id" = mv."id" AND df."document_id" = %s {subtypeclause})
+WHERE m."slug" = %s'''.format(sourcecols=", ".join(sourcecols), derivedcols=", ".join(derivedcols),
+                                 versionclause=versionclause, subtypeclause=subtypeclause)
+        params = [self.pk, slug.lower()] + derivedparams + [slug]
+        cursor = connection.cursor()
+        cursor.execute(q, params)
+        rows = cursor.fetchall()
+
+        db = self._state.db
+
+        def load(model, values):
+            # A LEFT OUTER JOIN with no match gives a row of NULLs
+            if values[0] is None:
+                return None
+            return model.from_db(db, None, values)
+
+        sourcefiletype = None
+        sourcefiles = []
+        module = None
+        versions = collections.OrderedDict()
+        for row in rows:
+            kind, values = row[0], list(row[1:])
+            sftvalues, values = values[:len(sftfields)], values[len(sftfields):]
+            sfvalues, values = values[:len(sffields)], values[len(sffields):]
+            modvalues, values = values[:len(modfields)], values[len(modfields):]
+            mvvalues, dfvalues = values[:len(mvfields)], values[len(mvfields):]
+            if kind == 'S':
+                sourcefiletype = load(SourceFileType, sftvalues)
+                sf = load(SourceFile, sfvalues)
+                if sf:
+                    sf.document = self
+                    sf.file_type = sourcefiletype
+                    sourcefiles.append(sf)
             else:
-                return derived
+                if not module:
+                    module = load(Module, modvalues)
+                mv = load(ModuleVersion, mvvalues)
+                if not mv:
+                    continue
+                mv = versions.setdefault(mv.pk, (mv, []))[0]
+                mv.module = module
+                df = load(DerivedFile, dfvalues)
+                if df:
+                    df.document = self
+                    df.module_version = mv
+                    versions[mv.pk][1].append(df)
+
+        sourcefiles.sort(key=lambda f: f.pk)
+        versions = list(versions.values())
+        if not version:
+            versions.sort(key=lambda v: v[0].date_added, reverse=True)
+        return sourcefiletype, sourcefiles, module, versions
+
+    def get_file(self, slug, subtype=None, part=None, version=None):
+        sourcetype, sourcefiles, module, moduleversions = self._get_file_candidates(slug, subtype, version)
+        return _select_file(sourcetype, sourcefiles, module, moduleversions, slug, subtype, part, version)
+
+    def get_files(self, lookups):
+        """ Resolve many files of this document at once.
+
+        `lookups` is a list of (slug, subtype, part, version) tuples, with the
+        same meaning as the arguments to `get_file`. Returns a dictionary
+        {lookup: file}, where file is a SourceFile or DerivedFile, or None
+        if `get_file` would have raised an exception for that lookup.
+        The number of queries doesn't depend on the number of lookups.
+        """
+        slugs = set(lookup[0] for lookup in lookups)
+
+        sourcetypes = {t.slug: t for t in SourceFileType.objects.filter(slug__in=[s.lower() for s in slugs])}
+        sourcefiles = collections.defaultdict(list)
+        if sourcetypes:
+            typesbyid = {t.pk: t for t in sourcetypes.values()}
+            for sf in self.sourcefiles.filter(file_type__in=typesbyid.keys()).order_by("pk"):
+                sf.document = self
+                sf.file_type = typesbyid[sf.file_type_id]
+                sourcefiles[sf.file_type.slug].append(sf)
+
+        modules = {m.slug: m for m in Module.objects.filter(slug__in=slugs)}
+        moduleversions = collections.defaultdict(list)
+        derived = collections.defaultdict(list)
+        if modules:
+            modulesbyid = {m.pk: m for m in modules.values()}
+            versionsbyid = {}
+            for mv in ModuleVersion.objects.filter(module__in=modulesbyid.keys()).order_by("-date_added"):
+                mv.module = modulesbyid[mv.module_id]
+                versionsbyid[mv.pk] = mv
+                moduleversions[mv.module_id].append(mv)
+            for df in self.derivedfiles.filter(module_version__in=versionsbyid.keys()):
+                df.document = self
+                df.module_version = versionsbyid[df.module_version_id]
+                derived[df.module_version_id].append(df)
+
+        ret = {}
+        for lookup in lookups:
+            slug, subtype, part, version = lookup
+            sourcetype = sourcetypes.get(slug.lower())
+            module = modules.get(slug)
+            versions = []
+            if module:
+                for mv in moduleversions[module.pk]:
+                    if version and mv.version != str(version):
+                        continue
+                    dfs = [df for df in derived[mv.pk] if not subtype or df.outputname == subtype]
+                    versions.append((mv, dfs))
+            try:
+                ret[lookup] = _select_file(sourcetype, sourcefiles[slug.lower()], module, versions,
+                                           slug, subtype, part, version)
+            except (exceptions.NoFileException, exceptions.TooManyFilesException):
+                ret[lookup] = None
+        return ret
+
+
+def _select_file(sourcetype, sourcefiles, module, moduleversions, slug, subtype, part, version):
+    """ Choose the file to return from Document.get_file, given the sourcefiles
+        of type `sourcetype` and the derived files for each version of `module`,
+        newest version first. """
+    if sourcetype:
+        if len(sourcefiles) == 0:
+            raise exceptions.NoFileException("Looks like a sourcefile, but I can't find one")
+        else:
+            return sourcefiles[0]
+
+    if not module:
+        raise exceptions.NoFileException("Cannot find a module with type %s" % slug)
+    if len(moduleversions) == 0:
+        raise exceptions.NoFileException("No known versions for this module")
+
+    dfs = []
+    for mv, mvfiles in moduleversions:
+        # go through all the versions until we find a file of that version
+        # If we have a more recent version, but only a derived file for an older
+        # version, return the older version.
+        dfs = mvfiles
+        if len(dfs) > 0:
+            # We found some files, break
+            break
+    if len(dfs) > 1:
+        raise exceptions.TooManyFilesException(
+            "Found more than 1 subtype for this module but you haven't specified what you want")
+    elif len(dfs) == 1:
+        # Double-check if subtypes match. This is to catch the case where we
+        # have only one subtype for a type but we don't specify it in the
+        # query. By 'luck' we will get the right subtype, but this doesn't
+        # preclude the default subtype changing in a future version.
+        # Explicit is better than implicit
+        derived = dfs[0]
+        if derived.outputname != subtype:
+            raise exceptions.NoFileException(
+                "This module has only one subtype which you must specify (%s)" % (derived.outputname,))
+        # Select the part.
+        # If the file has many parts and ?part is not set then it's an error
+        if part:
+            try:
+                part = int(part)
+            except ValueError:
+                raise exceptions.NoFileException("Invalid part")
+            if part > derived.num_parts:
+                raise exceptions.NoFileException("Invalid part")
+
+        if derived.num_parts == 0:
+            raise exceptions.NoFileException("No parts on this file")
+        elif derived.num_parts > 1 and not part:
+            raise exceptions.TooManyFilesException("Found more than 1 part without part set")
         else:
-            # If no files, or none with this version
-            msg = "No derived files with this type/subtype"
-            if version:
-                msg += " or version"
-            raise exceptions.NoFileException(msg)
+            return derived
+    else:
+        # If no files, or none with this version
+        msg = "No derived files with this type/subtype"
+        if version:
+            msg += " or version"
+        raise exceptions.NoFileException(msg)
 
 
 class FileTypeManager(models.Manager):
@@ -288,6 +429,10 @@ class SourceFile(models.Model):
         return u"%s (%s, %s)" % (self.document.title, self.file_type.name, self.path)
 
 
+# Extensions of derived files which are saved with numpy instead of as json or bytes
+ARRAY_EXTENSIONS = ("npy", "npz")
+
+
 class DerivedFile(models.Model):
     """A file which is the result of processing a SourceFile with an algorithm"""
 
@@ -320,6 +465,11 @@ class DerivedFile(models.Model):
         versions = self.module_version.module.versions.all()
         return [v.version for v in versions]
 
+    @property
+    def is_array(self):
+        """ True if the parts of this file are stored as numpy .npy or .npz files """
+        return self.extension in ARRAY_EXTENSIONS
+
     def directory(self):
         root_directory = self.document.get_root_dir()
         recordingid = self.document.external_identifier
@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase, TestCase
+
+from docserver import cache
+from docserver import jobs
+from docserver import models
+from docserver import util
+
+
+class LRUCacheTest(SimpleTestCase):
+    def test_evict_least_recently_used(self):
+        c = cache.LRUCache(10)
+        c.set("a", b"1234")
+        c.set("b", b"1234")
+        # a is now more recently used than b
+        c.get("a")
+        c.set("c", b"1234")
+        self.assertIsNone(c.get("b"))
+        self.assertEqual(c.get("a"), b"1234")
+        self.assertEqual(c.get("c"), b"1234")
+        self.assertEqual(c.size, 8)
+
+    def test_replace_and_delete(self):
+        c = cache.LRUCache(10)
+        c.set("a", b"1234")
+        c.set("a", b"12")
+        self.assertEqual(c.size, 2)
+        c.delete("a")
+        self.assertEqual(c.size, 0)
+        self.assertEqual(len(c), 0)
+
+
+class DerivedContentsTest(TestCase):
+    fixtures = ['docserver_sourcefiletype']
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        coll = models.Collection.objects.create(collectionid="7a99e6f3-7d5e-4577-a07d-43605d5b4220",
+                                                name="Test collection", slug="test-collection", description="",
+                                                root_directory=self.root)
+        self.doc = models.Document.objects.create(external_identifier="f522f7c6-8299-44e9-889f-063d37526801")
+        self.doc.collections.add(coll)
+        sft = models.SourceFileType.objects.get(slug="mp3")
+        module = models.Module.objects.create(slug="votedtonic", source_type=sft)
+        modver = models.ModuleVersion.objects.create(module=module, version="0.1")
+        self.df = models.DerivedFile.objects.create(document=self.doc, module_version=modver, outputname="tonic",
+                                                    extension="txt", mimetype="text/plain", num_parts=1)
+        self.write("146.8")
+        cache.local_cache.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+        cache.local_cache.clear()
+
+    def write(self, contents):
+        jobs._save_file(self.df, 1, "txt", contents)
+
+    def test_contents_are_cached(self):
+        tonic = util.docserver_get_contents(self.doc.external_identifier, "votedtonic", "tonic")
+        self.assertEqual(tonic, b"146.8")
+        os.unlink(self.df.full_path_for_part(1))
+        tonic = util.docserver_get_contents(self.doc.external_identifier, "votedtonic", "tonic")
+        self.assertEqual(tonic, b"146.8")
+
+    def test_invalidate(self):
+        util.docserver_get_contents(self.doc.external_identifier, "votedtonic", "tonic")
+        cache.invalidate(self.df)
+        self.assertEqual(len(cache.local_cache), 0)
+
+    def test_new_date_is_not_stale(self):
+        util.docserver_get_contents(self.doc.external_identifier, "votedtonic", "tonic")
+        self.write("220.0")
+        self.df.date = self.df.date.replace(year=self.df.date.year + 1)
+        self.df.save()
+        tonic = util.docserver_get_contents(self.doc.external_identifier, "votedtonic", "tonic")
+        self.assertEqual(tonic, b"220.0")
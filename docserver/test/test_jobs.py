@@ -1,3 +1,7 @@
+import logging
+import os
+import shutil
+import tempfile
 import uuid
 
 import compmusic.extractors
@@ -33,8 +37,9 @@ class Test2Extractor(compmusic.extractors.ExtractorModule):
 class AbstractFileTest(TestCase):
     def setUp(self):
         collid = uuid.uuid4()
+        self.root = tempfile.mkdtemp()
         self.col1 = models.Collection.objects.create(collectionid=collid, name="collection 1", slug="col",
-                                                     root_directory="/tmp/col1")
+                                                     root_directory=self.root)
         self.file_type = models.SourceFileType.objects.create(extension="mp3", name="mp3_file_type", slug="mp3")
         self.doc1 = models.Document.objects.create(title="doc1", external_identifier="111111")
         self.doc1.collections.add(self.col1)
@@ -44,12 +49,14 @@ class AbstractFileTest(TestCase):
         self.log = mock.Mock()
         jobs.log = self.log
         jobs._get_module_instance_by_path = self.get_m
+        jobs._module_instances.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
 
 
 class SourceFileTest(AbstractFileTest):
-    @mock.patch('os.makedirs')
-    @mock.patch('builtins.open')
-    def test_run_module_on_collection(self, mock_open, makedir):
+    def test_run_module_on_collection(self):
         modulepath = "compmusic.extractors.TestExtractor"
         instance = TestExtractor()
         self.get_m.return_value = instance
@@ -76,11 +83,9 @@ class SourceFileTest(AbstractFileTest):
         self.assertEqual(len(doc.derivedfiles.all()), 1)
     """
 
-    @mock.patch('os.makedirs')
-    @mock.patch('builtins.open')
     @override_settings(CELERY_ALWAYS_EAGER=True)
-    def test_process_document(self, mock_open, makedir):
-        # /tmp/col1/incoming/11/111111/asd2/0.1
+    def test_process_document(self):
+        # <root>/derived/11/111111/asd2/0.1
         modulepath = "compmusic.extractors.Test2Extractor"
         instance = Test2Extractor()
         self.get_m.return_value = instance
@@ -91,3 +96,155 @@ class SourceFileTest(AbstractFileTest):
         jobs.run_module_on_collection(self.col1.pk, mod.pk)
 
         self.assertEqual(len(self.doc1.derivedfiles.all()), 1)
+
+    @mock.patch('docserver.jobs.celery.group')
+    def test_run_module_on_collection_chunks(self, group):
+        modulepath = "compmusic.extractors.Test2Extractor"
+        instance = Test2Extractor()
+        self.get_m.return_value = instance
+        mod = jobs.create_module(modulepath, [self.col1.pk])
+        version = mod.versions.get()
+
+        docids = [self.doc1.pk]
+        for i in range(4):
+            doc = models.Document.objects.create(title="doc", external_identifier="22222%s" % i)
+            doc.collections.add(self.col1)
+            models.SourceFile.objects.create(document=doc, file_type=self.file_type, size=1000)
+            docids.append(doc.pk)
+
+        jobs.run_module_on_collection(self.col1.pk, mod.pk, chunksize=2)
+
+        signatures = list(group.call_args[0][0])
+        self.assertEqual([s.args for s in signatures],
+                         [(docids[0:2], version.pk), (docids[2:4], version.pk), (docids[4:], version.pk)])
+        self.log.add_module_progress_total.assert_called_with(version.pk, 5)
+
+    @mock.patch('docserver.jobs.process_document')
+    def test_run_module_on_recordings_progress(self, process_document):
+        modulepath = "compmusic.extractors.Test2Extractor"
+        instance = Test2Extractor()
+        self.get_m.return_value = instance
+        mod = jobs.create_module(modulepath, [self.col1.pk])
+        version = mod.versions.get()
+
+        jobs.run_module_on_recordings(mod.pk, [self.doc1.external_identifier])
+
+        process_document.delay.assert_called_once_with(self.doc1.pk, version.pk)
+        self.log.add_module_progress_total.assert_called_once_with(version.pk, 1)
+
+    def test_process_documents(self):
+        modulepath = "compmusic.extractors.Test2Extractor"
+        instance = Test2Extractor()
+        self.get_m.return_value = instance
+        mod = jobs.create_module(modulepath, [self.col1.pk])
+        version = mod.versions.get()
+
+        doc2 = models.Document.objects.create(title="doc2", external_identifier="222222")
+        doc2.collections.add(self.col1)
+        models.SourceFile.objects.create(document=doc2, file_type=self.file_type, size=1000)
+
+        calls = self.get_m.call_count
+        jobs.process_documents([self.doc1.pk, doc2.pk], version.pk)
+
+        # The module is only loaded once for the whole chunk
+        self.assertEqual(self.get_m.call_count, calls + 1)
+        self.assertEqual(len(self.doc1.derivedfiles.all()), 1)
+        self.assertEqual(len(doc2.derivedfiles.all()), 1)
+        self.log.increment_module_progress.assert_called_with(version.pk, "done")
+
+    def test_module_instance_cache(self):
+        modulepath = "compmusic.extractors.Test2Extractor"
+        self.get_m.side_effect = lambda path: Test2Extractor()
+        mod = jobs.create_module(modulepath, [self.col1.pk])
+
+        first = jobs._get_cached_module_instance(modulepath, "0.1")
+        self.assertIs(first, jobs._get_cached_module_instance(modulepath, "0.1"))
+
+        # A new version of the module means we make a new instance
+        Test2Extractor._version = "0.2"
+        try:
+            jobs.get_latest_module_version(mod.pk)
+        finally:
+            Test2Extractor._version = "0.1"
+        self.assertEqual(mod.versions.count(), 2)
+        self.assertIsNot(first, jobs._get_cached_module_instance(modulepath, "0.1"))
+
+
+class SaveResultsTest(AbstractFileTest):
+    def setUp(self):
+        super(SaveResultsTest, self).setUp()
+        self.module = models.Module.objects.create(slug="asd", source_type=self.file_type)
+        self.version = models.ModuleVersion.objects.create(module=self.module, version="0.1")
+        self.instance = mock.Mock()
+        self.instance._output = {"tiles": {"extension": "png", "mimetype": "image/png", "parts": True},
+                                 "meta": {"extension": "json", "mimetype": "application/json"}}
+
+    def test_save_many_parts(self):
+        tiles = [b"tile %d" % i for i in range(30)]
+        results = {"tiles": tiles, "meta": {"a": 1}}
+        jobs._save_process_results(self.version, self.instance, self.doc1, None, results, 0, 1)
+
+        df = self.doc1.derivedfiles.get(outputname="tiles")
+        self.assertEqual(df.num_parts, 30)
+        for i, tile in enumerate(tiles, 1):
+            with open(df.full_path_for_part(i), "rb") as fp:
+                self.assertEqual(fp.read(), tile)
+        meta = self.doc1.derivedfiles.get(outputname="meta")
+        with open(meta.full_path_for_part(1)) as fp:
+            self.assertEqual(fp.read(), '{"a": 1}')
+        # No temporary files left
+        self.assertEqual(sorted(os.listdir(df.directory())),
+                         sorted([df.filename_for_part(i) for i in range(1, 31)] + [meta.filename_for_part(1)]))
+
+    def test_failed_write(self):
+        """ If a part can't be written, no files or derived files are saved """
+        results = {"tiles": [b"tile", object()], "meta": {"a": object()}}
+        with self.assertRaises(TypeError):
+            jobs._save_process_results(self.version, self.instance, self.doc1, None, results, 0, 1)
+        self.assertEqual(self.doc1.derivedfiles.count(), 0)
+        pathfile = models.DerivedFile(document=self.doc1, module_version=self.version, outputname="tiles")
+        self.assertEqual(os.listdir(pathfile.directory()), [])
+
+
+class DatabaseLogHandlerTest(TestCase):
+    def setUp(self):
+        self.file_type = models.SourceFileType.objects.create(extension="mp3", name="mp3_file_type", slug="mp3")
+        self.doc = models.Document.objects.create(title="doc1", external_identifier="111111")
+        self.sfile = models.SourceFile.objects.create(document=self.doc, file_type=self.file_type, size=1000)
+        module = models.Module.objects.create(slug="pitch", source_type=self.file_type)
+        self.version = models.ModuleVersion.objects.create(module=module, version="0.1")
+        self.handler = jobs.DatabaseLogHandler(capacity=5)
+        self.logger = logging.getLogger("test-extractor")
+        self.logger.propagate = False
+        self.logger.addHandler(self.handler)
+        self.extra = {"documentid": self.doc.pk, "sourcefileid": self.sfile.pk,
+                      "modulename": "pitch", "moduleversion": "0.1"}
+
+    def tearDown(self):
+        self.logger.removeHandler(self.handler)
+
+    def test_buffered(self):
+        # Lookups for the first message, nothing after that until the buffer is full
+        with self.assertNumQueries(3):
+            for i in range(4):
+                self.logger.info("message %s", i, extra=self.extra)
+        self.assertEqual(models.DocumentLogMessage.objects.count(), 0)
+
+        with self.assertNumQueries(1):
+            self.logger.info("message 4", extra=self.extra)
+        self.assertEqual(models.DocumentLogMessage.objects.count(), 5)
+
+        self.logger.info("message 5", extra=self.extra)
+        self.handler.reset()
+        messages = list(models.DocumentLogMessage.objects.order_by("pk"))
+        self.assertEqual([m.message for m in messages], ["message %s" % i for i in range(6)])
+        self.assertEqual(sorted(messages, key=lambda m: m.datetime), messages)
+        self.assertEqual(messages[0].moduleversion, self.version)
+        self.assertEqual(messages[0].sourcefile, self.sfile)
+        self.assertEqual(messages[0].level, "INFO")
+
+    def test_no_document(self):
+        extra = {"documentid": self.doc.pk + 1}
+        self.logger.info("message", extra=extra)
+        self.handler.reset()
+        self.assertEqual(models.DocumentLogMessage.objects.count(), 0)
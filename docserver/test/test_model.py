@@ -144,6 +144,37 @@ class TestDocument(TestCase):
             res = self.doc.get_file("derived", "noparts", part="0")
         self.assertEqual(str(cm.exception), "No parts on this file")
 
+    def test_get_file_num_queries(self):
+        """ Resolving a file takes one query, and building its url takes none """
+        sft = models.SourceFileType.objects.get(slug="mp3")
+        sf = models.SourceFile.objects.create(file_type=sft, document=self.doc, size=1, path="/foo/source.mp3")
+
+        module = models.Module.objects.create(slug="derived", source_type=sft)
+        modver1 = models.ModuleVersion.objects.create(module=module, version="0.1", date_added="2016-12-01T00:01:11+00")
+        modver2 = models.ModuleVersion.objects.create(module=module, version="0.2", date_added="2016-12-01T10:20:11+00")
+        df1 = models.DerivedFile.objects.create(document=self.doc, module_version=modver1, outputname="info",
+                                                extension="json", mimetype="text/plain", num_parts=1)
+        df2 = models.DerivedFile.objects.create(document=self.doc, module_version=modver2, outputname="info",
+                                                extension="json", mimetype="text/plain", num_parts=3)
+
+        with self.assertNumQueries(1):
+            res = self.doc.get_file("mp3")
+            self.assertEqual(res, sf)
+            self.assertEqual(res.file_type, sft)
+
+        with self.assertNumQueries(1):
+            res = self.doc.get_file("derived", "info", part=2)
+            self.assertEqual(res, df2)
+            res.get_absolute_url(partnumber=2)
+
+        with self.assertNumQueries(1):
+            res = self.doc.get_file("derived", "info", version="0.1")
+            self.assertEqual(res, df1)
+
+        with self.assertNumQueries(1):
+            with self.assertRaises(exceptions.NoFileException):
+                self.doc.get_file("derived", "nothing")
+
 
 class TestUrlsAndPaths(TestCase):
     fixtures = ['docserver_sourcefiletype']
@@ -1,9 +1,13 @@
+import shutil
+import tempfile
 import uuid
 
 from unittest import mock
+import numpy as np
 import six
 from django.test import TestCase
 
+from docserver import jobs
 from docserver import models
 from docserver import util
 
@@ -122,3 +126,81 @@ class UtilTest(TestCase):
         self.assertEqual(2, models.Document.objects.count())
         self.assertEqual(u, doc.external_identifier)
         self.assertEqual("some title", doc.title)
+
+    def test_get_urls(self):
+        """ Get many urls of a document in a constant number of queries """
+        sf = models.SourceFile.objects.create(path="11/1122-3333-4444/mp3/1122-3333-4444-mp3.mp3", size=100,
+                                              document=self.doc, file_type=self.sft)
+        module = models.Module.objects.create(slug="derived", source_type=self.sft)
+        modver = models.ModuleVersion.objects.create(module=module, version="0.1")
+        models.DerivedFile.objects.create(document=self.doc, module_version=modver, outputname="meta",
+                                          extension="json", mimetype="text/plain", num_parts=2)
+        models.DerivedFile.objects.create(document=self.doc, module_version=modver, outputname="data",
+                                          extension="json", mimetype="text/plain", num_parts=1)
+
+        lookups = [("mp3", None, None, None),
+                   ("derived", "meta", 2, "0.1"),
+                   ("derived", "data", None, None),
+                   ("derived", "meta", None, None),
+                   ("derived", "other", None, None),
+                   ("notamodule", None, None, None)]
+        # document and its collections, sourcefile types, sourcefiles, modules, versions, derivedfiles
+        with self.assertNumQueries(7):
+            urls = util.docserver_get_urls("1122-3333-4444", lookups)
+
+        self.assertEqual(urls[lookups[0]], sf.get_absolute_url())
+        self.assertEqual(urls[lookups[1]], "/document/by-id/1122-3333-4444/derived?v=0.1&subtype=meta&part=2")
+        self.assertEqual(urls[lookups[2]], "/document/by-id/1122-3333-4444/derived?v=0.1&subtype=data")
+        # Many parts but no part set, and unknown subtypes or modules are misses
+        self.assertIsNone(urls[lookups[3]])
+        self.assertIsNone(urls[lookups[4]])
+        self.assertIsNone(urls[lookups[5]])
+
+        missing = util.docserver_get_urls("not-a-document", lookups)
+        self.assertEqual(missing, {lookup: None for lookup in lookups})
+
+
+class ArrayFileTest(TestCase):
+    fixtures = ['docserver_sourcefiletype']
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        coll = models.Collection.objects.create(collectionid=str(uuid.uuid4()), name='test collection',
+                                                slug='test-collection', description='', root_directory=self.root)
+        self.doc = models.Document.objects.create(external_identifier="1122-3333-4444")
+        self.doc.collections.add(coll)
+        sft = models.SourceFileType.objects.get_by_slug("mp3")
+        module = models.Module.objects.create(slug="pitch", source_type=sft)
+        self.modver = models.ModuleVersion.objects.create(module=module, version="0.1")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def make_file(self, outputname, extension, data):
+        df = models.DerivedFile.objects.create(document=self.doc, module_version=self.modver, outputname=outputname,
+                                               extension=extension, mimetype="application/octet-stream", num_parts=1)
+        jobs._save_file(df, 1, extension, data)
+        return df
+
+    def test_npy(self):
+        self.make_file("pitch", "npy", np.arange(12, dtype=np.float32).reshape(6, 2))
+
+        arr = util.docserver_get_array("1122-3333-4444", "pitch", "pitch")
+        self.assertIsInstance(arr, np.memmap)
+        self.assertEqual(arr.shape, (6, 2))
+        self.assertEqual(arr[3, 1], 7.0)
+
+        self.assertEqual(util.docserver_get_json("1122-3333-4444", "pitch", "pitch")[3], [6.0, 7.0])
+
+    def test_npz(self):
+        self.make_file("histogram", "npz", {"bins": np.arange(3), "counts": np.array([0.5, 0.25, 0.25])})
+
+        arrs = util.docserver_get_array("1122-3333-4444", "pitch", "histogram")
+        self.assertEqual(sorted(arrs.keys()), ["bins", "counts"])
+        self.assertEqual(util.docserver_get_json("1122-3333-4444", "pitch", "histogram"),
+                         {"bins": [0, 1, 2], "counts": [0.5, 0.25, 0.25]})
+
+    def test_json_as_array(self):
+        self.make_file("json", "json", [[1, 2], [3, 4]])
+        arr = util.docserver_get_array("1122-3333-4444", "pitch", "json")
+        self.assertEqual(arr.tolist(), [[1, 2], [3, 4]])
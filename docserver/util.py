@@ -21,8 +21,10 @@ import subprocess
 import tempfile
 
 import compmusic
+import numpy as np
 from django.core.exceptions import ObjectDoesNotExist
 
+from docserver import cache
 from docserver import exceptions
 from docserver import models
 
@@ -151,6 +153,82 @@ def docserver_get_url(documentid, slug, subtype=None, part=None, version=None):
     return thefile.get_absolute_url(partnumber=part)
 
 
+def docserver_get_files(documentid, lookups):
+    """ Get many files of a document at once.
+        `lookups` is a list of (slug, subtype, part, version) tuples.
+        Returns a dictionary {lookup: file} where file is a SourceFile or DerivedFile,
+        or None if there is no file for that lookup. The document, its sourcefiles and
+        its derivedfiles are only loaded once for all lookups.
+    """
+    try:
+        document = models.Document.objects.prefetch_related("collections").get(external_identifier=documentid)
+    except models.Document.DoesNotExist:
+        return {lookup: None for lookup in lookups}
+    return document.get_files(lookups)
+
+
+def docserver_get_urls(documentid, lookups):
+    """ Like docserver_get_url, but for many (slug, subtype, part, version)
+        tuples of the same document. Returns a dictionary {lookup: url}, where
+        url is None if there is no file for that lookup.
+    """
+    ret = {}
+    for lookup, thefile in docserver_get_files(documentid, lookups).items():
+        if thefile:
+            thefile = thefile.get_absolute_url(partnumber=lookup[2])
+        ret[lookup] = thefile
+    return ret
+
+
+def docserver_get_filenames(documentid, lookups):
+    """ Like docserver_get_filename, but for many (slug, subtype, part, version)
+        tuples of the same document. Returns a dictionary {lookup: filename}, where
+        filename is None if there is no file for that lookup.
+    """
+    ret = {}
+    for lookup, thefile in docserver_get_files(documentid, lookups).items():
+        ret[lookup] = _get_file_filename(thefile, lookup[2])
+    return ret
+
+
+def _get_file_filename(thefile, part=None):
+    if thefile is None:
+        return None
+    if isinstance(thefile, models.SourceFile):
+        return thefile.fullpath
+    else:
+        return thefile.full_path_for_part(part or 1)
+
+
+def _read_file(thefile, part=None):
+    """ Read the contents of a SourceFile or DerivedFile. The contents
+        of small derived files are cached """
+    if isinstance(thefile, models.DerivedFile):
+        return cache.get_contents(thefile, part or 1)
+    with open(_get_file_filename(thefile, part), "rb") as fp:
+        return fp.read()
+
+
+def docserver_read_file(thefile, part=None):
+    """ Return the contents of a file returned by docserver_get_files,
+        or None if it is missing """
+    if thefile is None:
+        return None
+    try:
+        return _read_file(thefile, part)
+    except IOError:
+        return None
+
+
+def docserver_read_json(thefile, part=None):
+    """ Return the json-decoded contents of a file returned by
+        docserver_get_files, or None if it is missing """
+    contents = docserver_read_file(thefile, part)
+    if contents is None:
+        return None
+    return json.loads(contents.decode("utf-8"))
+
+
 def docserver_get_mp3_url(documentid):
     try:
         document = models.Document.objects.get(external_identifier=documentid)
@@ -188,20 +266,65 @@ def docserver_get_symbtrmu2(documentid):
     return sf.fullpath
 
 
+def _get_document_file(documentid, slug, subtype=None, part=None, version=None):
+    try:
+        document = models.Document.objects.get(external_identifier=documentid)
+    except models.Document.DoesNotExist:
+        raise exceptions.NoFileException()
+    return document.get_file(slug, subtype, part, version)
+
+
 def docserver_get_contents(documentid, slug, subtype=None, part=None, version=None):
+    result = _get_document_file(documentid, slug, subtype, part, version)
     try:
-        return open(docserver_get_filename(documentid, slug, subtype, part, version), "rb").read()
+        return _read_file(result, part)
     except IOError:
         raise exceptions.NoFileException
 
 
 def docserver_get_json(documentid, slug, subtype=None, part=None, version=None):
+    result = _get_document_file(documentid, slug, subtype, part, version)
     try:
-        return json.load(open(docserver_get_filename(documentid, slug, subtype, part, version)))
+        if isinstance(result, models.DerivedFile) and result.is_array:
+            return array_to_json(docserver_read_array(result, part, mmap=False))
+        return json.loads(_read_file(result, part).decode("utf-8"))
     except IOError:
         raise exceptions.NoFileException
 
 
+def docserver_read_array(thefile, part=None, mmap=True):
+    """ Load a DerivedFile saved as .npy or .npz. See docserver_get_array """
+    filename = _get_file_filename(thefile, part)
+    if thefile.extension == "npz":
+        with np.load(filename) as data:
+            return dict(data)
+    return np.load(filename, mmap_mode="r" if mmap else None)
+
+
+def docserver_get_array(documentid, slug, subtype=None, part=None, version=None, mmap=True):
+    """ Get a derived file as a numpy array.
+        Files saved as .npy are memory-mapped read-only unless `mmap` is False, so
+        only the parts of the array that are used are read from disk.
+        Files saved as .npz are returned as a dictionary of arrays, and json files
+        are decoded and converted with numpy.asarray.
+    """
+    result = _get_document_file(documentid, slug, subtype, part, version)
+    try:
+        if isinstance(result, models.DerivedFile) and result.is_array:
+            return docserver_read_array(result, part, mmap)
+        return np.asarray(json.loads(_read_file(result, part).decode("utf-8")))
+    except IOError:
+        raise exceptions.NoFileException
+
+
+def array_to_json(data):
+    """ Convert an array or dictionary of arrays loaded from a .npy or .npz
+        file to lists that can be serialised as json """
+    if isinstance(data, dict):
+        return {k: v.tolist() for k, v in data.items()}
+    return data.tolist()
+
+
 def get_user_permissions(user):
     permission = ["U"]
     if user.is_staff:
@@ -157,6 +157,14 @@ class SourceFile(generics.CreateAPIView, generics.UpdateAPIView):
         return self._save_file(external_identifier, file_type, file)
 
 
+def _wants_json(request):
+    """ If the client asks for json with ?format=json or an Accept header """
+    if request.GET.get("format") == "json":
+        return True
+    accept = request.META.get("HTTP_ACCEPT", "")
+    return "application/json" in accept
+
+
 def download_external(request, uuid, ftype):
     # Test authentication. We support a rest-framework token
     # or a logged-in user
@@ -199,6 +207,14 @@ def download_external(request, uuid, ftype):
                 part = 1
             fname = result.full_path_for_part(part)
 
+        # Numpy arrays can also be downloaded as json
+        if isinstance(result, models.DerivedFile) and result.is_array and _wants_json(request):
+            try:
+                data = util.array_to_json(util.docserver_read_array(result, part, mmap=False))
+            except IOError:
+                raise docserver.exceptions.NoFileException("Cannot read file")
+            return HttpResponse(json.dumps(data), content_type="application/json")
+
         mimetype = result.mimetype
         ratelimit = "off"
         if util.has_rate_limit(user, doc, ftype):
@@ -333,7 +349,8 @@ def understand_task(task):
         collectionid = args[0]
         coll = dashboard.models.Collection.objects.get(collectionid=collectionid)
         thetask["collection"] = coll
-    elif tname == "dashboard.jobs.import_all_releases" or tname == "dashboard.jobs.force_import_all_releases":
+    elif tname in ["dashboard.jobs.import_all_releases", "dashboard.jobs.force_import_all_releases",
+                   "dashboard.jobs.import_release_shard"]:
         thetask["type"] = "importreleases"
         thetask["nicename"] = "Import releases in collection"
         collectionid = args[0]
@@ -352,6 +369,13 @@ def understand_task(task):
         document = models.Document.objects.get(pk=documentid)
         thetask["moduleversion"] = version
         thetask["document"] = document
+    elif tname == "docserver.jobs.process_documents":
+        thetask["type"] = "process"
+        thetask["nicename"] = "Running extractor on %s documents" % len(args[0])
+
+        moduleversionid = args[1]
+        version = models.ModuleVersion.objects.get(pk=moduleversionid)
+        thetask["moduleversion"] = version
     return thetask
 
 
@@ -505,6 +529,10 @@ def module(request, module):
 
     logmessages = models.DocumentLogMessage.objects.filter(moduleversion__module=module)[:20]
 
+    versions = list(versions)
+    for v in versions:
+        v.progress = log.get_module_progress(v.pk)
+
     ret = {"module": module,
            "versions": versions,
            "form": form,
@@ -639,6 +667,7 @@ def collectionversion(request, slug, version, type):
     run = request.GET.get("run")
     if run:
         document = models.Document.objects.get(external_identifier=run)
+        log.add_module_progress_total(mversion.pk, 1)
         jobs.process_document.delay(document.pk, mversion.pk)
         return redirect('docserver-collectionversion', type, slug, version)
 
@@ -679,6 +708,7 @@ def file(request, slug, uuid, version=None):
     runmodule = request.GET.get("runmodule")
     if runmodule:
         mversion = models.ModuleVersion.objects.get(pk=runmodule)
+        log.add_module_progress_total(mversion.pk, 1)
         jobs.process_document.delay(doc.pk, mversion.pk)
         return redirect('docserver-file', slug, uuid, version)
 
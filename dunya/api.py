@@ -15,7 +15,14 @@
 # this program.  If not, see http://www.gnu.org/licenses/
 import uuid
 
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from rest_framework import generics
+from rest_framework import pagination
 from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from data import apicache
+from data import utils
 
 
 def get_collection_ids_from_request_or_error(request):
@@ -38,3 +45,117 @@ def get_collection_ids_from_request_or_error(request):
             except ValueError:
                 raise ValidationError('Dunya-Collection header is not a UUID or list of UUID')
     return collection_ids
+
+
+def get_collection_ids_and_permission(request):
+    """Get the collection ids from the `Dunya-Collection` header of a request
+    and the collection permissions of its user.
+
+    The result is saved on the request, so serializers can call this for
+    every object that they serialize.
+
+    Returns:
+        (collection_ids, permission) as given by get_collection_ids_from_request_or_error
+        and data.utils.get_user_permissions"""
+
+    try:
+        return request._dunya_collection_permission
+    except AttributeError:
+        pass
+    ret = (get_collection_ids_from_request_or_error(request), utils.get_user_permissions(request.user))
+    request._dunya_collection_permission = ret
+    return ret
+
+
+class KeysetPagination(pagination.CursorPagination):
+    """ Pages of objects ordered by id. The cursor in the next and previous
+    links holds the id to start after, so getting a page is one index range
+    scan however far into the list it is, and there is no count of all objects."""
+
+    ordering = 'pk'
+    page_size_query_param = 'limit'
+    max_page_size = 1000
+
+    def decode_cursor(self, request):
+        # An empty `cursor` parameter asks for the first page
+        if not request.query_params.get(self.cursor_query_param):
+            return None
+        return super().decode_cursor(request)
+
+
+class DunyaPagination(pagination.LimitOffsetPagination):
+    """ Pagination for all list views. Pages are given with `limit` and
+    `offset` parameters, unless the request has a `cursor` parameter, in which
+    case they are given with KeysetPagination. Start with an empty `cursor`
+    to get the first page and follow the `next` links from there."""
+
+    def __init__(self):
+        self.keyset = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if KeysetPagination.cursor_query_param in request.query_params:
+            self.keyset = KeysetPagination()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_html_context(self):
+        if self.keyset:
+            return self.keyset.get_html_context()
+        return super().get_html_context()
+
+    def to_html(self):
+        if self.keyset:
+            return self.keyset.to_html()
+        return super().to_html()
+
+    def get_schema_fields(self, view):
+        return super().get_schema_fields(view) + KeysetPagination().get_schema_fields(view)[:1]
+
+
+class CachedResponseMixin(object):
+    """ Save the responses of GET requests to an API view and return them
+    again until the catalogue of the view's tradition changes (see data.apicache).
+
+    A response depends on the URL, the `Dunya-Collection` header and the
+    permission tier of the user, so these are part of its key. Responses
+    have an ETag, and a request with a matching If-None-Match gets a 304."""
+
+    def get(self, request, *args, **kwargs):
+        if not apicache.ENABLED:
+            return super().get(request, *args, **kwargs)
+
+        collection_ids, permission = get_collection_ids_and_permission(request)
+        app_label = type(self).__module__.split(".")[0]
+        key = apicache.key(app_label, request.build_absolute_uri(), collection_ids, permission)
+        cached = apicache.load(key) if key else None
+        if cached:
+            etag, data = cached
+            response = Response(data)
+        else:
+            response = super().get(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            etag = apicache.save(key, response.data)
+        # The same data has a different representation for each renderer
+        etag = '%s-%s"' % (etag[:-1], request.accepted_renderer.format)
+
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            response = not_modified
+        response["ETag"] = etag
+        patch_vary_headers(response, ["Accept", "Authorization", "Cookie", "Dunya-Collection"])
+        patch_cache_control(response, private=True)
+        return response
+
+
+class CachedListAPIView(CachedResponseMixin, generics.ListAPIView):
+    pass
+
+
+class CachedRetrieveAPIView(CachedResponseMixin, generics.RetrieveAPIView):
+    pass
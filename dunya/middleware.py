@@ -1,4 +1,5 @@
 import data.models
+from data import apicache
 from data import utils
 
 
@@ -23,3 +24,22 @@ class ShowBootlegMiddleware(object):
 
         response = self.get_response(request)
         return response
+
+
+class ApiCacheInvalidationMiddleware(object):
+    """ A middleware to stop using the saved API responses when
+        a staff member changes something in the dashboard or the admin.
+    """
+
+    # Changes to the catalogue are made in these parts of the site, outside of imports
+    EDIT_PATHS = ("/dashboard/", "/admin/")
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400 \
+                and request.path.startswith(self.EDIT_PATHS):
+            apicache.bump()
+        return response
@@ -64,6 +64,8 @@ MIDDLEWARE = [
     # Dunya middleware
     # Say if the current user is allowed to see bootleg recordings
     'dunya.middleware.ShowBootlegMiddleware',
+    # Stop using saved API responses after edits in the dashboard or admin
+    'dunya.middleware.ApiCacheInvalidationMiddleware',
 ]
 
 ROOT_URLCONF = 'dunya.urls'
@@ -202,7 +204,7 @@ SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 # Django rest framework
 REST_FRAMEWORK = {
     'PAGE_SIZE': 100,
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
+    'DEFAULT_PAGINATION_CLASS': 'dunya.api.DunyaPagination',
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
@@ -243,6 +245,8 @@ WORKER_REDIS_HOST = get_check_env('DUNYA_WORKER_REDIS_HOST')
 
 BROKER_URL = get_check_env('DUNYA_CELERY_BROKER_URL')
 CELERY_RESULT_DBURI = get_check_env('DUNYA_CELERY_RESULT_URL')
+# Chords (e.g. the sharded import in dashboard.jobs) need a result backend to know when their tasks finish
+CELERY_RESULT_BACKEND = get_check_env('DUNYA_CELERY_RESULT_URL')
 
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
@@ -257,6 +261,29 @@ class DunyaRouter(object):
 CELERY_ROUTES = (DunyaRouter(), )
 CELERYD_CONCURRENCY = 3
 
+# How many documents to send to each task when running a module on a collection
+DOCSERVER_PROCESS_CHUNK_SIZE = 50
+# Write the parts of a derived file in parallel if it has at least this many
+DOCSERVER_PARALLEL_WRITE_PARTS = 20
+# How many audio files to read tags from at once when scanning a collection
+DASHBOARD_SCAN_THREADS = 8
+# Write each imported release with a few bulk queries instead of saving objects one at a time
+DASHBOARD_BULK_IMPORT = True
+# Number of releases imported by each task when importing a whole collection (0 to use a single task)
+DASHBOARD_IMPORT_SHARD_SIZE = 10
+# How long to keep responses from MusicBrainz before requesting them again (seconds)
+MUSICBRAINZ_CACHE_TIMEOUT = 7 * 24 * 60 * 60
+# Where per-recording pitch histograms used for raaga profiles are cached
+PITCH_HISTOGRAM_DIR = os.path.join(BASE_DIR, "pitchhistograms")
+# Where recording similarity indexes are saved (see the similarityindex command)
+SIMILARITY_INDEX_DIR = os.path.join(BASE_DIR, "similarity-index")
+# Where the carnatic guru/student graph is saved (see carnatic.artistgraph)
+ARTIST_GRAPH_PATH = os.path.join(BASE_DIR, "artistgraph.json")
+# Save REST API responses in redis until the catalogue changes (see data.apicache)
+API_CACHE = deploy_env == 'prod'
+# How long to keep a saved API response if the catalogue doesn't change (seconds)
+API_CACHE_TIMEOUT = 24 * 60 * 60
+
 
 # Notification emails (e.g. account activated)
 # Who emails are from
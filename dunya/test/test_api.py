@@ -1,6 +1,12 @@
+from django.contrib import auth
+from django.db import connection
 from django.test import TestCase, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
 
+from carnatic import models
 from dunya.api import get_collection_ids_from_request_or_error
 
 
@@ -38,3 +44,35 @@ class ApiTest(TestCase):
             self.fail('expected exception')
         except ValidationError:
             pass
+
+
+class PaginationTest(TestCase):
+    def setUp(self):
+        for i in range(5):
+            models.Artist.objects.create(name="Artist %s" % i)
+        self.client = APIClient()
+        self.client.force_authenticate(user=auth.models.User.objects.create_user("normaluser"))
+        self.url = reverse("api-carnatic-artist-list")
+
+    def test_limit_offset(self):
+        response = self.client.get(self.url, {"limit": 2, "offset": 2})
+        self.assertEqual(5, response.data["count"])
+        self.assertEqual(["Artist 2", "Artist 3"], [a["name"] for a in response.data["results"]])
+
+    def test_cursor(self):
+        names = []
+        url = self.url + "?cursor=&limit=2"
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(200, response.status_code)
+            self.assertNotIn("count", response.data)
+            self.assertFalse([q for q in queries if "COUNT(" in q["sql"].upper()])
+            self.assertLessEqual(len(response.data["results"]), 2)
+            names.extend(a["name"] for a in response.data["results"])
+            url = response.data["next"]
+        self.assertEqual(["Artist %s" % i for i in range(5)], names)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {"cursor": "x"})
+        self.assertEqual(404, response.status_code)
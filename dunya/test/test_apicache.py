@@ -0,0 +1,104 @@
+import uuid
+from unittest import mock
+
+from django.contrib import auth
+from django.http import HttpResponse
+from django.test import TestCase, RequestFactory
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+import data.models
+from carnatic import models
+from data import apicache
+from dunya import middleware
+
+
+class FakeRedis(object):
+    """ The redis commands that data.apicache uses """
+
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.values:
+            return None
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+        self.values[key] = value
+        return True
+
+
+class ApiCacheTest(TestCase):
+    def setUp(self):
+        patchers = [mock.patch.object(apicache, "_redis", FakeRedis()), mock.patch.object(apicache, "ENABLED", True)]
+        for p in patchers:
+            p.start()
+            self.addCleanup(p.stop)
+
+        self.col1 = data.models.Collection.objects.create(collectionid=uuid.uuid4(), name="collection 1", permission="U")
+        self.col2 = data.models.Collection.objects.create(collectionid=uuid.uuid4(), name="collection 2", permission="S")
+        models.Concert.objects.create(collection=self.col1, title="normal concert", mbid=uuid.uuid4())
+        models.Concert.objects.create(collection=self.col2, title="staff concert", mbid=uuid.uuid4())
+
+        self.normaluser = auth.models.User.objects.create_user("normaluser")
+        self.staffuser = auth.models.User.objects.create_user("staffuser", is_staff=True)
+        self.url = reverse("api-carnatic-concert-list")
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        return client
+
+    def titles(self, response):
+        return [c["title"] for c in response.data["results"]]
+
+    def test_cached(self):
+        client = self.client_for(self.staffuser)
+        response = client.get(self.url)
+        self.assertEqual(["normal concert", "staff concert"], self.titles(response))
+        models.Concert.objects.create(collection=self.col1, title="new concert", mbid=uuid.uuid4())
+
+        # A staff user doesn't need a query to find their permissions
+        with self.assertNumQueries(0):
+            response = client.get(self.url)
+        self.assertEqual(["normal concert", "staff concert"], self.titles(response))
+
+        apicache.bump("carnatic")
+        response = client.get(self.url)
+        self.assertEqual(["normal concert", "staff concert", "new concert"], self.titles(response))
+
+    def test_permission(self):
+        response = self.client_for(self.staffuser).get(self.url)
+        self.assertEqual(["normal concert", "staff concert"], self.titles(response))
+        response = self.client_for(self.normaluser).get(self.url)
+        self.assertEqual(["normal concert"], self.titles(response))
+        response = self.client_for(self.normaluser).get(self.url, HTTP_DUNYA_COLLECTION=str(self.col2.collectionid))
+        self.assertEqual([], self.titles(response))
+
+    def test_not_modified(self):
+        client = self.client_for(self.normaluser)
+        response = client.get(self.url)
+        etag = response["ETag"]
+        self.assertEqual(304, client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code)
+
+        models.Concert.objects.create(collection=self.col1, title="new concert", mbid=uuid.uuid4())
+        apicache.bump("carnatic")
+        response = client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(200, response.status_code)
+        self.assertNotEqual(etag, response["ETag"])
+
+    def test_middleware(self):
+        self.client_for(self.normaluser).get(self.url)
+        key = apicache.key("carnatic", "http://testserver" + self.url, [], ["U"])
+        self.assertIsNotNone(apicache.load(key))
+
+        factory = RequestFactory()
+        invalidate = middleware.ApiCacheInvalidationMiddleware(lambda request: HttpResponse())
+        invalidate(factory.post("/api/carnatic/concert"))
+        invalidate(factory.get("/dashboard/"))
+        self.assertIsNotNone(apicache.load(key))
+        invalidate(factory.post("/dashboard/collection/"))
+        self.assertIsNone(apicache.load(apicache.key("carnatic", "http://testserver" + self.url, [], ["U"])))
@@ -17,7 +17,8 @@ const searchAppend = makeActionCreator(SEARCH_APPEND);
 export const updateSearchInput = makeActionCreator(UPDATE_SEARCH_INPUT, 'input');
 export const resetAutocompleteResults = makeActionCreator(RESET_AUTOCOMPLETE_RESULTS);
 
-let pageIndex = 1;
+// The id of the last result shown, to load the next page of results after
+let after = null;
 
 const getResults = serializedQuery => new Promise((resolve, reject) => {
   const baseSearchURL = SEARCH_URL[window.catalogue];
@@ -42,8 +43,8 @@ const serializeQuery = (query, selectedData) => {
       serializedQuery += `&${encode(category)}=${categoryEntries}`;
     }
   });
-  if (pageIndex - 1 !== 0) {
-    serializedQuery += `&page=${pageIndex}`;
+  if (after) {
+    serializedQuery += `&after=${after}`;
   }
   return serializedQuery;
 };
@@ -64,13 +65,13 @@ const getQueryResults = () => (dispatch, getStore) => {
 };
 
 export const getSearchResults = () => (dispatch) => {
-  pageIndex = 1;
+  after = null;
   dispatch(searchRequest());
   dispatch(getQueryResults());
 };
 
-export const getMoreResults = () => (dispatch) => {
-  pageIndex += 1;
+export const getMoreResults = () => (dispatch, getStore) => {
+  after = getStore().search.moreResults;
   dispatch(searchAppend());
   dispatch(getQueryResults());
 };
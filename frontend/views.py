@@ -17,16 +17,16 @@
 # this program.  If not, see http://www.gnu.org/licenses/
 
 from django.shortcuts import render
-from django.http import JsonResponse
 from django.db.models import Q
 
+import data.filters
 import carnatic
 
 def main(request):
     return render(request, "frontend/index.html")
 
-def filters(request):
-
+def filters_payload():
+    """ The data returned by `filters`, see data.filters """
     taalas = carnatic.models.Taala.objects.prefetch_related('aliases').all()
     taalalist = []
     for r in taalas:
@@ -70,4 +70,8 @@ def filters(request):
            u"talas": taalalist,
            }
 
-    return JsonResponse(ret)
+    return ret
+
+
+def filters(request):
+    return data.filters.response(request, "frontend")
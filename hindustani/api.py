@@ -15,12 +15,11 @@
 # this program.  If not, see http://www.gnu.org/licenses/
 
 from django.shortcuts import redirect
-from rest_framework import generics
 from rest_framework import serializers
 
 from data import utils
 from data.models import WithImageMixin
-from dunya.api import get_collection_ids_from_request_or_error
+from dunya.api import CachedListAPIView, CachedRetrieveAPIView, get_collection_ids_from_request_or_error
 from hindustani import models
 
 
@@ -84,7 +83,7 @@ class InstrumentInnerSerializer(serializers.ModelSerializer):
         fields = ['mbid', 'name']
 
 
-class TaalList(generics.ListAPIView):
+class TaalList(CachedListAPIView):
     queryset = models.Taal.objects.all()
     serializer_class = TaalInnerSerializer
 
@@ -99,7 +98,7 @@ class TaalDetailSerializer(serializers.ModelSerializer):
         fields = ['uuid', 'name', 'common_name', 'aliases', 'composers', 'recordings']
 
 
-class TaalDetail(generics.RetrieveAPIView):
+class TaalDetail(CachedRetrieveAPIView):
     lookup_field = 'uuid'
     lookup_url_kwarg = 'uuid'
     queryset = models.Taal.objects.all()
@@ -111,7 +110,7 @@ def taalbyid(request, pk):
     return redirect('api-hindustani-taal-detail', taal.uuid, permanent=True)
 
 
-class RaagList(generics.ListAPIView):
+class RaagList(CachedListAPIView):
     queryset = models.Raag.objects.all()
     serializer_class = RaagInnerSerializer
 
@@ -127,7 +126,7 @@ class RaagDetailSerializer(serializers.ModelSerializer):
         fields = ['uuid', 'name', 'common_name', 'aliases', 'artists', 'composers', 'recordings']
 
 
-class RaagDetail(generics.RetrieveAPIView):
+class RaagDetail(CachedRetrieveAPIView):
     lookup_field = 'uuid'
     lookup_url_kwarg = 'uuid'
     queryset = models.Raag.objects.all()
@@ -139,7 +138,7 @@ def raagbyid(request, pk):
     return redirect('api-hindustani-raag-detail', raag.uuid, permanent=True)
 
 
-class LayaList(generics.ListAPIView):
+class LayaList(CachedListAPIView):
     queryset = models.Laya.objects.all()
     serializer_class = LayaInnerSerializer
 
@@ -153,7 +152,7 @@ class LayaDetailSerializer(serializers.ModelSerializer):
         fields = ['uuid', 'name', 'common_name', 'recordings', 'aliases']
 
 
-class LayaDetail(generics.RetrieveAPIView):
+class LayaDetail(CachedRetrieveAPIView):
     lookup_field = 'uuid'
     lookup_url_kwarg = 'uuid'
     queryset = models.Laya.objects.all()
@@ -165,7 +164,7 @@ def layabyid(request, pk):
     return redirect('api-hindustani-laya-detail', laya.uuid, permanent=True)
 
 
-class FormList(generics.ListAPIView):
+class FormList(CachedListAPIView):
     queryset = models.Form.objects.all()
     serializer_class = FormInnerSerializer
 
@@ -180,7 +179,7 @@ class FormDetailSerializer(serializers.ModelSerializer):
         fields = ['uuid', 'name', 'common_name', 'aliases', 'artists', 'recordings']
 
 
-class FormDetail(generics.RetrieveAPIView):
+class FormDetail(CachedRetrieveAPIView):
     lookup_field = 'uuid'
     lookup_url_kwarg = 'uuid'
     queryset = models.Form.objects.all()
@@ -198,7 +197,7 @@ class InstrumentListSerializer(serializers.ModelSerializer):
         fields = ['mbid', 'name']
 
 
-class InstrumentList(generics.ListAPIView):
+class InstrumentList(CachedListAPIView):
     queryset = models.Instrument.objects.all()
     serializer_class = InstrumentListSerializer
 
@@ -211,7 +210,7 @@ class InstrumentDetailSerializer(serializers.ModelSerializer):
         fields = ['mbid', 'name', 'artists']
 
 
-class InstrumentDetail(generics.RetrieveAPIView):
+class InstrumentDetail(CachedRetrieveAPIView):
     lookup_field = 'mbid'
     lookup_url_kwarg = 'uuid'
     queryset = models.Instrument.objects.all()
@@ -224,7 +223,7 @@ class WorkListSerializer(serializers.ModelSerializer):
         fields = ['mbid', 'title']
 
 
-class WorkList(generics.ListAPIView):
+class WorkList(CachedListAPIView):
     queryset = models.Work.objects.all()
     serializer_class = WorkListSerializer
 
@@ -243,7 +242,7 @@ class WorkDetailSerializer(serializers.ModelSerializer):
         return RecordingInnerSerializer(recordings, many=True).data
 
 
-class WorkDetail(generics.RetrieveAPIView):
+class WorkDetail(CachedRetrieveAPIView):
     lookup_field = 'mbid'
     lookup_url_kwarg = 'uuid'
     queryset = models.Work.objects.all()
@@ -259,7 +258,7 @@ class InstrumentPerformanceInnerSerializer(serializers.ModelSerializer):
         fields = ['artist', 'instrument', 'lead', 'attributes']
 
 
-class RecordingList(generics.ListAPIView):
+class RecordingList(CachedListAPIView):
     def get_serializer_class(self):
         detail = self.request.GET.get('detail', None)
         if detail == '1':
@@ -306,7 +305,7 @@ class RecordingDetailSerializer(serializers.ModelSerializer):
         return arts.data
 
 
-class RecordingDetail(generics.RetrieveAPIView):
+class RecordingDetail(CachedRetrieveAPIView):
     lookup_field = 'mbid'
     lookup_url_kwarg = 'uuid'
     queryset = models.Recording.objects.all()
@@ -319,7 +318,7 @@ class ArtistListSerializer(serializers.ModelSerializer):
         fields = ['mbid', 'name']
 
 
-class ArtistList(generics.ListAPIView):
+class ArtistList(CachedListAPIView):
     queryset = models.Artist.objects.all()
     serializer_class = ArtistListSerializer
 
@@ -348,7 +347,7 @@ class ArtistDetailSerializer(serializers.ModelSerializer):
         return rs.data
 
 
-class ArtistDetail(generics.RetrieveAPIView):
+class ArtistDetail(CachedRetrieveAPIView):
     lookup_field = 'mbid'
     lookup_url_kwarg = 'uuid'
     queryset = models.Artist.objects.all()
@@ -361,7 +360,7 @@ class ReleaseListSerializer(serializers.ModelSerializer):
         fields = ['mbid', 'title']
 
 
-class ReleaseList(generics.ListAPIView):
+class ReleaseList(CachedListAPIView):
     queryset = models.Release.objects.all()
     serializer_class = ReleaseListSerializer
 
@@ -401,7 +400,7 @@ class ReleaseDetailSerializer(serializers.ModelSerializer, WithImageMixin):
         return data
 
 
-class ReleaseDetail(generics.RetrieveAPIView):
+class ReleaseDetail(CachedRetrieveAPIView):
     lookup_field = 'mbid'
     lookup_url_kwarg = 'uuid'
     queryset = models.Release.objects.all()
@@ -20,14 +20,13 @@ import os
 from optparse import make_option
 
 import compmusic.extractors.similaritylib.raaga
-import numpy as np
 from django.core.files.base import ContentFile
 from django.core.management.base import BaseCommand, CommandError
 
 import carnatic
 import data
 import hindustani
-from docserver import util
+from data import pitchhistogram
 
 
 class Command(BaseCommand):
@@ -40,22 +39,12 @@ class Command(BaseCommand):
     )
 
     def calc_profile(self, raag, recordings, style):
+        histogram = pitchhistogram.average_histogram(recordings)
+        if histogram is None:
+            print(" - No pitch histograms, skipping")
+            return
         average = compmusic.extractors.similaritylib.raaga.Raaga(raag.name, "")
-        pitches = []
-        tonics = []
-        for r in recordings:
-            mbid = r.mbid
-            try:
-                pitch = util.docserver_get_json(mbid, "pitch", "pitch")
-                tonic = util.docserver_get_contents(mbid, "votedtonic", "tonic")
-                tonic = float(tonic)
-                npp = np.array(pitch)
-                pitches.append(npp)
-                tonics.append(tonic)
-            except util.NoFileException:
-                pass
-
-        average.compute_average_hist_data(pitches, tonics)
+        average.average_hist = histogram
 
         if style == "carnatic":
             entityname = "raaga"
@@ -17,6 +17,7 @@
 import collections
 from typing import List, Optional
 
+from django.contrib.postgres.indexes import GinIndex
 from django.urls import reverse
 from django.db import models
 from django.db.models import Q
@@ -304,6 +305,10 @@ class RecordingForm(models.Model):
 class Recording(HindustaniStyle, data.models.Recording):
     class Meta:
         ordering = ['id']
+        indexes = [GinIndex(fields=["search_text"], name="hindustani_rec_search_trgm", opclasses=["gin_trgm_ops"])]
+
+    # Titles of the recording, its works and releases, see data.search
+    search_text = models.TextField(blank=True, default="")
 
     raags = models.ManyToManyField("Raag", through="RecordingRaag")
     taals = models.ManyToManyField("Taal", through="RecordingTaal")
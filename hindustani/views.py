@@ -20,10 +20,12 @@ import json
 import math
 
 from django.conf import settings
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
 
+import data.autocomplete
+import data.filters
+import data.search
 import docserver.exceptions
 import docserver.util
 from hindustani import models
@@ -33,11 +35,7 @@ def searchcomplete(request):
     term = request.GET.get("input")
     ret = []
     if term:
-        suggestions = models.Release.objects.filter(title__istartswith=term)[:3]
-        ret = [{"category": "releases", "name": l.title, 'mbid': str(l.mbid)} for i, l in enumerate(suggestions, 1)]
-        suggestions = models.Artist.objects.filter(name__istartswith=term)[:3]
-        ret += [{"category": "artists", "name": l.name, 'mbid': str(l.mbid)} for i, l in
-                enumerate(suggestions, len(ret))]
+        ret = data.autocomplete.suggestions("hindustani", term)
     return HttpResponse(json.dumps(ret), content_type="application/json")
 
 
@@ -50,14 +48,11 @@ def recordings_search(request):
     s_rags = request.GET.get('rags', '')
     s_tals = request.GET.get('tals', '')
 
-    recordings = models.Recording.objects
+    recordings = models.Recording.objects.all()
     if s_artists != '' or s_releases != '' or q \
             or s_instruments != '' or s_rags != '' or s_tals != '':
         if q and q != '':
-            ids = list(models.Work.objects.filter(title__unaccent__icontains=q).values_list('pk', flat=True))
-            recordings = recordings.filter(works__id__in=ids) \
-                         | recordings.filter(title__unaccent__icontains=q) \
-                         | recordings.filter(release__title__unaccent__icontains=q)
+            recordings = data.search.filter_text(recordings, q)
 
         if s_artists and s_artists != '':
             artists = s_artists.split()
@@ -77,29 +72,16 @@ def recordings_search(request):
         if s_tals and s_tals != '':
             recordings = recordings.filter(taals__uuid__in=s_tals.split())
 
-    paginator = Paginator(recordings.all(), 25)
-    page = request.GET.get('page')
-    next_page = None
-    try:
-        recordings = paginator.page(page)
-        if recordings.has_next():
-            next_page = recordings.next_page_number()
-    except PageNotAnInteger:
-        # If page is not an integer, deliver first page.
-        recordings = paginator.page(1)
-        if recordings.has_next():
-            next_page = recordings.next_page_number()
-    except EmptyPage:
-        # If page is out of range (e.g. 9999), deliver last page of results.
-        recordings = paginator.page(paginator.num_pages)
+    recordings, next_page = data.search.keyset_page(recordings.distinct(), request.GET.get('after'))
     results = {
-        "results": [item.get_dict() for item in recordings.object_list],
+        "results": [item.get_dict() for item in recordings],
         "moreResults": next_page
     }
     return HttpResponse(json.dumps(results), content_type='application/json')
 
 
-def filters(request):
+def filters_payload():
+    """ The data returned by `filters`, see data.filters """
     taals = models.Taal.objects.prefetch_related('aliases').all()
     taallist = []
     for r in taals:
@@ -139,7 +121,11 @@ def filters(request):
            u"tals": taallist,
            }
 
-    return JsonResponse(ret)
+    return ret
+
+
+def filters(request):
+    return data.filters.response(request, "hindustani")
 
 
 def main(request):
@@ -154,28 +140,33 @@ def recordingbyid(request, recordingid, title=None):
 def recording(request, uuid, title=None):
     recording = get_object_or_404(models.Recording, mbid=uuid)
 
-    try:
-        wave = docserver.util.docserver_get_url(recording.mbid, "audioimages", "waveform32", 1,
-                                                version=settings.FEAT_VERSION_IMAGE)
-    except docserver.exceptions.NoFileException:
-        wave = None
-    try:
-        spec = docserver.util.docserver_get_url(recording.mbid, "audioimages", "spectrum32", 1,
-                                                version=settings.FEAT_VERSION_IMAGE)
-    except docserver.exceptions.NoFileException:
-        spec = None
-    try:
-        small = docserver.util.docserver_get_url(recording.mbid, "audioimages", "smallfull",
-                                                 version=settings.FEAT_VERSION_IMAGE)
-    except docserver.exceptions.NoFileException:
-        small = None
-    try:
-        audio = docserver.util.docserver_get_mp3_url(recording.mbid)
-    except docserver.exceptions.NoFileException:
-        audio = None
-    try:
-        tonic = docserver.util.docserver_get_contents(recording.mbid, "hindustanivotedtonic", "tonic",
-                                                      version=settings.FEAT_VERSION_TONIC)
+    wavelookup = ("audioimages", "waveform32", 1, settings.FEAT_VERSION_IMAGE)
+    speclookup = ("audioimages", "spectrum32", 1, settings.FEAT_VERSION_IMAGE)
+    smalllookup = ("audioimages", "smallfull", None, settings.FEAT_VERSION_IMAGE)
+    mp3lookup = ("mp3", None, None, None)
+    toniclookup = ("hindustanivotedtonic", "tonic", 1, settings.FEAT_VERSION_TONIC)
+    apcurvelookup = ("rhythm", "APcurve", None, settings.FEAT_VERSION_RHYTHM)
+    aksharalookup = ("rhythm", "aksharaPeriod", 1, settings.FEAT_VERSION_RHYTHM)
+    pitchlookup = ("hindustaninormalisedpitch", "packedpitch", None,
+                   settings.FEAT_VERSION_HINDUSTANI_NORMALISED_PITCH)
+    histogramlookup = ("hindustaninormalisedpitch", "drawhistogram", None,
+                       settings.FEAT_VERSION_HINDUSTANI_NORMALISED_PITCH)
+    rhythmlookup = ("rhythm", "aksharaTicks", None, settings.FEAT_VERSION_RHYTHM)
+    files = docserver.util.docserver_get_files(recording.mbid, [
+        wavelookup, speclookup, smalllookup, mp3lookup, toniclookup, apcurvelookup,
+        aksharalookup, pitchlookup, histogramlookup, rhythmlookup])
+    urls = {lookup: f.get_absolute_url(partnumber=lookup[2]) if f else None for lookup, f in files.items()}
+
+    wave = urls[wavelookup]
+    spec = urls[speclookup]
+    small = urls[smalllookup]
+    audio = None
+    if files[mp3lookup]:
+        audio = files[mp3lookup].get_absolute_url("ds-download-mp3")
+
+    tonic = docserver.util.docserver_read_file(files[toniclookup])
+    tonicname = None
+    if tonic is not None:
         notenames = ["A", "A♯", "B", "C", "C♯", "D", "D♯", "E", "F", "F♯", "G", "G♯"]
         tonic = round(float(tonic), 2)
         thebin = (12 * math.log(tonic / 440.0) / math.log(2)) % 12
@@ -185,37 +176,26 @@ def recording(request, uuid, title=None):
             tonicname = notenames[thebin]
         else:
             tonicname = ""
-    except docserver.exceptions.NoFileException:
-        tonic = None
-        tonicname = None
 
     vilambit = models.Laya.Vilambit
     drawtempo = not recording.layas.filter(pk=vilambit.pk).exists()
+    akshara = None
+    aksharaurl = None
     if drawtempo:
-        try:
-            aksharaurl = docserver.util.docserver_get_url(recording.mbid, "rhythm", "APcurve",
-                                                          version=settings.FEAT_VERSION_RHYTHM)
-            akshara = docserver.util.docserver_get_contents(recording.mbid, "rhythm", "aksharaPeriod",
-                                                            version=settings.FEAT_VERSION_RHYTHM)
+        akshara = docserver.util.docserver_read_file(files[aksharalookup])
+        if urls[apcurvelookup] and akshara is not None:
+            aksharaurl = urls[apcurvelookup]
             akshara = str(round(float(akshara), 3) * 1000)
-        except docserver.exceptions.NoFileException:
+        else:
             akshara = None
-            aksharaurl = None
-    else:
-        akshara = None
-        aksharaurl = None
 
-    try:
-        pitchtrackurl = docserver.util.docserver_get_url(recording.mbid, "hindustaninormalisedpitch", "packedpitch",
-                                                         version=settings.FEAT_VERSION_HINDUSTANI_NORMALISED_PITCH)
-        histogramurl = docserver.util.docserver_get_url(recording.mbid, "hindustaninormalisedpitch", "drawhistogram",
-                                                        version=settings.FEAT_VERSION_HINDUSTANI_NORMALISED_PITCH)
-        rhythmurl = docserver.util.docserver_get_url(recording.mbid, "rhythm", "aksharaTicks",
-                                                     version=settings.FEAT_VERSION_RHYTHM)
-    except docserver.exceptions.NoFileException:
-        pitchtrackurl = None
-        histogramurl = None
-        rhythmurl = None
+    pitchtrackurl = None
+    histogramurl = None
+    rhythmurl = None
+    if urls[pitchlookup] and urls[histogramlookup] and urls[rhythmlookup]:
+        pitchtrackurl = urls[pitchlookup]
+        histogramurl = urls[histogramlookup]
+        rhythmurl = urls[rhythmlookup]
 
     try:
         releases = recording.release_set.all()
@@ -1,8 +1,7 @@
-from rest_framework import generics
 from rest_framework import serializers
 
 from data import utils
-from dunya.api import get_collection_ids_from_request_or_error
+from dunya.api import CachedListAPIView, CachedRetrieveAPIView, get_collection_ids_from_request_or_error
 
 from jingju import models
 
@@ -147,19 +146,19 @@ class RoleTypeDetailSerializer(serializers.ModelSerializer):
         fields = ['code', 'name', 'romanisation']
 
 
-class WorkList(generics.ListAPIView):
+class WorkList(CachedListAPIView):
     queryset = models.Work.objects.all()
     serializer_class = WorkInnerSerializer
 
 
-class WorkDetail(generics.RetrieveAPIView):
+class WorkDetail(CachedRetrieveAPIView):
     lookup_field = 'mbid'
     lookup_url_kwarg = 'uuid'
     queryset = models.Work.objects.all()
     serializer_class = WorkDetailSerializer
 
 
-class RecordingList(generics.ListAPIView):
+class RecordingList(CachedListAPIView):
     def get_serializer_class(self):
         detail = self.request.GET.get('detail', None)
         if detail == '1':
@@ -173,7 +172,7 @@ class RecordingList(generics.ListAPIView):
         return models.Recording.objects.with_permissions(collection_ids, permission).select_related('work').prefetch_related('recordinginstrumentalist_set__artist', 'recordinginstrumentalist_set__instrument', 'performers', 'shengqiangbanshi')
 
 
-class RecordingDetail(generics.RetrieveAPIView):
+class RecordingDetail(CachedRetrieveAPIView):
     lookup_field = 'mbid'
     lookup_url_kwarg = 'uuid'
     serializer_class = RecordingDetailSerializer
@@ -184,7 +183,7 @@ class RecordingDetail(generics.RetrieveAPIView):
         return models.Recording.objects.with_permissions(collection_ids, permission)
 
 
-class ReleaseList(generics.ListAPIView):
+class ReleaseList(CachedListAPIView):
     serializer_class = ReleaseInnerSerializer
 
     def get_queryset(self):
@@ -193,7 +192,7 @@ class ReleaseList(generics.ListAPIView):
         return models.Release.objects.with_permissions(collection_ids, permission)
 
 
-class ReleaseDetail(generics.RetrieveAPIView):
+class ReleaseDetail(CachedRetrieveAPIView):
     lookup_field = 'mbid'
     lookup_url_kwarg = 'uuid'
     serializer_class = ReleaseDetailSerializer
@@ -203,7 +202,7 @@ class ReleaseDetail(generics.RetrieveAPIView):
         return models.Release.objects.with_permissions(None, permission)
 
 
-class ArtistList(generics.ListAPIView):
+class ArtistList(CachedListAPIView):
     def get_serializer_class(self):
         detail = self.request.GET.get('detail', None)
         if detail == '1':
@@ -217,7 +216,7 @@ class ArtistList(generics.ListAPIView):
         return models.Artist.objects.with_permissions(collection_ids, permission).select_related('role_type', 'instrument')
 
 
-class ArtistDetail(generics.RetrieveAPIView):
+class ArtistDetail(CachedRetrieveAPIView):
     lookup_field = 'mbid'
     lookup_url_kwarg = 'uuid'
     serializer_class = ArtistDetailSerializer
@@ -228,12 +227,12 @@ class ArtistDetail(generics.RetrieveAPIView):
         return models.Artist.objects.with_permissions(collection_ids, permission)
 
 
-class RoleTypeList(generics.ListAPIView):
+class RoleTypeList(CachedListAPIView):
     serializer_class = RoleTypeInnerSerializer
     queryset = models.RoleType.objects.all()
 
 
-class RoleTypeDetail(generics.RetrieveAPIView):
+class RoleTypeDetail(CachedRetrieveAPIView):
     lookup_field = 'uuid'
     lookup_url_kwarg = 'uuid'
 
@@ -16,12 +16,11 @@
 
 from django.http import Http404
 from django.shortcuts import redirect
-from rest_framework import generics
 from rest_framework import serializers
 
 from data import utils
 from data.models import WithImageMixin
-from dunya.api import get_collection_ids_from_request_or_error
+from dunya.api import CachedListAPIView, CachedRetrieveAPIView, get_collection_ids_from_request_or_error
 from makam import models
 
 
@@ -98,7 +97,7 @@ class InstrumentInnerSerializer(serializers.ModelSerializer):
         fields = ['mbid', 'name']
 
 
-class MakamList(generics.ListAPIView):
+class MakamList(CachedListAPIView):
     queryset = models.Makam.objects.all()
     serializer_class = MakamInnerSerializer
 
@@ -113,7 +112,7 @@ class MakamDetailSerializer(serializers.ModelSerializer):
         fields = ['uuid', 'symtr_key', 'name', 'works', 'taksims', 'gazels']
 
 
-class MakamDetail(generics.RetrieveAPIView):
+class MakamDetail(CachedRetrieveAPIView):
     lookup_field = 'uuid'
     queryset = models.Makam.objects.all()
     serializer_class = MakamDetailSerializer
@@ -143,7 +142,7 @@ def fuzzy(request):
     raise Http404("Attribute does not exist")
 
 
-class FormList(generics.ListAPIView):
+class FormList(CachedListAPIView):
     queryset = models.Form.objects.all()
     serializer_class = FormInnerSerializer
 
@@ -156,7 +155,7 @@ class FormDetailSerializer(serializers.ModelSerializer):
         fields = ['name', 'uuid', 'works']
 
 
-class FormDetail(generics.RetrieveAPIView):
+class FormDetail(CachedRetrieveAPIView):
     lookup_field = 'uuid'
     queryset = models.Form.objects.all()
     serializer_class = FormDetailSerializer
@@ -167,7 +166,7 @@ def formbyid(request, pk):
     return redirect('api-makam-form-detail', form.uuid, permanent=True)
 
 
-class UsulList(generics.ListAPIView):
+class UsulList(CachedListAPIView):
     queryset = models.Usul.objects.all()
     serializer_class = UsulInnerSerializer
 
@@ -182,7 +181,7 @@ class UsulDetailSerializer(serializers.ModelSerializer):
         fields = ['name', 'works', 'taksims', 'gazels', 'uuid']
 
 
-class UsulDetail(generics.RetrieveAPIView):
+class UsulDetail(CachedRetrieveAPIView):
     lookup_field = 'uuid'
     queryset = models.Usul.objects.all()
     serializer_class = UsulDetailSerializer
@@ -199,7 +198,7 @@ class InstrumentListSerializer(serializers.ModelSerializer):
         fields = ['mbid', 'name']
 
 
-class InstrumentList(generics.ListAPIView):
+class InstrumentList(CachedListAPIView):
     queryset = models.Instrument.objects.all()
     serializer_class = InstrumentListSerializer
 
@@ -212,7 +211,7 @@ class InstrumentDetailSerializer(serializers.ModelSerializer):
         fields = ['mbid', 'name', 'artists']
 
 
-class InstrumentDetail(generics.RetrieveAPIView):
+class InstrumentDetail(CachedRetrieveAPIView):
     lookup_url_kwarg = 'uuid'
     lookup_field = 'mbid'
     queryset = models.Instrument.objects.all()
@@ -227,7 +226,7 @@ class WorkListSerializer(serializers.ModelSerializer):
         fields = ['mbid', 'title', 'composers']
 
 
-class WorkList(generics.ListAPIView):
+class WorkList(CachedListAPIView):
     serializer_class = WorkListSerializer
 
     def get_queryset(self):
@@ -273,7 +272,7 @@ class WorkDetailSerializer(serializers.ModelSerializer):
         return RecordingInnerSerializer(recordings, many=True).data
 
 
-class WorkDetail(generics.RetrieveAPIView):
+class WorkDetail(CachedRetrieveAPIView):
     lookup_field = 'mbid'
     lookup_url_kwarg = 'uuid'
     queryset = models.Work.objects.all()
@@ -286,7 +285,7 @@ class RecordingListSerializer(serializers.ModelSerializer):
         fields = ['mbid', 'title']
 
 
-class RecordingList(generics.ListAPIView):
+class RecordingList(CachedListAPIView):
     def get_serializer_class(self):
         detail = self.request.GET.get('detail', None)
         if detail == '1':
@@ -330,7 +329,7 @@ class RecordingDetailSerializer(serializers.ModelSerializer):
         return rs.data
 
 
-class RecordingDetail(generics.RetrieveAPIView):
+class RecordingDetail(CachedRetrieveAPIView):
     lookup_field = 'mbid'
     lookup_url_kwarg = 'uuid'
     queryset = models.Recording.objects.all()
@@ -343,7 +342,7 @@ class ArtistListSerializer(serializers.ModelSerializer):
         fields = ['mbid', 'name']
 
 
-class ArtistList(generics.ListAPIView):
+class ArtistList(CachedListAPIView):
     queryset = models.Artist.objects.all()
     serializer_class = ArtistListSerializer
 
@@ -364,7 +363,7 @@ class ArtistDetailSerializer(serializers.ModelSerializer):
         return cs.data
 
 
-class ArtistDetail(generics.RetrieveAPIView):
+class ArtistDetail(CachedRetrieveAPIView):
     lookup_field = 'mbid'
     lookup_url_kwarg = 'uuid'
     queryset = models.Artist.objects.all()
@@ -377,7 +376,7 @@ class ComposerListSerializer(serializers.ModelSerializer):
         fields = ['mbid', 'name']
 
 
-class ComposerList(generics.ListAPIView):
+class ComposerList(CachedListAPIView):
     queryset = models.Composer.objects.all()
     serializer_class = ComposerListSerializer
 
@@ -391,7 +390,7 @@ class ComposerDetailSerializer(serializers.ModelSerializer):
         fields = ['mbid', 'name', 'works', 'lyric_works']
 
 
-class ComposerDetail(generics.RetrieveAPIView):
+class ComposerDetail(CachedRetrieveAPIView):
     lookup_field = 'mbid'
     lookup_url_kwarg = 'uuid'
     queryset = models.Composer.objects.all()
@@ -404,7 +403,7 @@ class ReleaseListSerializer(serializers.ModelSerializer):
         fields = ['mbid', 'title']
 
 
-class ReleaseList(generics.ListAPIView):
+class ReleaseList(CachedListAPIView):
     queryset = models.Release.objects.all()
     serializer_class = ReleaseListSerializer
 
@@ -424,7 +423,7 @@ class ReleaseDetailSerializer(serializers.ModelSerializer, WithImageMixin):
         fields = ['mbid', 'title', 'year', 'image', 'release_artists', 'recordings']
 
 
-class ReleaseDetail(generics.RetrieveAPIView):
+class ReleaseDetail(CachedRetrieveAPIView):
     lookup_field = 'mbid'
     lookup_url_kwarg = 'uuid'
     queryset = models.Release.objects.all()
@@ -437,7 +436,7 @@ class SymbtrListSerializer(serializers.ModelSerializer):
         fields = ['uuid', 'name']
 
 
-class SymbtrList(generics.ListAPIView):
+class SymbtrList(CachedListAPIView):
     queryset = models.SymbTr.objects.all()
     serializer_class = SymbtrListSerializer
 
@@ -448,7 +447,7 @@ class SymbtrDetailSerializer(serializers.ModelSerializer, WithImageMixin):
         fields = ['uuid', 'name']
 
 
-class SymbtrDetail(generics.RetrieveAPIView):
+class SymbtrDetail(CachedRetrieveAPIView):
     lookup_field = 'uuid'
     lookup_url_kwarg = 'uuid'
     queryset = models.SymbTr.objects.all()
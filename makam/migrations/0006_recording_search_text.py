@@ -0,0 +1,23 @@
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('makam', '0005_auto_20190122_1554'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='recording',
+            name='search_text',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddIndex(
+            model_name='recording',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_text'], name='makam_rec_search_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -18,6 +18,7 @@ import collections
 from typing import Optional, List
 
 import unidecode
+from django.contrib.postgres.indexes import GinIndex
 from django.urls import reverse
 from django.db import models
 from django.db.models import Q
@@ -144,6 +145,10 @@ class RecordingWork(models.Model):
 class Recording(MakamStyle, data.models.Recording):
     class Meta:
         ordering = ['id']
+        indexes = [GinIndex(fields=["search_text"], name="makam_rec_search_trgm", opclasses=["gin_trgm_ops"])]
+
+    # Titles of the recording, its works and releases, see data.search
+    search_text = models.TextField(blank=True, default="")
 
     works = models.ManyToManyField("Work", through="RecordingWork")
     artists = models.ManyToManyField("Artist", related_name="recordings_artist")
@@ -1,3 +1,8 @@
+import io
+import os
+import shutil
+import tempfile
+import zipfile
 from unittest import mock
 from django.http import HttpResponseNotFound, Http404, HttpResponse
 from django.test import TestCase
@@ -5,6 +10,7 @@ from django.test import TestCase
 import docserver.models
 import docserver.views
 from makam import models
+from makam import views
 
 
 class SymbTrTest(TestCase):
@@ -55,3 +61,34 @@ class SymbTrTest(TestCase):
 
         self.assertEqual(resp.status_code, 404)
         download.assert_called_with(mock.ANY, self.test_uuid, "symbtrtxt")
+
+
+class StreamZipTest(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.members = []
+        for i in range(50):
+            path = os.path.join(self.root, "file-%d.json" % i)
+            with open(path, "wb") as fp:
+                fp.write(os.urandom(1024 * 1024))
+            self.members.append((path, "derivedfiles/file-%d.json" % i))
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_bounded_chunks(self):
+        """ 50MB of files are streamed without any piece being much
+            larger than the read size """
+        chunk_size = 64 * 1024
+        out = io.BytesIO()
+        biggest = 0
+        for piece in views.stream_zip(self.members, chunk_size):
+            biggest = max(biggest, len(piece))
+            out.write(piece)
+        self.assertLess(biggest, chunk_size + 1024)
+
+        zf = zipfile.ZipFile(out)
+        self.assertEqual([m[1] for m in self.members], zf.namelist())
+        self.assertIsNone(zf.testzip())
+        with open(self.members[3][0], "rb") as fp:
+            self.assertEqual(fp.read(), zf.read(self.members[3][1]))
@@ -19,14 +19,15 @@
 import json
 import os
 import zipfile
-import six
 
 from django.contrib.auth import login, logout
 from django.contrib.auth.models import User
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse
+from django.http import HttpResponse, HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
 
+import data.autocomplete
+import data.filters
+import data.search
 import docserver.exceptions
 import docserver.models
 import docserver.util
@@ -55,11 +56,7 @@ def searchcomplete(request):
     term = request.GET.get("input")
     ret = []
     if term:
-        suggestions = models.Recording.objects.filter(title__istartswith=term)[:3]
-        ret = [{"category": "recordings", "name": l.title, 'mbid': str(l.mbid)} for i, l in enumerate(suggestions, 1)]
-        suggestions = models.Artist.objects.filter(name__istartswith=term)[:3]
-        ret += [{"category": "artists", "name": l.name, 'mbid': str(l.mbid)} for i, l in
-                enumerate(suggestions, len(ret))]
+        ret = data.autocomplete.suggestions("makam", term)
     return HttpResponse(json.dumps(ret), content_type="application/json")
 
 
@@ -73,39 +70,22 @@ def recordings_search(request):
     s_usul = request.GET.get('usuls', '')
     s_work = request.GET.get('works', '')
 
-    recordings = models.Recording.objects
-    next_page = None
+    recordings = models.Recording.objects.all()
     if s_work != '' or s_artist != '' or s_perf != '' or s_form != '' or s_usul != '' or s_makam != '' or q:
         recordings = get_works(s_work, s_artist, s_form, s_usul, s_makam, s_perf, q)
 
-    paginator = Paginator(recordings.all(), 25)
-    page = request.GET.get('page')
-    try:
-        recordings = paginator.page(page)
-        if recordings.has_next():
-            next_page = recordings.next_page_number()
-    except PageNotAnInteger:
-        # If page is not an integer, deliver first page.
-        recordings = paginator.page(1)
-        if recordings.has_next():
-            next_page = recordings.next_page_number()
-    except EmptyPage:
-        # If page is out of range (e.g. 9999), deliver last page of results.
-        recordings = paginator.page(paginator.num_pages)
+    recordings, next_page = data.search.keyset_page(recordings.distinct(), request.GET.get('after'))
     results = {
-        'results': [item.get_dict() for item in recordings.object_list],
+        'results': [item.get_dict() for item in recordings],
         "moreResults": next_page
     }
     return HttpResponse(json.dumps(results), content_type='application/json')
 
 
 def get_works(work, artist, form, usul, makam, perf, q, elem=None):
-    recordings = models.Recording.objects
+    recordings = models.Recording.objects.all()
     if q and q != '':
-        ids = list(models.Work.objects.filter(title__unaccent__iexact=q).values_list('pk', flat=True))
-        rel_ids = list(models.Release.objects.filter(title__unaccent__icontains=q).values_list('pk', flat=True))
-        recordings = recordings.filter(works__id__in=ids) | recordings.filter(title__contains=q) | \
-                     recordings.filter(release__id__in=rel_ids)
+        recordings = data.search.filter_text(recordings, q)
 
     if elem != "artist":
         if artist and artist != '':
@@ -260,18 +240,23 @@ def recording(request, uuid, title=None):
     documentsurl = "/document/by-id/"
     phraseurl = "/segmentphraseseg?v=0.1&subtype=segments"
 
-    try:
-        audio = docserver.util.docserver_get_mp3_url(mbid)
-    except docserver.exceptions.NoFileException:
-        audio = None
-
-    try:
-        max_pitch = docserver.util.docserver_get_json(mbid, "tomatodunya", "pitchmax", 1, version="0.1")
+    urls = recordings_urls()
+    mp3lookup = ("mp3", None, None, None)
+    pitchmaxlookup = ("tomatodunya", "pitchmax", 1, "0.1")
+    lookups = [mp3lookup, pitchmaxlookup]
+    for options in urls.values():
+        lookups.extend(options)
+    files = docserver.util.docserver_get_files(mbid, lookups)
+
+    audio = None
+    if files[mp3lookup]:
+        audio = files[mp3lookup].get_absolute_url("ds-download-mp3")
+
+    max_pitch = docserver.util.docserver_read_json(files[pitchmaxlookup], 1)
+    min_pitch = None
+    if max_pitch is not None:
         min_pitch = max_pitch['min']
         max_pitch = max_pitch['max']
-    except docserver.exceptions.NoFileException:
-        max_pitch = None
-        min_pitch = None
 
     has_score = docserver.models.Document.objects.filter(
         external_identifier__in=list(recording.works.values_list('mbid', flat=True).all()),
@@ -294,29 +279,22 @@ def recording(request, uuid, title=None):
         "has_score": has_score
     }
 
-    urls = recordings_urls()
-    for u in urls.keys():
-        curr_option = 0
-        for option in urls[u]:
-            try:
-                curr_option += 1
-                if option[0] not in ('tomatodunya', 'makamaudioimages'):
-                    content = docserver.util.docserver_get_json(mbid, option[0],
-                                                                option[1], option[2], version=option[3])
-                    if content != None and (len(urls[u]) == curr_option or len(content.keys())):
-                        success_content = docserver.util.docserver_get_url(mbid,
-                                                                           option[0], option[1], option[2],
-                                                                           version=option[3])
-                        ret[u] = success_content
-                        break
-                else:
-                    success_content = docserver.util.docserver_get_url(mbid,
-                                                                       option[0], option[1], option[2],
-                                                                       version=option[3])
-                    ret[u] = success_content
-
-            except docserver.exceptions.NoFileException:
+    for u, options in urls.items():
+        for curr_option, option in enumerate(options, 1):
+            thefile = files[option]
+            if thefile is None:
                 ret[u] = None
+                continue
+            url = thefile.get_absolute_url(partnumber=option[2])
+            if option[0] not in ('tomatodunya', 'makamaudioimages'):
+                content = docserver.util.docserver_read_json(thefile, option[2])
+                if content is None:
+                    ret[u] = None
+                elif len(options) == curr_option or len(content.keys()):
+                    ret[u] = url
+                    break
+            else:
+                ret[u] = url
 
     return render(request, "makam/recording.html", ret)
 
@@ -379,8 +357,7 @@ def download_derived_files(request, uuid, title=None):
     zip_subdir = "derivedfiles_%s" % mbid
     zip_filename = "%s.zip" % zip_subdir
 
-    s = six.BytesIO()
-    zf = zipfile.ZipFile(s, "w")
+    members = []
     for f in filenames:
         fpath = f[0]
         filename, file_extension = os.path.splitext(f[0])
@@ -388,19 +365,62 @@ def download_derived_files(request, uuid, title=None):
         # Replace name fonly for smallfull case
         zip_path = os.path.join(zip_subdir, fname.replace('smallfull',
                                                           'melodic_progression') + file_extension)
+        members.append((fpath, zip_path))
 
-        # Add file, at correct path
-        zf.write(fpath, zip_path)
-    zf.close()
-
-    # Grab ZIP file from in-memory, make response with correct MIME-type
-    resp = HttpResponse(s.getvalue(), content_type="application/x-zip-compressed")
+    # Write the ZIP file as we read each file, instead of building it in memory
+    resp = StreamingHttpResponse(stream_zip(members), content_type="application/x-zip-compressed")
     # ..and correct content-disposition
     resp['Content-Disposition'] = 'attachment; filename=%s' % zip_filename
+    # Don't let nginx buffer the whole response before sending it
+    resp['X-Accel-Buffering'] = 'no'
 
     return resp
 
 
+class _ZipStream(object):
+    """ A write-only file object for zipfile which keeps the data
+        written to it until it is collected with `pop` """
+
+    def __init__(self):
+        self._data = []
+        self._position = 0
+
+    def write(self, data):
+        self._data.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b"".join(self._data)
+        self._data = []
+        return data
+
+
+def stream_zip(members, chunk_size=64 * 1024):
+    """ Generate a ZIP file of the (path, zip_path) pairs in `members`,
+        yielding it in pieces of about `chunk_size` bytes as each
+        file is read from disk """
+    stream = _ZipStream()
+    with zipfile.ZipFile(stream, "w") as zf:
+        for fpath, zip_path in members:
+            zinfo = zipfile.ZipInfo.from_file(fpath, zip_path)
+            with open(fpath, "rb") as src, zf.open(zinfo, "w") as dest:
+                while True:
+                    chunk = src.read(chunk_size)
+                    if not chunk:
+                        break
+                    dest.write(chunk)
+                    yield stream.pop()
+            yield stream.pop()
+    yield stream.pop()
+
+
 def symbtr(request, uuid):
     """ The symbtr view returns the data of this item from
     the docserver, except sets a download hint for the browser
@@ -421,7 +441,8 @@ def symbtr(request, uuid):
     return response
 
 
-def filters(request):
+def filters_payload():
+    """ The data returned by `filters`, see data.filters """
     makams = models.Makam.objects.prefetch_related('aliases').distinct()
     forms = models.Form.objects.prefetch_related('aliases').distinct()
     usuls = models.Usul.objects.prefetch_related('aliases').distinct()
@@ -462,4 +483,8 @@ def filters(request):
            "composers": composerlist,
            }
 
-    return JsonResponse(ret)
+    return ret
+
+
+def filters(request):
+    return data.filters.response(request, "makam")